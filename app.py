@@ -8,8 +8,22 @@ for filtering by country, region, municipality, and feature type.
 from flask import Flask, send_file, jsonify, request, render_template
 from pathlib import Path
 import json
+import math
+import sys
 import geopandas as gpd
+import numpy as np
 import pandas as pd
+import shapely
+from shapely.geometry import mapping, shape
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'scripts'))
+import mbtiles  # noqa: E402
+import trs020  # noqa: E402
+import vector_tiles  # noqa: E402
+from locator import PointLocator  # noqa: E402
+from name_resolver import load_resolver, name_key  # noqa: E402
+from payloads import FragmentIndex, Payload, dumps  # noqa: E402
+from topology import SIMPLIFY_ZOOMS, Topology, pixel_tolerance  # noqa: E402
 
 app = Flask(__name__, template_folder='templates')
 
@@ -17,19 +31,78 @@ ROOT = Path(__file__).resolve().parent
 MAP_HTML = ROOT / 'outputs' / 'maps' / 'interactive_map.html'
 GEOJSON_FILE = ROOT / 'outputs' / 'exports' / 'latvia_municipalities_36_only.geojson'
 CSV_FILE = ROOT / 'outputs' / 'exports' / 'completeness_municipalities.csv'
+PARISH_FILE = ROOT / 'data' / 'processed' / 'municipalities.geojson'
+HIERARCHY_FILE = ROOT / 'data' / 'hierarchy.csv'
+ROLLUPS_FILE = ROOT / 'data' / 'processed' / 'rollups.json'
+TRS020_FILE = ROOT / trs020.TRS020_FILE
+ROAD_TABLE_FILE = ROOT / 'data' / 'processed' / 'road_table.parquet'
+COMPLETENESS_MAP_FILE = ROOT / 'outputs' / 'exports' / 'completeness_map.geojson'
+MBTILES_FILE = ROOT / mbtiles.MBTILES_FILE
+TILE_MIMETYPE = 'application/vnd.mapbox-vector-tile'
+MAX_BATCH_NAMES = 1000
+# Features per /api/features response: by default, and at most with ?limit
+DEFAULT_FEATURES = 500
+MAX_FEATURES = 5000
+MAX_LOCATE_POINTS = 100_000
 
 # Cache for GeoJSON data and hierarchy
 _geojson_cache = None
 _hierarchy_cache = None
 _dataframe_cache = None
+_rollups_cache = None
+_official_cache = None
+_resolver_cache = None
+_tile_store_cache = None
+_parish_cache = None
+# STRtree over the full-resolution geometries per boundary layer
+_feature_tree_cache = {}
+# Prepared-polygon point locator and per-unit JSON fragments per boundary layer
+_locator_cache = {}
+# Shared-arc topology per boundary layer; simplified arcs and FeatureCollections
+# per (layer, zoom)
+_topology_cache = {}
+_arcs_cache = {}
+_simplified_cache = {}
+# Name/id indexes of serialized records: CSV rows, and features per (layer, zoom)
+_data_index_cache = None
+_feature_index_cache = {}
+# Serialized responses by endpoint (and query), built once per load
+_payload_cache = {}
 
 
 def clear_cache():
     """Clear all caches to force reload."""
-    global _geojson_cache, _hierarchy_cache, _dataframe_cache
+    global _geojson_cache, _hierarchy_cache, _dataframe_cache, _rollups_cache, _official_cache
+    global _resolver_cache, _tile_store_cache, _parish_cache, _feature_tree_cache, _locator_cache
+    global _topology_cache, _arcs_cache, _simplified_cache, _data_index_cache, _feature_index_cache
+    global _payload_cache
     _geojson_cache = None
     _hierarchy_cache = None
     _dataframe_cache = None
+    _rollups_cache = None
+    _official_cache = None
+    _resolver_cache = None
+    _tile_store_cache = None
+    _parish_cache = None
+    _feature_tree_cache = {}
+    _locator_cache = {}
+    _topology_cache = {}
+    _arcs_cache = {}
+    _simplified_cache = {}
+    _data_index_cache = None
+    _feature_index_cache = {}
+    _payload_cache = {}
+
+
+def load_payload(key, build):
+    """Cached Payload of build()'s data, or None if build() has no data."""
+    payload = _payload_cache.get(key)
+    if payload is None:
+        data = build()
+        if data is None:
+            return None
+        payload = _payload_cache[key] = Payload(data)
+    return payload
 
 
 def load_geojson():
@@ -42,6 +115,16 @@ def load_geojson():
     return _geojson_cache
 
 
+def load_parishes():
+    """Load and cache the parish and town boundaries (leaf units) as GeoJSON."""
+    global _parish_cache
+    if _parish_cache is None:
+        if PARISH_FILE.exists():
+            parishes = gpd.read_file(PARISH_FILE).to_crs('EPSG:4326')
+            _parish_cache = json.loads(parishes.to_json(drop_id=True))
+    return _parish_cache
+
+
 def load_dataframe():
     """Load and cache CSV data."""
     global _dataframe_cache
@@ -51,10 +134,219 @@ def load_dataframe():
     return _dataframe_cache
 
 
+def load_rollups():
+    """Load and cache the per-level rollups of scripts/06_rollup_hierarchy.py.
+
+    Adds a ready-made list of records per level so both lookups are O(1).
+    """
+    global _rollups_cache
+    if _rollups_cache is None:
+        if ROLLUPS_FILE.exists():
+            with open(ROLLUPS_FILE, 'r', encoding='utf-8') as f:
+                rollups = json.load(f)
+            rollups['lists'] = {level: list(units.values())
+                                for level, units in rollups['units'].items()}
+            _rollups_cache = rollups
+    return _rollups_cache
+
+
+def load_official():
+    """Load and cache the parsed TRS020 table (from its columnar cache when unchanged)."""
+    global _official_cache
+    if _official_cache is None:
+        if TRS020_FILE.exists():
+            _official_cache = trs020.load(TRS020_FILE, ROOT / trs020.CACHE_DIR, HIERARCHY_FILE)
+    return _official_cache
+
+
+def load_name_resolver():
+    """Load and cache the name resolver over data/hierarchy.csv."""
+    global _resolver_cache
+    if _resolver_cache is None:
+        _resolver_cache = load_resolver(HIERARCHY_FILE)
+    return _resolver_cache
+
+
+def unit_aliases(name):
+    """Hierarchy unit of a municipality or state city name, as an extra lookup name.
+
+    The rollups and /api/hierarchy name units as the hierarchy does
+    ("Aizkraukle municipality"); the CSV and boundaries use "Aizkraukle".
+    """
+    resolver = load_name_resolver()
+    if resolver is None:
+        return ()
+    unit = resolver.lookup(name, levels=['city', 'municipality'])[0]
+    return () if unit is None else (unit,)
+
+
+def tile_payload(data, encoded=None):
+    return Payload(data, TILE_MIMETYPE, encoded)
+
+
+def load_tile_store():
+    """Load the vector tile source: the prebuilt MBTiles pyramid of
+    scripts/09_build_tile_pyramid.py if present, otherwise the road and
+    boundary layers (spatially indexed once) for rendering on request.
+    """
+    global _tile_store_cache
+    if _tile_store_cache is None:
+        if MBTILES_FILE.exists():
+            store = mbtiles.MBTiles(MBTILES_FILE, wrap=tile_payload)
+        else:
+            store = vector_tiles.TileStore.from_files(ROAD_TABLE_FILE, COMPLETENESS_MAP_FILE,
+                                                      wrap=tile_payload)
+        if store.layers:
+            _tile_store_cache = store
+    return _tile_store_cache
+
+
+# Boundary layers served by /api/geojson-data and /api/municipality-data
+BOUNDARY_LAYERS = {'municipalities': load_geojson, 'parishes': load_parishes}
+
+
+def load_feature_tree(layer):
+    """STRtree over a boundary layer's geometries (built once per load).
+
+    tree.geometries has one shapely geometry (None if missing) per feature,
+    in the order of the layer's features.
+    """
+    tree = _feature_tree_cache.get(layer)
+    if tree is None:
+        geojson = BOUNDARY_LAYERS[layer]()
+        if geojson is None:
+            return None
+        geometries = [shape(feature['geometry']) if feature.get('geometry') else None
+                      for feature in geojson.get('features', [])]
+        tree = _feature_tree_cache[layer] = shapely.STRtree(geometries)
+    return tree
+
+
+def load_locator(layer):
+    """Point locator over a boundary layer and one JSON fragment per unit.
+
+    A fragment has the unit's name, id and completeness, taken from the
+    feature or else from the CSV row with the unit's name.
+    """
+    locator = _locator_cache.get(layer)
+    if locator is None:
+        tree = load_feature_tree(layer)
+        if tree is None:
+            return None
+        data = load_data_index()
+        fragments = []
+        for feature in BOUNDARY_LAYERS[layer]().get('features', []):
+            props = feature.get('properties') or {}
+            name = props.get('municipality_name')
+            completeness = props.get('completeness_pct')
+            if completeness is None and name and data is not None:
+                rows = data.find([name])
+                completeness = json.loads(rows[0]).get('completeness_pct') if rows else None
+            fragments.append(dumps({'municipality_name': name,
+                                    'municipality_id': props.get('municipality_id'),
+                                    'completeness_pct': completeness}))
+        locator = _locator_cache[layer] = (PointLocator(tree=tree), fragments)
+    return locator
+
+
+def load_topology(layer):
+    """Shared-arc topology of a boundary layer (built once per load)."""
+    topology = _topology_cache.get(layer)
+    if topology is None:
+        tree = load_feature_tree(layer)
+        if tree is None:
+            return None
+        topology = _topology_cache[layer] = Topology.from_geometries(tree.geometries)
+    return topology
+
+
+def load_arcs(layer, zoom=None):
+    """Arcs of a boundary layer simplified for one of SIMPLIFY_ZOOMS (None: full resolution)."""
+    if zoom is None:
+        return None
+    arcs = _arcs_cache.get((layer, zoom))
+    if arcs is None:
+        arcs = _arcs_cache[(layer, zoom)] = load_topology(layer).simplify(pixel_tolerance(zoom))
+    return arcs
+
+
+def load_boundaries(layer, zoom=None):
+    """Boundary layer as GeoJSON, simplified for one of SIMPLIFY_ZOOMS.
+
+    Borders are simplified once per level on the shared arcs, so neighbours
+    keep common edges. zoom=None is the full-resolution file.
+    """
+    geojson = BOUNDARY_LAYERS[layer]()
+    if geojson is None or zoom is None:
+        return geojson
+    simplified = _simplified_cache.get((layer, zoom))
+    if simplified is None:
+        topology, arcs = load_topology(layer), load_arcs(layer, zoom)
+        features = [{**feature, 'geometry': topology.geometry(i, arcs)}
+                    for i, feature in enumerate(geojson.get('features', []))]
+        simplified = _simplified_cache[(layer, zoom)] = {**geojson, 'features': features}
+    return simplified
+
+
+def load_topojson(layer, zoom=None):
+    """Boundary layer as TopoJSON: shared arcs, quantized and delta-encoded."""
+    geojson = BOUNDARY_LAYERS[layer]()
+    if geojson is None:
+        return None
+    properties = [feature.get('properties') for feature in geojson.get('features', [])]
+    return load_topology(layer).to_topojson(properties, layer, load_arcs(layer, zoom))
+
+
+def simplification_zoom():
+    """Level of SIMPLIFY_ZOOMS for the request's zoom or tolerance (degrees) parameter.
+
+    The coarsest level that is still at least as detailed as asked for;
+    None (full resolution) without a parameter or beyond the finest level.
+    """
+    zoom = request.args.get('zoom', type=int)
+    tolerance = request.args.get('tolerance', type=float)
+    if zoom is not None:
+        levels = [level for level in SIMPLIFY_ZOOMS if level >= zoom]
+    elif tolerance is not None:
+        levels = [level for level in SIMPLIFY_ZOOMS if pixel_tolerance(level) <= tolerance]
+    else:
+        return None
+    return levels[0] if levels else None
+
+
+def request_bbox():
+    """(minx, miny, maxx, maxy) of the request's bbox parameter, or None if malformed."""
+    try:
+        bbox = [float(value) for value in request.args.get('bbox', '').split(',')]
+    except ValueError:
+        return None
+    if len(bbox) != 4 or not all(map(math.isfinite, bbox)):
+        return None
+    minx, miny, maxx, maxy = bbox
+    return bbox if minx <= maxx and miny <= maxy else None
+
+
 def build_hierarchy():
     """Build geographic hierarchy from data."""
     global _hierarchy_cache
     if _hierarchy_cache is None:
+        rollups = load_rollups()
+        if rollups:
+            # Real statistical regions from the hierarchy rollups
+            units = rollups['units']
+            countries = sorted(units['country'])
+            _hierarchy_cache = {
+                'countries': countries,
+                'regions': {country: units['country'][country]['children']
+                            for country in countries},
+                'municipalities': {
+                    country: {region: units['region'][region]['children']
+                              for region in units['country'][country]['children']}
+                    for country in countries
+                }
+            }
+            return _hierarchy_cache
+
         geojson = load_geojson()
         if not geojson:
             return None
@@ -83,6 +375,58 @@ def build_hierarchy():
     return _hierarchy_cache
 
 
+
+def csv_records():
+    """CSV data as JSON records (bytes), with the column names the frontend expects."""
+    df = load_dataframe()
+    if df is None:
+        return None
+
+    # Rename columns to match the expected format
+    df = df.rename(columns={
+        'Municipality': 'municipality_name',
+        'OSM_Roads_km': 'osm_road_km',
+        'Official_Roads_km': 'official_road_km',
+        'Completeness_%': 'completeness_pct',
+        # Handle old format columns as well
+        'OSM Roads (km)': 'osm_road_km',
+        'Official Roads (km)': 'official_road_km',
+        'Completeness (%)': 'completeness_pct'
+    })
+
+    # to_json writes NaN as null
+    return df.to_json(orient='records', force_ascii=False).encode('utf-8')
+
+
+def load_data_index():
+    """Index of the CSV records by municipality name, hierarchy unit name (and id),
+    serialized once per load."""
+    global _data_index_cache
+    if _data_index_cache is None:
+        records = csv_records()
+        if records is not None:
+            _data_index_cache = FragmentIndex(
+                json.loads(records), name=lambda record: record.get('municipality_name'),
+                id=lambda record: record.get('municipality_id'), key=name_key,
+                aliases=unit_aliases)
+    return _data_index_cache
+
+
+def load_feature_index(layer, zoom=None):
+    """Index of a boundary layer's features by name and id, per simplification level."""
+    index = _feature_index_cache.get((layer, zoom))
+    if index is None:
+        geojson = load_boundaries(layer, zoom)
+        if geojson is None:
+            return None
+        index = _feature_index_cache[(layer, zoom)] = FragmentIndex(
+            geojson.get('features', []),
+            name=lambda feature: (feature.get('properties') or {}).get('municipality_name'),
+            id=lambda feature: (feature.get('properties') or {}).get('municipality_id'),
+            key=name_key, aliases=unit_aliases if layer == 'municipalities' else None)
+    return index
+
+
 @app.route('/')
 def index():
     """Main page: redirect to dynamic map."""
@@ -119,95 +463,267 @@ def folium_map():
     return map_view()
 
 
+@app.route('/tiles/<layer>/<int:z>/<int:x>/<int:y>.pbf', methods=['GET'])
+def tiles(layer, z, x, y):
+    """Mapbox vector tile of the roads or municipalities layer."""
+    store = load_tile_store()
+    if store is None or layer not in store.layers:
+        return jsonify({'error': 'Unknown tile layer'}), 404
+    if not vector_tiles.valid_tile(z, x, y):
+        return jsonify({'error': f'Tile outside zoom 0-{vector_tiles.MAX_ZOOM}'}), 404
+    return store.tile(layer, z, x, y).response(request)
+
+
+@app.route('/tiles/<int:z>/<int:x>/<int:y>.pbf', methods=['GET'])
+def tiles_all_layers(z, x, y):
+    """Mapbox vector tile with all layers (stored as-is in the MBTiles pyramid)."""
+    store = load_tile_store()
+    if store is None:
+        return jsonify({'error': 'No tile data'}), 404
+    if not vector_tiles.valid_tile(z, x, y):
+        return jsonify({'error': f'Tile outside zoom 0-{vector_tiles.MAX_ZOOM}'}), 404
+    return store.tile(None, z, x, y).response(request)
+
+
 @app.route('/api/hierarchy', methods=['GET'])
 def api_hierarchy():
     """Get geographic hierarchy for selectors."""
-    hierarchy = build_hierarchy()
-    if not hierarchy:
+    payload = load_payload('hierarchy', lambda: build_hierarchy() or None)
+    if payload is None:
         return jsonify({'error': 'Hierarchy data not available'}), 500
-    return jsonify(hierarchy)
+    return payload.response(request)
+
+
+@app.route('/api/rollup/<level>', methods=['GET'])
+def api_rollup_level(level):
+    """Get OSM km, official km and completeness for every unit of a level."""
+    rollups = load_rollups()
+    if not rollups:
+        return jsonify({'error': 'Rollup data not available'}), 500
+    if level not in rollups['lists']:
+        return jsonify({'error': f'Unknown level, use one of: {", ".join(rollups["levels"])}'}), 404
+    return load_payload(('rollup', level), lambda: rollups['lists'][level]).response(request)
+
+
+@app.route('/api/rollup/<level>/<unit>', methods=['GET'])
+def api_rollup_unit(level, unit):
+    """Get the rollup of one unit (e.g. /api/rollup/region/Vidzeme)."""
+    rollups = load_rollups()
+    if not rollups:
+        return jsonify({'error': 'Rollup data not available'}), 500
+    record = rollups['units'].get(level, {}).get(unit)
+    if record is None:
+        return jsonify({'error': 'Unit not found'}), 404
+    return jsonify(record)
+
+
+@app.route('/api/official', methods=['GET'])
+def api_official():
+    """Get published road lengths (e.g. /api/official?surface=asphalt&level=municipality)."""
+    table = load_official()
+    if table is None:
+        return jsonify({'error': 'Official data not available'}), 500
+    surface = request.args.get('surface', 'total')
+    indicator = request.args.get('indicator', 'total')
+    level = request.args.get('level')
+    if surface not in trs020.SURFACES or indicator not in trs020.INDICATORS:
+        return jsonify({'error': f'Use surface in {trs020.SURFACES} and indicator in '
+                                 f'{trs020.INDICATORS}'}), 400
+    if level is not None and level not in trs020.LEVELS:
+        return jsonify({'error': f'Unknown level, use one of: {", ".join(trs020.LEVELS)}'}), 404
+    year = request.args.get('year', type=int)
+
+    def build():
+        lengths = trs020.official_lengths(table, surface, indicator, year,
+                                          levels=None if level is None else [level])
+        return lengths.to_json(orient='records', force_ascii=False).encode('utf-8')
+
+    if year is not None and year not in table['year'].to_numpy():
+        # Unknown years are answered but not kept, so the cache stays bounded
+        return Payload(build(), cache=False).response(request)
+    return load_payload(('official', surface, indicator, level, year), build).response(request)
 
 
 @app.route('/api/geojson-data', methods=['GET'])
 def api_geojson_data():
-    """Get full GeoJSON data for all municipalities."""
-    geojson = load_geojson()
-    if not geojson:
+    """Get GeoJSON data for all municipalities (or ?layer=parishes).
+
+    ?zoom=7 or ?tolerance=0.01 (degrees) returns simplified boundaries,
+    ?format=topojson a TopoJSON topology with every border stored once.
+    """
+    layer = request.args.get('layer', 'municipalities')
+    output = request.args.get('format', 'geojson')
+    if layer not in BOUNDARY_LAYERS:
+        return jsonify({'error': f'Unknown layer, use one of: {", ".join(BOUNDARY_LAYERS)}'}), 404
+    if output not in ('geojson', 'topojson'):
+        return jsonify({'error': 'Unknown format, use geojson or topojson'}), 400
+    zoom = simplification_zoom()
+    build = load_topojson if output == 'topojson' else load_boundaries
+    payload = load_payload(('geojson-data', layer, zoom, output),
+                           lambda: build(layer, zoom) or None)
+    if payload is None:
         return jsonify({'error': 'GeoJSON data not available'}), 500
-    return jsonify(geojson)
+    return payload.response(request)
+
+
+@app.route('/api/features', methods=['GET'])
+def api_features():
+    """Get the boundary features intersecting ?bbox=minx,miny,maxx,maxy (degrees).
+
+    ?layer, ?zoom and ?tolerance as for /api/geojson-data. ?clip=true cuts
+    the geometries to the box; ?limit caps the number of features, and
+    numberMatched tells how many intersect in total.
+    """
+    layer = request.args.get('layer', 'municipalities')
+    if layer not in BOUNDARY_LAYERS:
+        return jsonify({'error': f'Unknown layer, use one of: {", ".join(BOUNDARY_LAYERS)}'}), 404
+    bbox = request_bbox()
+    if bbox is None:
+        return jsonify({'error': 'bbox parameter required as minx,miny,maxx,maxy'}), 400
+    limit = request.args.get('limit', DEFAULT_FEATURES, type=int)
+    if not 1 <= limit <= MAX_FEATURES:
+        return jsonify({'error': f'limit must be between 1 and {MAX_FEATURES}'}), 400
+    clip = request.args.get('clip', '').lower() in ('1', 'true', 'yes')
+
+    tree = load_feature_tree(layer)
+    if tree is None:
+        return jsonify({'error': 'GeoJSON data not available'}), 500
+    zoom = simplification_zoom()
+    hits = np.sort(tree.query(shapely.box(*bbox), predicate='intersects'))
+    matched, hits = len(hits), hits[:limit].tolist()
+
+    if clip:
+        features = load_boundaries(layer, zoom)['features']
+        geometries = [shape(features[i]['geometry']) if features[i].get('geometry') else None
+                      for i in hits]
+        clipped = shapely.clip_by_rect(geometries, *bbox)
+        fragments = [dumps({**features[i], 'geometry': mapping(geometry)})
+                     for i, geometry in zip(hits, clipped)
+                     if geometry is not None and not geometry.is_empty]
+    else:
+        fragments = [load_feature_index(layer, zoom).fragments[i] for i in hits]
+    body = (b'{"type":"FeatureCollection","features":' + FragmentIndex.array(fragments)
+            + f',"numberMatched":{matched},"numberReturned":{len(fragments)}}}'.encode())
+    return Payload(body, cache=False).response(request)
+
+
+@app.route('/api/locate', methods=['GET', 'POST'])
+def api_locate():
+    """Get the unit containing a point (?lat=&lon=), or containing each point of a batch.
+
+    POST {"lat": [...], "lon": [...]} returns one unit (or null) per point,
+    in input order. ?layer as for /api/geojson-data.
+    """
+    layer = request.args.get('layer', 'municipalities')
+    if layer not in BOUNDARY_LAYERS:
+        return jsonify({'error': f'Unknown layer, use one of: {", ".join(BOUNDARY_LAYERS)}'}), 404
+    if request.method == 'POST':
+        points = request.get_json(silent=True)
+        try:
+            lat = np.asarray(points['lat'], dtype=float)
+            lon = np.asarray(points['lon'], dtype=float)
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'Body must be {"lat": [...], "lon": [...]}'}), 400
+        if lat.ndim != 1 or lat.shape != lon.shape:
+            return jsonify({'error': 'lat and lon must be lists of equal length'}), 400
+        if len(lat) > MAX_LOCATE_POINTS:
+            return jsonify({'error': f'At most {MAX_LOCATE_POINTS} points per request'}), 400
+    else:
+        lat = np.array([request.args.get('lat', type=float)], dtype=float)
+        lon = np.array([request.args.get('lon', type=float)], dtype=float)
+    if not (np.isfinite(lat).all() and np.isfinite(lon).all()):
+        return jsonify({'error': 'lat and lon must be numbers'}), 400
+
+    locator = load_locator(layer)
+    if locator is None:
+        return jsonify({'error': 'GeoJSON data not available'}), 500
+    locator, fragments = locator
+    units = locator.locate(lon, lat).tolist()
+    if request.method == 'GET':
+        if units[0] < 0:
+            return jsonify({'error': 'No unit at this point'}), 404
+        return Payload(fragments[units[0]], cache=False).response(request)
+    body = FragmentIndex.array([b'null' if unit < 0 else fragments[unit] for unit in units])
+    return Payload(body, cache=False).response(request)
 
 
 @app.route('/api/csv-data', methods=['GET'])
 def api_csv_data():
     """Get CSV data for all municipalities as array of objects."""
-    df = load_dataframe()
-    if df is None:
+    payload = load_payload('csv-data', csv_records)
+    if payload is None:
         return jsonify({'error': 'CSV data not available'}), 500
-    
-    # Rename columns to match the expected format
-    df = df.rename(columns={
-        'Municipality': 'municipality_name',
-        'OSM_Roads_km': 'osm_road_km',
-        'Official_Roads_km': 'official_road_km',
-        'Completeness_%': 'completeness_pct',
-        # Handle old format columns as well
-        'OSM Roads (km)': 'osm_road_km',
-        'Official Roads (km)': 'official_road_km',
-        'Completeness (%)': 'completeness_pct'
-    })
-    
-    # Convert to records and ensure NaN becomes None for JSON serialization
-    records = json.loads(df.to_json(orient='records'))
-    return jsonify(records)
+    return payload.response(request)
 
 
 @app.route('/api/municipality-data', methods=['GET'])
 def api_municipality_data():
-    """Get GeoJSON data for a specific municipality."""
+    """Get GeoJSON data for a specific municipality (?municipality=name or ?id=).
+
+    ?layer, ?zoom and ?tolerance as for /api/geojson-data.
+    """
     municipality = request.args.get('municipality', '')
+    unit_id = request.args.get('id', '')
     feature_type = request.args.get('feature', 'roads')
+    layer = request.args.get('layer', 'municipalities')
     
-    if not municipality:
+    if not municipality and not unit_id:
         return jsonify({'error': 'Municipality parameter required'}), 400
+    if layer not in BOUNDARY_LAYERS:
+        return jsonify({'error': f'Unknown layer, use one of: {", ".join(BOUNDARY_LAYERS)}'}), 404
     
-    geojson = load_geojson()
-    if not geojson:
+    zoom = simplification_zoom()
+    index = load_feature_index(layer, zoom)
+    if index is None:
         return jsonify({'error': 'GeoJSON data not available'}), 500
     
-    # Filter GeoJSON features to only the selected municipality
-    filtered_features = []
-    for feature in geojson.get('features', []):
-        if feature.get('properties', {}).get('municipality_name') == municipality:
-            filtered_features.append(feature)
+    positions = index.positions([municipality] if municipality else (), [unit_id] if unit_id else ())
     
-    # Return as FeatureCollection
-    result = {
-        'type': 'FeatureCollection',
-        'features': filtered_features
-    }
+    def build():
+        if not positions:
+            return None
+        fragments = [index.fragments[position] for position in positions]
+        return b'{"type":"FeatureCollection","features":' + FragmentIndex.array(fragments) + b'}'
     
-    return jsonify(result)
+    # Keyed by the matched features, so unknown names or ids add no entries;
+    # they get an empty collection, which is not cached
+    key = ('municipality-data', layer, zoom, tuple(positions))
+    payload = load_payload(key, build) or Payload({'type': 'FeatureCollection', 'features': []},
+                                                  cache=False)
+    return payload.response(request)
 
 
 @app.route('/api/data/<municipality>', methods=['GET'])
 def api_data(municipality):
     """Get completeness data for a municipality."""
-    df = load_dataframe()
-    if df is None:
+    index = load_data_index()
+    if index is None:
         return jsonify({'error': 'Data not available'}), 500
     
-    # Find the municipality in the CSV
-    muni_data = df[df['municipality_name'] == municipality]
-    if muni_data.empty:
+    # The first matching row, as before
+    payload = load_payload(('data', name_key(municipality)),
+                           lambda: next(iter(index.find([municipality])), None))
+    if payload is None:
         return jsonify({'error': 'Municipality not found'}), 404
-    
-    # Convert to dict
-    result = muni_data.iloc[0].to_dict()
-    
-    # Convert NaN to None for JSON serialization
-    result = {k: (None if pd.isna(v) else v) for k, v in result.items()}
-    
-    return jsonify(result)
+    return payload.response(request)
+
+
+@app.route('/api/data', methods=['GET'])
+def api_data_batch():
+    """Get completeness data for many municipalities (?names=a,b,c) as an array.
+
+    Rows come in the order of the names; unknown names are left out.
+    """
+    index = load_data_index()
+    if index is None:
+        return jsonify({'error': 'Data not available'}), 500
+    names = [name for value in request.args.getlist('names')
+             for name in value.split(',') if name.strip()]
+    if not names:
+        return jsonify({'error': 'names parameter required, e.g. ?names=Ogre,Cēsis'}), 400
+    if len(names) > MAX_BATCH_NAMES:
+        return jsonify({'error': f'At most {MAX_BATCH_NAMES} names per request'}), 400
+    return Payload(FragmentIndex.array(index.find(names)), cache=False).response(request)
 
 
 if __name__ == '__main__':
@@ -244,6 +760,13 @@ if __name__ == '__main__':
     print("  - GET /api/geojson-data - OSM roads GeoJSON")
     print("  - GET /api/csv-data - Get all municipality statistics")
     print("  - GET /api/hierarchy - Get geographic hierarchy")
-    print("  - GET /api/municipality-data - Get GeoJSON for municipality\n")
+    print("  - GET /api/rollup/<level>[/<unit>] - Completeness per country/region/municipality/parish")
+    print("  - GET /api/official - Published road lengths by surface, road class and year")
+    print("  - GET /api/municipality-data - Get GeoJSON for municipality")
+    print("  - GET /api/features?bbox=minx,miny,maxx,maxy - Boundaries in a map view")
+    print("  - GET /api/locate?lat=&lon=, POST /api/locate - Unit and completeness at points")
+    print("  - GET /api/data/<municipality>, /api/data?names=a,b,c - Completeness rows")
+    print("  - GET /tiles/<roads|municipalities>/<z>/<x>/<y>.pbf - Vector tiles")
+    print("  - GET /tiles/<z>/<x>/<y>.pbf - Vector tiles, all layers\n")
     
     app.run(debug=True)
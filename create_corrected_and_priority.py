@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
 """Generate corrected dataset and mapping priority visualization"""
 
+import sys
+from html import escape
+from pathlib import Path
+
 import geopandas as gpd
 import pandas as pd
 import folium
 
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'scripts'))
+from classification import (PRIORITIES, PRIORITY_COLORS, colors, priority,  # noqa: E402
+                            priority_ranges, quality_flag)
+
 print("=" * 80)
 print("CREATING CORRECTED DATASET & MAPPING PRIORITY MAP")
 print("=" * 80)
@@ -22,14 +30,11 @@ gdf['completeness_pct'] = pd.to_numeric(gdf['completeness_pct'], errors='coerce'
 print("1. Fixing data quality issues...")
 print(f"   Before: {gdf['official_road_km'].isna().sum()} NaN values in official_road_km")
 
-# Recalculate completeness for rows with NaN
-for idx, row in gdf.iterrows():
-    if pd.isna(row['official_road_km']) and pd.notna(row['osm_road_km']):
-        # If official data missing but OSM exists, mark as data_quality_issue
-        gdf.at[idx, 'data_quality_flag'] = 'missing_official_data'
-    elif pd.isna(row['completeness_pct']) and pd.notna(row['osm_road_km']) and pd.notna(row['official_road_km']):
-        # Recalculate completeness if missing
-        gdf.at[idx, 'completeness_pct'] = (row['osm_road_km'] / row['official_road_km'] * 100)
+# Flag rows without official (or OSM) data and recalculate missing completeness
+gdf['data_quality_flag'] = quality_flag(gdf['osm_road_km'], gdf['official_road_km'])
+gdf['completeness_pct'] = gdf['completeness_pct'].fillna(
+    gdf['osm_road_km'] / gdf['official_road_km'] * 100)
+print(f"   Flags: {gdf['data_quality_flag'].value_counts().to_dict()}")
 
 print(f"   After: {gdf['official_road_km'].isna().sum()} NaN values in official_road_km")
 
@@ -38,7 +43,6 @@ gdf_clean = gdf.copy()
 median_official = gdf['official_road_km'].median()
 gdf_clean['official_road_km'] = gdf_clean['official_road_km'].fillna(median_official)
 gdf_clean['completeness_pct'] = gdf_clean['completeness_pct'].fillna(100)
-gdf_clean['data_quality_flag'] = gdf_clean['data_quality_flag'].fillna('complete')
 
 print()
 print("2. Saving corrected dataset...")
@@ -56,30 +60,19 @@ print()
 print("3. Calculating mapping priorities...")
 
 # Create priority classification
-def get_priority(row):
-    completeness = row['completeness_pct']
-    if completeness < 50:
-        return 'Critical'
-    elif completeness < 80:
-        return 'High'
-    elif completeness < 100:
-        return 'Medium'
-    elif completeness <= 120:
-        return 'Complete'
-    else:
-        return 'Over-mapped'
-
-gdf_clean['priority'] = gdf_clean.apply(get_priority, axis=1)
+gdf_clean['priority'] = priority(gdf_clean['completeness_pct'])
+gdf_clean['priority_color'] = colors(gdf_clean['priority'], PRIORITY_COLORS)
+ranges = priority_ranges()
 
 # Calculate mapping effort needed
 gdf_clean['km_to_map'] = (gdf_clean['official_road_km'] - gdf_clean['osm_road_km']).clip(lower=0)
 
 priority_counts = gdf_clean['priority'].value_counts()
 print("   Priority distribution:")
-for priority in ['Critical', 'High', 'Medium', 'Complete', 'Over-mapped']:
-    count = priority_counts.get(priority, 0)
+for level in PRIORITIES:
+    count = priority_counts.get(level, 0)
     if count > 0:
-        print(f"     {priority}: {count} units")
+        print(f"     {level}: {count} units")
 
 print()
 print("4. Creating mapping priority map...")
@@ -91,20 +84,10 @@ m = folium.Map(
     tiles='CartoDB positron'
 )
 
-# Color function by priority
-def get_priority_color(priority):
-    colors = {
-        'Critical': '#d73027',      # Dark red
-        'High': '#fc8d59',          # Orange
-        'Medium': '#fee090',        # Yellow
-        'Complete': '#91cf60',      # Green
-        'Over-mapped': '#4575b4'    # Blue
-    }
-    return colors.get(priority, '#cccccc')
-
 # Add features
 for idx, row in gdf_clean.iterrows():
-    priority = row['priority']
+    level = row['priority']
+    color = row['priority_color']
     municipality = row['municipality_name']
     osm_km = row['osm_road_km']
     official_km = row['official_road_km']
@@ -112,16 +95,16 @@ for idx, row in gdf_clean.iterrows():
     km_needed = row['km_to_map']
     
     # Create popup
-    if priority == 'Critical':
+    if level == 'Critical':
         priority_text = '🚨 CRITICAL - Urgent mapping needed'
         explanation = f"Only {completeness:.1f}% of official roads are in OSM. Missing ~{km_needed:.0f}km out of {official_km:.0f}km"
-    elif priority == 'High':
+    elif level == 'High':
         priority_text = '⚠️ HIGH - Should be mapped'
         explanation = f"{completeness:.1f}% complete. Missing ~{km_needed:.0f}km"
-    elif priority == 'Medium':
+    elif level == 'Medium':
         priority_text = '📝 MEDIUM - Could be improved'
         explanation = f"{completeness:.1f}% complete. Missing ~{km_needed:.0f}km"
-    elif priority == 'Complete':
+    elif level == 'Complete':
         priority_text = '✅ COMPLETE - Well mapped'
         explanation = f"{completeness:.1f}% of official roads in OSM"
     else:
@@ -133,7 +116,7 @@ for idx, row in gdf_clean.iterrows():
         <h4 style="margin: 0 0 10px 0; color: #1976D2; border-bottom: 2px solid #2196F3; padding-bottom: 8px;">
             {municipality}
         </h4>
-        <p style="margin: 0 0 8px 0; font-weight: bold; color: {get_priority_color(priority)};">
+        <p style="margin: 0 0 8px 0; font-weight: bold; color: {color};">
             {priority_text}
         </p>
         <table style="width: 100%; border-collapse: collapse; font-size: 11px;">
@@ -147,7 +130,7 @@ for idx, row in gdf_clean.iterrows():
             </tr>
             <tr style="background-color: #f5f5f5;">
                 <td style="padding: 5px; font-weight: bold;">Completeness:</td>
-                <td style="padding: 5px; text-align: right; color: {get_priority_color(priority)}; font-weight: bold;">
+                <td style="padding: 5px; text-align: right; color: {color}; font-weight: bold;">
                     {completeness:.1f}%
                 </td>
             </tr>
@@ -162,7 +145,7 @@ for idx, row in gdf_clean.iterrows():
     
     folium.GeoJson(
         row['geometry'],
-        style_function=lambda x, color=get_priority_color(priority): {
+        style_function=lambda x, color=color: {
             'fillColor': color,
             'color': '#333',
             'weight': 1,
@@ -170,7 +153,7 @@ for idx, row in gdf_clean.iterrows():
             'fillOpacity': 0.6,
         },
         popup=folium.Popup(popup_html, max_width=350),
-        tooltip=f"{municipality}: {priority} ({completeness:.0f}%)"
+        tooltip=f"{municipality}: {level} ({completeness:.0f}%)"
     ).add_to(m)
 
 # Add title
@@ -192,27 +175,15 @@ legend_html = '''
      background-color: white; border: 2px solid grey; z-index: 9999;
      padding: 15px; border-radius: 5px; box-shadow: 2px 2px 6px rgba(0,0,0,0.2);">
     <h4 style="margin: 0 0 12px 0; color: #1976D2;">Mapping Priority</h4>
+'''
+for level in PRIORITIES[:-1]:
+    legend_html += f'''
     <p style="margin: 0 0 8px 0; font-size: 12px;">
-        <i style="background-color: #d73027; width: 20px; height: 15px; display: inline-block;"></i>
-        &nbsp; <b>Critical</b> (<50%)
-    </p>
-    <p style="margin: 0 0 8px 0; font-size: 12px;">
-        <i style="background-color: #fc8d59; width: 20px; height: 15px; display: inline-block;"></i>
-        &nbsp; <b>High</b> (50-80%)
-    </p>
-    <p style="margin: 0 0 8px 0; font-size: 12px;">
-        <i style="background-color: #fee090; width: 20px; height: 15px; display: inline-block;"></i>
-        &nbsp; <b>Medium</b> (80-100%)
-    </p>
-    <p style="margin: 0 0 8px 0; font-size: 12px;">
-        <i style="background-color: #91cf60; width: 20px; height: 15px; display: inline-block;"></i>
-        &nbsp; <b>Complete</b> (≈100%)
-    </p>
-    <p style="margin: 0; font-size: 12px;">
-        <i style="background-color: #4575b4; width: 20px; height: 15px; display: inline-block;"></i>
-        &nbsp; <b>Over-mapped</b> (>100%)
+        <i style="background-color: {PRIORITY_COLORS[level]}; width: 20px; height: 15px; display: inline-block;"></i>
+        &nbsp; <b>{level}</b> ({escape(ranges[level])})
     </p>
-</div>
+'''
+legend_html += '''</div>
 '''
 m.get_root().html.add_child(folium.Element(legend_html))
 
@@ -230,11 +201,11 @@ medium = gdf_clean[gdf_clean['priority'] == 'Medium']
 complete = gdf_clean[gdf_clean['priority'] == 'Complete']
 overmapped = gdf_clean[gdf_clean['priority'] == 'Over-mapped']
 
-print(f"🚨 Critical (0-50%):          {len(critical)} units - {critical['km_to_map'].sum():.0f}km to map")
-print(f"⚠️  High (50-80%):            {len(high)} units - {high['km_to_map'].sum():.0f}km to map")
-print(f"📝 Medium (80-100%):          {len(medium)} units - {medium['km_to_map'].sum():.0f}km to map")
-print(f"✅ Complete (~100%):          {len(complete)} units")
-print(f"🔍 Over-mapped (>100%):       {len(overmapped)} units (needs verification)")
+print(f"🚨 Critical ({ranges['Critical']}):".ljust(30) + f"{len(critical)} units - {critical['km_to_map'].sum():.0f}km to map")
+print(f"⚠️  High ({ranges['High']}):".ljust(30) + f"{len(high)} units - {high['km_to_map'].sum():.0f}km to map")
+print(f"📝 Medium ({ranges['Medium']}):".ljust(30) + f"{len(medium)} units - {medium['km_to_map'].sum():.0f}km to map")
+print(f"✅ Complete ({ranges['Complete']}):".ljust(30) + f"{len(complete)} units")
+print(f"🔍 Over-mapped ({ranges['Over-mapped']}):".ljust(30) + f"{len(overmapped)} units (needs verification)")
 print()
 
 total_to_map = gdf_clean['km_to_map'].sum()
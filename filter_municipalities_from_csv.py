@@ -1,42 +1,44 @@
 #!/usr/bin/env python3
 """Filter GeoJSON to only municipalities from the new CSV"""
 
+import sys
+from pathlib import Path
+
 import geopandas as gpd
-import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'scripts'))
+from name_resolver import load_resolver  # noqa: E402
+from trs020 import load, official_lengths  # noqa: E402
 
 print("Filtering municipalities from CSV...")
 print("=" * 70)
 
-# Read the new CSV
-csv_file = 'data/raw/TRS020_20251218-122746.csv'
-df = pd.read_csv(csv_file, skiprows=2)  # Skip header rows
+# Official totals of the municipalities and state cities
+official = official_lengths(load(), levels=['municipality', 'city'])
 
-# Extract municipality names (all rows are municipalities)
-municipalities_csv = df['Territorial unit'].unique()
-municipalities_csv = [m.strip().replace(' municipality', '').replace(' city', '') for m in municipalities_csv]
-
-print(f"Municipalities from CSV: {len(municipalities_csv)}")
-print(f"Names: {sorted(municipalities_csv)}")
+print(f"Municipalities from CSV: {len(official)}")
+print(f"Names: {sorted(official['municipality_name'])}")
 print()
 
 # Read GeoJSON
 gdf = gpd.read_file('outputs/exports/latvia_clean_33.geojson')
 print(f"Features in GeoJSON: {len(gdf)}")
 
-# Filter GeoJSON to only CSV municipalities
-gdf_filtered = gdf[gdf['municipality_name'].isin(municipalities_csv)].copy()
+# Filter GeoJSON to only CSV municipalities, on the resolved unit names
+resolver = load_resolver()
+units = resolver.resolve(gdf['municipality_name'], levels=['municipality', 'city'])
+official_roads_dict = dict(zip(official['municipality_name'], official['road_length_km']))
+gdf_filtered = gdf[units.isin(official_roads_dict)].copy()
 print(f"After filtering: {len(gdf_filtered)} municipalities")
+unmatched = resolver.unmatched(gdf['municipality_name'], levels=['municipality', 'city'])
+if unmatched:
+    print(f"⚠ {len(unmatched)} GeoJSON names without a municipality: {', '.join(unmatched)}")
+missing = sorted(set(official_roads_dict) - set(units))
+if missing:
+    print(f"⚠ {len(missing)} official municipalities not in the GeoJSON: {', '.join(missing)}")
 print()
 
-# Merge official road lengths from CSV
-official_roads_dict = {}
-for _, row in df.iterrows():
-    unit_original = row['Territorial unit'].strip()
-    unit_clean = unit_original.replace(' municipality', '').replace(' city', '')
-    if row['Indicator'] == 'Total':
-        official_roads_dict[unit_clean] = float(row['2024'])
-
-gdf_filtered['official_road_km'] = gdf_filtered['municipality_name'].map(official_roads_dict)
+gdf_filtered['official_road_km'] = units[gdf_filtered.index].map(official_roads_dict)
 
 # Recalculate completeness
 gdf_filtered['completeness_pct'] = (gdf_filtered['osm_road_km'] / gdf_filtered['official_road_km'] * 100).round(1)
@@ -1,18 +1,18 @@
 #!/usr/bin/env python3
 """Filter completeness data to only 36 official municipalities."""
 
+import sys
+from pathlib import Path
+
 import pandas as pd
-import json
 
-# Load TRS020 to get official municipalities
-trs020 = pd.read_csv('data/raw/TRS020_20251218-122746.csv', skiprows=1)
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'scripts'))
+from name_resolver import load_resolver  # noqa: E402
+from trs020 import load, official_lengths  # noqa: E402
 
-# Extract municipality names and normalize them
-official_munis = set()
-for unit in trs020['Territorial unit'].unique():
-    # Clean up "X municipality" -> "X"
-    muni = unit.replace(' municipality', '').strip()
-    official_munis.add(muni)
+# Load TRS020 to get official municipalities
+official = official_lengths(load(), levels=['municipality'], name='short_name')
+official_munis = set(official['municipality_name'])
 
 print(f"Official municipalities: {len(official_munis)}")
 for muni in sorted(official_munis):
@@ -21,11 +21,21 @@ for muni in sorted(official_munis):
 # Load the expanded completeness file
 df_all = pd.read_csv('outputs/exports/completeness_municipalities_all.csv')
 
-# Filter to only municipalities that have official data
-df_filtered = df_all[df_all['Municipality'].isin(official_munis)].copy()
+# Filter to only municipalities that have official data, whatever form the
+# names take in the completeness file
+resolver = load_resolver()
+units = resolver.resolve(df_all['Municipality'], levels=['municipality'])
+official_units = set(resolver.resolve(official['municipality_name'], levels=['municipality']))
+df_filtered = df_all[units.isin(official_units)].copy()
 
 print(f"\nMatched municipalities: {len(df_filtered)}")
 print(f"Original rows: {len(df_all)}")
+unmatched = resolver.unmatched(df_all['Municipality'], levels=['municipality'])
+if unmatched:
+    print(f"⚠ {len(unmatched)} names without a municipality: {', '.join(unmatched)}")
+missing = sorted(official_units - set(units))
+if missing:
+    print(f"⚠ {len(missing)} official municipalities missing: {', '.join(missing)}")
 
 # Sort by municipality name
 df_filtered = df_filtered.sort_values('Municipality').reset_index(drop=True)
@@ -1,44 +1,41 @@
 #!/usr/bin/env python3
 """Filter data to only include municipalities from the new CSV file"""
 
+import sys
+from pathlib import Path
+
 import geopandas as gpd
 import pandas as pd
 
-print("Filtering to municipalities from TRS020_20251218-122746.csv")
-print("=" * 70)
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'scripts'))
+from name_resolver import load_resolver, print_report  # noqa: E402
+from trs020 import TRS020_FILE, load, official_lengths  # noqa: E402
 
-# Read new CSV and extract municipalities
-df_csv = pd.read_csv('data/raw/TRS020_20251218-122746.csv', skiprows=1)
-print(f"CSV records: {len(df_csv)}")
+print(f"Filtering to municipalities from {TRS020_FILE}")
+print("=" * 70)
 
-# Extract municipality names (remove " municipality" suffix)
-municipalities = df_csv['Territorial unit'].str.replace(' municipality', '').unique()
-municipalities = [m.strip() for m in municipalities if m]
-print(f"Unique municipalities in CSV: {len(municipalities)}")
-print(f"Municipalities: {sorted(municipalities)}")
+# Read official municipality lengths
+df_csv = official_lengths(load(), levels=['municipality'], name='short_name')
+df_csv = df_csv.rename(columns={'road_length_km': 'official_road_km'})
+print(f"Unique municipalities in CSV: {len(df_csv)}")
+print(f"Municipalities: {sorted(df_csv['municipality_name'])}")
 
 # Read current GeoJSON
 gdf = gpd.read_file('outputs/exports/latvia_clean_33.geojson')
 print(f"\nCurrent GeoJSON features: {len(gdf)}")
 
-# Filter to only municipalities in CSV
-gdf_filtered = gdf[gdf['municipality_name'].isin(municipalities)].copy()
+# Keep the GeoJSON municipalities with official data, matched on the
+# resolved unit so differently spelled names are not dropped silently
+resolver = load_resolver()
+merged, report = resolver.merge(gdf.drop(columns='official_road_km', errors='ignore'), df_csv,
+                                'municipality_name', 'municipality_name', how='inner',
+                                levels=['municipality'])
+print_report(report, 'GeoJSON', 'TRS020')
+gdf_filtered = gpd.GeoDataFrame(
+    merged.drop(columns=['unit', 'municipality_name_right']),
+    geometry='geometry', crs=gdf.crs)
 print(f"After filtering: {len(gdf_filtered)} municipalities")
 
-# Merge official road data from CSV
-df_csv_for_merge = df_csv.copy()
-df_csv_for_merge['municipality_name'] = df_csv_for_merge['Territorial unit'].str.replace(' municipality', '').str.strip()
-df_csv_for_merge['official_road_km'] = pd.to_numeric(df_csv_for_merge['2024'], errors='coerce')
-df_csv_for_merge = df_csv_for_merge[['municipality_name', 'official_road_km']].drop_duplicates(subset=['municipality_name'])
-
-# Merge into GeoJSON
-gdf_filtered = gdf_filtered.merge(
-    df_csv_for_merge,
-    on='municipality_name',
-    how='left',
-    suffixes=('_old', '')
-)
-
 # Recalculate completeness
 gdf_filtered['osm_road_km'] = pd.to_numeric(gdf_filtered['osm_road_km'], errors='coerce')
 gdf_filtered['official_road_km'] = pd.to_numeric(gdf_filtered['official_road_km'], errors='coerce')
@@ -1,49 +1,32 @@
 #!/usr/bin/env python3
 """Create mapping between GeoJSON novads names and CSV municipality names."""
 
-# Mapping from GeoJSON genitive/plural form to CSV nominative singular form
-NOVADS_TO_MUNICIPALITY = {
-    # Genitive/plural forms (from GeoJSON) -> Nominative singular (from CSV/TRS020)
-    'Aizkraukles novads': 'Aizkraukle',
-    'Alūksnes novads': 'Alūksne',
-    'Augšdaugavas novads': 'Augšdaugava',
-    'Balvu novads': 'Balvi',
-    'Bauskas novads': 'Bauska',
-    'Cēsu novads': 'Cēsis',
-    'Dienvidkurzemes novads': 'Dienvidkurzeme',
-    'Dobeles novads': 'Dobele',
-    'Gulbenes novads': 'Gulbene',
-    'Jelgavas novads': 'Jelgava',
-    'Jēkabpils novads': 'Jēkabpils',  # This one might already match
-    'Krāslavas novads': 'Krāslava',
-    'Kuldīgas novads': 'Kuldīga',
-    'Limbažu novads': 'Limbaži',
-    'Ludzas novads': 'Ludza',
-    'Līvānu novads': 'Līvāni',
-    'Madonas novads': 'Madona',
-    'Mārupes novads': 'Mārupe',
-    'Ogres novads': 'Ogre',
-    'Olaines novads': 'Olaine',
-    'Preiļu novads': 'Preiļi',
-    'Ropažu novads': 'Ropaži',
-    'Rēzeknes novads': 'Rēzekne',
-    'Saldus novads': 'Saldus',  # Already matches
-    'Saulkrastu novads': 'Saulkrasti',
-    'Siguldas novads': 'Sigulda',
-    'Smiltenes novads': 'Smiltene',
-    'Talsu novads': 'Talsi',
-    'Tukuma novads': 'Tukums',
-    'Valkas novads': 'Valka',
-    'Valmieras novads': 'Valmiera',
-    'Varakļānu novads': 'Varakļāni',
-    'Ventspils novads': 'Ventspils',  # Already matches
-    'Ādažu novads': 'Ādaži',
-    'Ķekavas novads': 'Ķekava',
-}
+import sys
+from pathlib import Path
 
-print("Municipality Name Mapping (GeoJSON -> CSV)")
-print("=" * 60)
-for geojson_name, csv_name in sorted(NOVADS_TO_MUNICIPALITY.items()):
-    print(f"{geojson_name:30} -> {csv_name}")
+import pandas as pd
 
-print(f"\nTotal mappings: {len(NOVADS_TO_MUNICIPALITY)}")
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'scripts'))
+from name_resolver import load_resolver, short_name  # noqa: E402
+
+# Mapping from GeoJSON genitive/plural form to CSV nominative singular form,
+# derived from the Latvian names in data/hierarchy.csv
+_hierarchy = pd.read_csv('data/hierarchy.csv')
+_municipalities = _hierarchy[(_hierarchy['level'] == 'municipality')
+                             & _hierarchy['local_name'].str.endswith(' novads', na=False)]
+NOVADS_TO_MUNICIPALITY = dict(zip(_municipalities['local_name'],
+                                  _municipalities['unit'].map(short_name)))
+
+if __name__ == '__main__':
+    print("Municipality Name Mapping (GeoJSON -> CSV)")
+    print("=" * 60)
+    for geojson_name, csv_name in sorted(NOVADS_TO_MUNICIPALITY.items()):
+        print(f"{geojson_name:30} -> {csv_name}")
+
+    print(f"\nTotal mappings: {len(NOVADS_TO_MUNICIPALITY)}")
+
+    # Names in the other spellings still reach the same municipality
+    resolver = load_resolver()
+    unmatched = resolver.unmatched(list(NOVADS_TO_MUNICIPALITY))
+    if unmatched:
+        print(f"⚠ {len(unmatched)} names not in the resolver: {', '.join(unmatched)}")
@@ -4,39 +4,44 @@ Regenerate completeness data for ALL municipalities (36-37)
 This script expands from the current 30 to include all available municipalities
 """
 
+import sys
 import pandas as pd
 import geopandas as gpd
 import json
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'scripts'))
+from trs020 import TRS020_FILE, load, official_lengths  # noqa: E402
+
 print("=" * 70)
 print("REGENERATING PROJECT FOR ALL MUNICIPALITIES (36-37)")
 print("=" * 70)
 
 # Step 1: Load official stats from TRS020
 print("\n1. Loading official statistics from TRS020...")
-trs020 = pd.read_csv('data/raw/TRS020_20251218-122746.csv', skiprows=1)
-print(f"   Loaded {len(trs020)} municipalities")
-
-# Clean up names
-trs020['Municipality'] = (trs020['Territorial unit']
-    .str.replace(' municipality', '', regex=False)
-    .str.replace(' city', '', regex=False)
-    .str.strip())
+trs020 = load(TRS020_FILE)
 
-official_stats = trs020[['Municipality', '2024']].copy()
+# Municipalities, without the " municipality" suffix
+official_stats = official_lengths(trs020, levels=['municipality'], name='short_name')
 official_stats.columns = ['Municipality', 'Official_Roads_km']
+print(f"   Loaded {len(official_stats)} municipalities")
 print(f"   Columns: {official_stats.columns.tolist()}")
 print(f"   Sample:\n{official_stats.head()}")
 
 # Step 2: Load OSM data by municipality
 print("\n2. Loading OSM road data...")
 try:
-    roads = gpd.read_file('data/processed/roads_by_municipality.geojson')
-    osm_agg = roads.groupby('municipality_name').agg({
-        'length_km': 'sum',
+    # Thin assignment table from scripts/04_spatial_join.py: osm_id,
+    # municipality_id, clipped_length_km - no road geometries are read
+    assignments = pd.read_parquet('data/processed/road_assignments',
+                                  columns=['osm_id', 'municipality_id', 'clipped_length_km'])
+    names = gpd.read_file('data/processed/municipalities.geojson', ignore_geometry=True)
+    names = names.drop_duplicates('municipality_id').set_index('municipality_id')['municipality_name']
+    osm_agg = assignments.groupby('municipality_id').agg({
+        'clipped_length_km': 'sum',
         'osm_id': 'count'
     }).reset_index()
+    osm_agg['municipality_id'] = osm_agg['municipality_id'].map(names)
     osm_agg.columns = ['Municipality', 'OSM_Roads_km', 'Segments']
     osm_agg['OSM_Roads_km'] = osm_agg['OSM_Roads_km'].round(2)
     print(f"   Found {len(osm_agg)} municipalities with OSM data")
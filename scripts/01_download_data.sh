@@ -26,6 +26,17 @@ else
     echo "✓ Already exists"
 fi
 
+# LAU-1 municipalities (36 novadi + 7 state cities), used to place parishes
+# in the hierarchy rollups (scripts/06_rollup_hierarchy.py)
+echo "   LAU-1 municipality boundaries..."
+if [ ! -f "lau1.geojson" ]; then
+    wget -O lau1.geojson \
+        "https://github.com/wmgeolab/geoBoundaries/raw/main/releaseData/gbOpen/LVA/ADM1/geoBoundaries-LVA-ADM1.geojson"
+    echo "✓ Downloaded"
+else
+    echo "✓ Already exists"
+fi
+
 # Create official stats
 echo "3/3 Creating official statistics..."
 cat > official_road_stats.csv << 'EOF'
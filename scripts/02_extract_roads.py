@@ -1,77 +1,178 @@
 #!/usr/bin/env python3
-"""Extract roads from OSM PBF file"""
+"""Extract roads from OSM PBF file
+
+Default mode keeps every road in memory and writes one GeoJSON file.
+With --streaming, ways are flushed in fixed-size batches to a directory of
+parquet parts, so peak memory does not grow with the size of the input.
+With --workers N, the PBF is decoded by N processes over block ranges; the
+output is the same as a serial run, and --streaming stays bounded apart from
+one sorted table of highway node coordinates.
+
+Ways are held as flat coordinate arrays and measured with one vectorized
+kernel (--length-method projected|geodesic). LineStrings are only built
+for geometry outputs; --no-geometry writes attribute-only parts.
+
+With --aggregate-by MUNICIPALITIES, roads are assigned to the polygons as
+they stream past and only the small per-municipality/highway table is
+written, for scripts/05_calculate_completeness.py --aggregates.
+
+--node-index selects the osmium node location store. With
+--node-index-file the locations are kept on disk (sparse or dense file
+array) and reused on the next run over the same PBF, which then only
+reads ways - handy for small CI runners and for tag-filter changes.
+"""
+
+import argparse
 
-import osmium
 import geopandas as gpd
-from shapely.geometry import LineString
+import osmium
 import pandas as pd
 
-print("=" * 60)
-print("Extracting Roads from OSM")
-print("=" * 60)
-print()
-
-class RoadHandler(osmium.SimpleHandler):
-    def __init__(self):
-        super().__init__()
-        self.roads = []
-        self.count = 0
-        
-    def way(self, w):
-        if 'highway' in w.tags:
-            highway_type = w.tags['highway']
-            
-            # Skip certain types
-            if highway_type in ['proposed', 'construction', 'abandoned']:
-                return
-            
-            # Extract coordinates
-            try:
-                coords = [(n.lon, n.lat) for n in w.nodes]
-                if len(coords) >= 2:
-                    self.roads.append({
-                        'osm_id': w.id,
-                        'highway': highway_type,
-                        'name': w.tags.get('name', None),
-                        'geometry': LineString(coords)
-                    })
-                    self.count += 1
-                    
-                    if self.count % 10000 == 0:
-                        print(f"  Processed {self.count:,} roads...")
-            except:
-                pass
-
-print("1/4 Reading OSM file...")
-print("   This takes 5-10 minutes...")
-handler = RoadHandler()
-handler.apply_file('data/raw/latvia-latest.osm.pbf', locations=True)
-print(f"✓ Found {len(handler.roads):,} roads")
-
-print("\n2/4 Creating GeoDataFrame...")
-gdf = gpd.GeoDataFrame(handler.roads, crs='EPSG:4326')
-print(f"✓ Created GeoDataFrame")
-
-print("\n3/4 Reprojecting to metric CRS...")
-gdf = gdf.to_crs('EPSG:3035')
-print("✓ Reprojected to EPSG:3035")
-
-print("\n4/4 Calculating lengths...")
-gdf['length_km'] = gdf.geometry.length / 1000.0
-print("✓ Lengths calculated")
-
-# Save
-print("\nSaving to file...")
-gdf.to_file('data/processed/roads.geojson', driver='GeoJSON')
-print(f"✓ Saved: data/processed/roads.geojson ({len(gdf):,} roads)")
-
-# Statistics
-print("\n" + "=" * 60)
-print("Statistics:")
-print(f"  Total roads: {len(gdf):,}")
-print(f"  Total length: {gdf['length_km'].sum():.2f} km")
-print(f"  Average length: {gdf['length_km'].mean():.3f} km")
-print("\nTop 5 road types:")
-print(gdf['highway'].value_counts().head())
-print("=" * 60)
-print()
\ No newline at end of file
+from road_extraction import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_NODE_INDEX,
+    FILE_NODE_INDEX_TYPES,
+    LENGTH_METHODS,
+    METRIC_CRS,
+    PartWriter,
+    RoadStats,
+)
+from parallel_extraction import read_road_batches
+from municipality_index import load_municipalities
+from road_aggregation import MunicipalityAggregator
+
+DEFAULT_INPUT = 'data/raw/latvia-latest.osm.pbf'
+
+
+def extract_in_memory(input_path, output_path, length_method, read_options):
+    print("1/3 Reading OSM file...")
+    print("   This takes 5-10 minutes...")
+    batches = []
+    read_road_batches(input_path, batches.append, None, **read_options)
+    print(f"✓ Found {sum(len(b) for b in batches):,} roads")
+
+    print("\n2/3 Calculating lengths and building geometries...")
+    frames = [b.to_frame(length_method) for b in batches]
+    gdf = pd.concat(frames, ignore_index=True) if frames else gpd.GeoDataFrame(
+        columns=['osm_id', 'highway', 'name', 'surface', 'ref', 'length_km'], geometry=[], crs=METRIC_CRS)
+    print(f"✓ Lengths calculated ({length_method}), geometries in {METRIC_CRS}")
+
+    # Save
+    print("\n3/3 Saving to file...")
+    gdf.to_file(output_path, driver='GeoJSON')
+    print(f"✓ Saved: {output_path} ({len(gdf):,} roads)")
+
+    stats = RoadStats()
+    stats.update(gdf)
+    stats.print_summary()
+
+
+def extract_streaming(input_path, output_dir, batch_size, length_method, geometry, read_options):
+    print(f"1/2 Streaming OSM file in batches of {batch_size:,} ways...")
+    writer = PartWriter(output_dir)
+    stats = RoadStats()
+
+    def write_batch(batch):
+        frame = batch.to_frame(length_method, geometry=geometry)
+        writer.write(frame)
+        stats.update(frame)
+        print(f"  Wrote part {writer.parts:,} ({stats.count:,} roads so far)")
+
+    read_road_batches(input_path, write_batch, batch_size, **read_options)
+    print(f"✓ Found {stats.count:,} roads")
+
+    print(f"\n2/2 Saved {writer.parts:,} parts to {output_dir}")
+    stats.print_summary()
+
+
+def extract_aggregates(input_path, municipalities_path, output_path, batch_size, length_method,
+                       join, read_options):
+    print("1/3 Loading municipalities...")
+    municipalities = load_municipalities(municipalities_path)
+    aggregator = MunicipalityAggregator(municipalities, length_method, join)
+    print(f"✓ Indexed {len(municipalities)} municipalities")
+
+    print(f"\n2/3 Streaming OSM file in batches of {batch_size:,} ways...")
+
+    def add_batch(batch):
+        aggregator.add(batch)
+        print(f"  Aggregated {aggregator.roads:,} roads...")
+
+    read_road_batches(input_path, add_batch, batch_size, **read_options)
+    print(f"✓ Found {aggregator.roads:,} roads ({aggregator.unassigned:,} outside all municipalities)")
+
+    print("\n3/3 Saving...")
+    table = aggregator.result()
+    table.to_csv(output_path, index=False)
+    print(f"✓ Saved: {output_path} ({len(table):,} rows)")
+
+    print("\n" + "=" * 60)
+    print("Statistics:")
+    print(f"  Municipalities with roads: {table['municipality_name'].nunique()}")
+    print(f"  Assigned length: {table['osm_road_km'].sum():.2f} km")
+    print("\nTop 5 road types by km:")
+    print(table.groupby('highway')['osm_road_km'].sum().sort_values(ascending=False).head())
+    print("=" * 60)
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--input', default=DEFAULT_INPUT, help='OSM PBF file to read')
+    parser.add_argument('--output', default=None,
+                        help='Output GeoJSON file, or parts directory with --streaming')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Write fixed-size batches to parquet parts (bounded memory)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='Ways per batch in streaming mode')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Worker processes for parallel PBF decoding (1 = serial)')
+    parser.add_argument('--length-method', choices=LENGTH_METHODS, default='projected',
+                        help='EPSG:3035 planar lengths or great-circle lengths')
+    parser.add_argument('--no-geometry', action='store_true',
+                        help='Streaming only: write attributes and lengths without LineStrings')
+    parser.add_argument('--aggregate-by', metavar='MUNICIPALITIES', default=None,
+                        help='Municipality polygons; write only km/segment totals per municipality')
+    parser.add_argument('--join', choices=['intersects', 'clip'], default='intersects',
+                        help='With --aggregate-by: count whole roads per touched municipality, '
+                             'or clip them at borders')
+    parser.add_argument('--node-index', choices=osmium.index.map_types(), default=DEFAULT_NODE_INDEX,
+                        help='Node location store used by serial extraction')
+    parser.add_argument('--node-index-file', default=None,
+                        help=f'Keep node locations in this file ({" or ".join(FILE_NODE_INDEX_TYPES)}); '
+                             'reused while the PBF is unchanged')
+    args = parser.parse_args()
+    if args.no_geometry and not args.streaming:
+        parser.error('--no-geometry requires --streaming (GeoJSON output needs geometries)')
+    if args.node_index_file:
+        if args.node_index == DEFAULT_NODE_INDEX:
+            args.node_index = 'sparse_file_array'
+        if args.node_index not in FILE_NODE_INDEX_TYPES:
+            parser.error(f'--node-index-file needs --node-index {" or ".join(FILE_NODE_INDEX_TYPES)}')
+        if args.workers > 1:
+            parser.error('--node-index-file applies to serial extraction only (--workers 1)')
+    read_options = {
+        'workers': args.workers,
+        'node_index': args.node_index,
+        'node_index_file': args.node_index_file,
+    }
+
+    print("=" * 60)
+    print("Extracting Roads from OSM")
+    print("=" * 60)
+    print()
+
+    if args.aggregate_by:
+        extract_aggregates(args.input, args.aggregate_by,
+                           args.output or 'data/processed/road_aggregates.csv',
+                           args.batch_size, args.length_method, args.join, read_options)
+    elif args.streaming:
+        extract_streaming(args.input, args.output or 'data/processed/roads_parts', args.batch_size,
+                          args.length_method, not args.no_geometry, read_options)
+    else:
+        extract_in_memory(args.input, args.output or 'data/processed/roads.geojson',
+                          args.length_method, read_options)
+
+
+if __name__ == '__main__':
+    main()
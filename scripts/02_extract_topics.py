@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""Extract several OSM topics (roads, railways, buildings, POIs, forests) in one pass
+
+Each topic is written to data/processed/topics/<topic>/part-*.parquet.
+"""
+
+import argparse
+
+import osmium
+
+from road_extraction import DEFAULT_BATCH_SIZE, DEFAULT_NODE_INDEX
+from topic_extraction import DEFAULT_TOPICS, TopicExtractor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--input', default='data/raw/latvia-latest.osm.pbf', help='OSM PBF file to read')
+    parser.add_argument('--output', default='data/processed/topics', help='Output directory')
+    parser.add_argument('--topics', default=','.join(DEFAULT_TOPICS),
+                        help=f'Comma-separated topics (available: {", ".join(DEFAULT_TOPICS)})')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='Features per part file and topic')
+    parser.add_argument('--node-index', choices=osmium.index.map_types(), default=DEFAULT_NODE_INDEX,
+                        help='Node location store')
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.topics.split(',') if name.strip()]
+    unknown = [name for name in names if name not in DEFAULT_TOPICS]
+    if unknown:
+        parser.error(f"Unknown topics: {', '.join(unknown)}")
+
+    print("=" * 60)
+    print("Extracting Topics from OSM")
+    print("=" * 60)
+    print()
+
+    print(f"1/2 Reading OSM file once for: {', '.join(names)}...")
+    extractor = TopicExtractor(args.output, batch_size=args.batch_size)
+    for name in names:
+        extractor.register(DEFAULT_TOPICS[name])
+    counts = extractor.run(args.input, node_index=args.node_index)
+    print("✓ Done")
+
+    print(f"\n2/2 Saved to {args.output}/")
+    print("\n" + "=" * 60)
+    print("Features per topic:")
+    for name in names:
+        print(f"  {name:12s} {counts[name]:>10,}")
+    print("=" * 60)
+    print()
+
+
+if __name__ == '__main__':
+    main()
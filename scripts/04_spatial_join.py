@@ -1,39 +1,92 @@
 #!/usr/bin/env python3
-"""Spatial join roads to municipalities"""
+"""Spatial join roads to municipalities
+
+The output is normalized (see road_tables.py): the road table
+data/processed/road_table.parquet stores every road once, and the thin
+assignment table in data/processed/road_assignments/ holds one
+(osm_id, municipality_id, clipped_length_km) row per road and municipality.
+Aggregations downstream read only the assignment table.
+
+--mode intersects (default) counts a road in full towards every
+municipality it touches. --mode clip splits roads at municipality borders
+so each municipality gets only the length inside it, and border-crossing
+roads are no longer counted in full on both sides.
+
+With --workers > 1 the join runs chunked in a process pool (see
+join_engine.py): each worker writes the assignment part and the road part
+of its chunk, and the road parts are merged into the same road table as a
+serial run writes, one row per osm_id.
+"""
+
+import argparse
+
+from join_engine import DEFAULT_CHUNK_SIZE, join_roads, run_join
+from municipality_index import MunicipalityIndex, load_municipalities
+from road_extraction import METRIC_CRS, PartWriter, read_roads
+from road_tables import ASSIGNMENTS_DIR, ROAD_TABLE, write_road_table
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--roads', default='data/processed/roads.geojson',
+                    help='Roads GeoJSON, or parts directory from 02_extract_roads.py --streaming')
+parser.add_argument('--mode', choices=['intersects', 'clip'], default='intersects',
+                    help='Count whole roads per touched municipality, or clip at borders')
+parser.add_argument('--workers', type=int, default=1,
+                    help='Join road chunks in this many processes')
+parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                    help='Roads per chunk (Arrow batch) when --roads is a single file')
+parser.add_argument('--road-table', default=ROAD_TABLE,
+                    help='Output road table (GeoParquet, one row per road)')
+parser.add_argument('--assignments', default=ASSIGNMENTS_DIR,
+                    help='Output directory of assignment parts')
+args = parser.parse_args()
+
+
+def run_parallel(index):
+    print(f"\n2/2 Joining road chunks with {args.workers} workers...")
+
+    def progress(done, totals):
+        print(f"   chunk {done}: {totals[0]:,} roads, {totals[2]:,} assignments")
+
+    roads, assigned, rows = run_join(args.roads, index, args.assignments, mode=args.mode,
+                                     workers=args.workers, chunk_size=args.chunk_size,
+                                     progress=progress, road_table=args.road_table)
+    print(f"✓ Saved: {args.road_table}")
+    print(f"✓ Saved: {args.assignments}/")
+    return roads, assigned, rows
+
+
+def run_serial(index):
+    print("\n2/3 Loading roads...")
+    roads = read_roads(args.roads).to_crs(METRIC_CRS)
+    print(f"✓ Loaded {len(roads):,} roads")
+
+    print("\n3/3 Performing spatial join...")
+    assignments, assigned = join_roads(roads, index, args.mode)
+    PartWriter(args.assignments).write(assignments)
+    stored = write_road_table(roads, args.road_table)
+    print(f"✓ Saved: {args.road_table} ({stored:,} roads)")
+    print(f"✓ Saved: {args.assignments}/")
+    return len(roads), assigned, len(assignments)
 
-import geopandas as gpd
-import pandas as pd
 
 print("=" * 60)
 print("Spatial Join")
 print("=" * 60)
 print()
 
-print("1/3 Loading data...")
-roads = gpd.read_file('data/processed/roads.geojson')
-municipalities = gpd.read_file('data/processed/municipalities.geojson')
-print(f"✓ Loaded {len(roads):,} roads")
-print(f"✓ Loaded {len(municipalities)} municipalities")
-
-print("\n2/3 Performing spatial join...")
-print("   This takes 2-5 minutes...")
+steps = 2 if args.workers > 1 else 3
+print(f"1/{steps} Building municipality index...")
+index = MunicipalityIndex(load_municipalities('data/processed/municipalities.geojson'))
+print(f"✓ Indexed {len(index.names)} municipalities")
 
-# Spatial join
-roads_with_muni = gpd.sjoin(
-    roads,
-    municipalities[['geometry', 'municipality_name', 'municipality_id']],
-    how='left',
-    predicate='intersects'
-)
-print("✓ Join complete")
-
-print("\n3/3 Saving...")
-roads_with_muni.to_file('data/processed/roads_by_municipality.geojson', driver='GeoJSON')
-print(f"✓ Saved: data/processed/roads_by_municipality.geojson")
+if args.workers > 1:
+    roads, assigned, rows = run_parallel(index)
+else:
+    roads, assigned, rows = run_serial(index)
 
 print("\n" + "=" * 60)
 print("Statistics:")
-print(f"  Roads assigned: {roads_with_muni['municipality_name'].notna().sum():,}")
-print(f"  Unique municipalities: {roads_with_muni['municipality_name'].nunique()}")
+print(f"  Roads assigned: {assigned:,} of {roads:,}")
+print(f"  Assignment rows: {rows:,}")
 print("=" * 60)
-print()
\ No newline at end of file
+print()
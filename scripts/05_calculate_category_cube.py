@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Calculate completeness for every official road category in one pass
+
+Joins the assignment table of 04_spatial_join.py with the surface, ref and
+highway tags of the road table, maps each road to the official categories
+(total, asphalt, gravel, state roads, municipal roads, municipal streets)
+and sums them per municipality in a single group-by. Writes the long
+municipality × category cube plus one <category>_completeness.csv/.geojson
+per category in the layout of 05_calculate_completeness.py.
+"""
+
+import argparse
+from pathlib import Path
+
+import geopandas as gpd
+import pandas as pd
+import pyarrow.parquet as pq
+
+from completeness import build_completeness_map
+from road_categories import (CATEGORIES, CATEGORY_CUBE, CATEGORY_OUTPUT, ROAD_ATTRIBUTES,
+                             category_cube, completeness_cube, load_official)
+from road_tables import ASSIGNMENTS_DIR, ROAD_TABLE, read_assignments
+from trs020 import TRS020_FILE
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--assignments', default=ASSIGNMENTS_DIR,
+                    help='Assignment table written by 04_spatial_join.py')
+parser.add_argument('--road-table', default=ROAD_TABLE,
+                    help='Road table written by 04_spatial_join.py')
+parser.add_argument('--official', default=TRS020_FILE,
+                    help='TRS020 export with the official lengths per surface and road class')
+parser.add_argument('--output', default=CATEGORY_CUBE)
+parser.add_argument('--no-maps', action='store_true',
+                    help='Skip the per-category GeoJSON maps')
+args = parser.parse_args()
+
+print("=" * 60)
+print("Completeness by Road Category")
+print("=" * 60)
+print()
+
+print("1/4 Loading data...")
+assignments = read_assignments(args.assignments)
+stored = set(pq.read_schema(args.road_table).names)
+attributes = pd.read_parquet(args.road_table, columns=[c for c in ROAD_ATTRIBUTES if c in stored])
+if not {'surface', 'ref'} <= stored:
+    print("  ⚠ Road table has no surface/ref columns; rerun 02_extract_roads.py and "
+          "04_spatial_join.py for the surface and state road categories")
+municipalities = gpd.read_file('data/processed/municipalities.geojson')
+official = load_official(args.official)
+print(f"✓ {len(assignments):,} assignments, {len(attributes):,} roads")
+
+print("\n2/4 Building municipality × category cube...")
+cube = category_cube(assignments, attributes, municipalities)
+print(f"✓ {cube['municipality_id'].nunique()} municipalities × {len(CATEGORIES)} categories")
+
+print("\n3/4 Calculating completeness...")
+completeness = completeness_cube(cube, official)
+Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+completeness.to_csv(args.output, index=False)
+print(f"✓ Saved: {args.output}")
+
+print("\n4/4 Writing per-category tables...")
+for road_category, table in completeness.groupby('road_category', observed=False):
+    table = table.drop(columns='road_category')
+    output = CATEGORY_OUTPUT.format(road_category)
+    table.to_csv(f'{output}.csv', index=False)
+    if not args.no_maps:
+        build_completeness_map(municipalities, table).to_file(f'{output}.geojson', driver='GeoJSON')
+    print(f"✓ {road_category:18s} {output}.csv")
+
+print("\n" + "=" * 60)
+print("Summary (municipalities per completeness category):")
+print(pd.crosstab(completeness['road_category'], completeness['category']).to_string())
+print("=" * 60)
+print()
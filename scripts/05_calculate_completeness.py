@@ -1,73 +1,59 @@
 #!/usr/bin/env python3
 """Calculate road completeness"""
 
+import argparse
+
 import geopandas as gpd
 import pandas as pd
 
+from completeness import (COMPLETENESS_CSV, COMPLETENESS_MAP, build_completeness_map,
+                          completeness_table, osm_totals)
+from road_tables import ASSIGNMENTS_DIR, read_assignments
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--aggregates', default=None,
+                    help='Per-municipality table from 02_extract_roads.py --aggregate-by '
+                         '(instead of the 04_spatial_join.py assignments)')
+parser.add_argument('--assignments', default=ASSIGNMENTS_DIR,
+                    help='Assignment table written by 04_spatial_join.py')
+args = parser.parse_args()
+
 print("=" * 60)
 print("Calculating Completeness")
 print("=" * 60)
 print()
 
 print("1/4 Loading data...")
-roads = gpd.read_file('data/processed/roads_by_municipality.geojson')
+if args.aggregates:
+    aggregates = pd.read_csv(args.aggregates)
+else:
+    assignments = read_assignments(args.assignments)
 municipalities = gpd.read_file('data/processed/municipalities.geojson')
 official = pd.read_csv('data/raw/official_road_stats.csv')
 print("✓ Data loaded")
 
 print("\n2/4 Aggregating OSM roads by municipality...")
-osm_aggregated = roads.groupby('municipality_name').agg({
-    'length_km': 'sum',
-    'osm_id': 'count'
-}).reset_index()
+if args.aggregates:
+    osm_aggregated = aggregates.groupby('municipality_name').agg({
+        'osm_road_km': 'sum',
+        'num_segments': 'sum'
+    }).reset_index()
+else:
+    osm_aggregated = osm_totals(assignments, municipalities)
 osm_aggregated.columns = ['municipality_name', 'osm_road_km', 'num_segments']
 osm_aggregated['osm_road_km'] = osm_aggregated['osm_road_km'].round(2)
 print(f"✓ Aggregated for {len(osm_aggregated)} municipalities")
 
 print("\n3/4 Calculating completeness...")
-completeness = pd.merge(
-    osm_aggregated,
-    official,
-    on='municipality_name',
-    how='outer'
-)
-
-completeness['completeness_pct'] = (
-    completeness['osm_road_km'] / completeness['road_length_km'] * 100
-).round(2)
-
-def categorize(pct):
-    if pd.isna(pct):
-        return 'No data'
-    elif pct < 70:
-        return 'Low'
-    elif pct < 90:
-        return 'Partial'
-    elif pct <= 110:
-        return 'Complete'
-    else:
-        return 'Over-mapped'
-
-completeness['category'] = completeness['completeness_pct'].apply(categorize)
-completeness['difference_km'] = (completeness['osm_road_km'] - completeness['road_length_km']).round(2)
+completeness = completeness_table(osm_aggregated, official)
 print("✓ Completeness calculated")
 
 print("\n4/4 Creating final map dataset...")
-completeness_map = municipalities.merge(
-    completeness,
-    on='municipality_name',
-    how='left'
-)
-completeness_map['road_density_km_per_km2'] = (
-    completeness_map['osm_road_km'] / completeness_map['area_km2']
-).round(3)
-
-# Convert back to WGS84 for web maps
-completeness_map = completeness_map.to_crs('EPSG:4326')
+completeness_map = build_completeness_map(municipalities, completeness)
 
 # Save
-completeness.to_csv('outputs/exports/completeness.csv', index=False)
-completeness_map.to_file('outputs/exports/completeness_map.geojson', driver='GeoJSON')
+completeness.to_csv(COMPLETENESS_CSV, index=False)
+completeness_map.to_file(COMPLETENESS_MAP, driver='GeoJSON')
 print("✓ Saved results")
 
 print("\n" + "=" * 60)
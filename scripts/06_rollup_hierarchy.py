@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Roll completeness up parish → municipality → statistical region → Latvia
+
+Reads the per-unit OSM totals of 05_calculate_completeness.py, places
+every unit in the hierarchy (data/hierarchy.csv plus parish rows derived
+from LAU-1 boundaries when available) and writes OSM km, official km and
+completeness for every level to data/processed/rollups.json, keyed by
+level and unit name for the API.
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import geopandas as gpd
+import pandas as pd
+
+from completeness import COMPLETENESS_CSV
+from hierarchy import (HIERARCHY_TABLE, LEVELS, ROLLUPS_FILE, leaf_rows, load_hierarchy, rollup,
+                       rollup_payload)
+from trs020 import TRS020_FILE, load, official_lengths
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--hierarchy', default=HIERARCHY_TABLE,
+                    help='Hierarchy table (unit, level, parent, local_name)')
+parser.add_argument('--leaves', default=COMPLETENESS_CSV,
+                    help='Per-unit OSM totals from 05_calculate_completeness.py')
+parser.add_argument('--official', default=TRS020_FILE,
+                    help='TRS020 export with the published road lengths per unit')
+parser.add_argument('--leaf-boundaries', default='data/processed/municipalities.geojson',
+                    help='Polygons of the leaf units (parishes and towns)')
+parser.add_argument('--lau1', default='data/raw/lau1.geojson',
+                    help='LAU-1 municipality polygons used to place the leaf units')
+parser.add_argument('--output', default=ROLLUPS_FILE)
+args = parser.parse_args()
+
+print("=" * 60)
+print("Hierarchy Rollups")
+print("=" * 60)
+print()
+
+print("1/3 Loading hierarchy...")
+hierarchy = load_hierarchy(args.hierarchy)
+if Path(args.lau1).exists() and not (hierarchy['level'] == 'parish').any():
+    rows, outside = leaf_rows(gpd.read_file(args.leaf_boundaries), gpd.read_file(args.lau1), hierarchy)
+    hierarchy = pd.concat([hierarchy, rows], ignore_index=True)
+    print(f"✓ Placed {len(rows)} parishes and towns in municipalities")
+    if outside:
+        print(f"  ⚠ {len(outside)} units not inside a known municipality: {', '.join(outside[:10])}")
+for level in LEVELS:
+    print(f"  {level:13s} {(hierarchy['level'] == level).sum():4d} units")
+
+print("\n2/3 Rolling up...")
+leaves = pd.read_csv(args.leaves)
+official = official_lengths(load(args.official))
+table, unmatched = rollup(hierarchy, leaves, official)
+print(f"✓ {len(table)} units across {len(LEVELS)} levels")
+if unmatched:
+    print(f"  ⚠ {len(unmatched)} OSM units not in the hierarchy: {', '.join(unmatched[:10])}")
+
+print("\n3/3 Saving...")
+Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+with open(args.output, 'w', encoding='utf-8') as f:
+    json.dump(rollup_payload(table), f, ensure_ascii=False)
+print(f"✓ Saved: {args.output}")
+
+print("\n" + "=" * 60)
+for row in table[table['level'].isin(['country', 'region'])].itertuples():
+    print(f"  {row.unit:12s} OSM {row.osm_road_km:10.1f} km | official {row.official_road_km:8.0f} km"
+          f" | {row.completeness_pct:6.1f}%")
+print("=" * 60)
+print()
@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 """Create interactive web map"""
 
+from html import escape
+
 import geopandas as gpd
 import folium
 
+from classification import COLORS, categorize, colors, legend_ranges
+
 print("=" * 60)
 print("Creating Interactive Map")
 print("=" * 60)
@@ -15,15 +19,10 @@ print(f"✓ Loaded {len(gdf)} LAU-1 municipalities with official data")
 
 print("\n2/2 Creating map...")
 
-def get_color(category):
-    colors = {
-        'Low': '#d73027',
-        'Partial': '#fc8d59',
-        'Complete': '#91cf60',
-        'Over-mapped': '#4575b4',
-        'No data': '#cccccc'
-    }
-    return colors.get(category, '#cccccc')
+# Classify against the shared thresholds; the category stored in the file
+# was computed before the official figures were merged in
+gdf['category'] = categorize(gdf['completeness_pct'])
+gdf['fill_color'] = colors(gdf['category'])
 
 m = folium.Map(location=[56.8, 24.6], zoom_start=7, tiles='CartoDB positron')
 
@@ -169,8 +168,8 @@ for _, row in gdf.iterrows():
     
     folium.GeoJson(
         row['geometry'],
-        style_function=lambda x, c=row['category']: {
-            'fillColor': get_color(c),
+        style_function=lambda x, c=row['fill_color']: {
+            'fillColor': c,
             'color': 'black',
             'weight': 1,
             'fillOpacity': 0.7
@@ -180,37 +179,23 @@ for _, row in gdf.iterrows():
     ).add_to(m)
 
 # Legend
+ranges = legend_ranges()
 legend_html = '''
 <div style="position: fixed; bottom: 50px; left: 50px; width: 220px;
      background-color: white; border: 2px solid grey; z-index: 9999;
      padding: 10px; border-radius: 5px; font-size: 12px;">
     <p style="margin: 0; font-weight: bold;">Road Completeness</p>
+'''
+for category in ['Complete', 'Partial', 'Low', 'Over-mapped', 'No data']:
+    label = category if category == 'No data' else f"{category} ({ranges[category]})"
+    legend_html += f'''
     <p style="margin: 5px 0;">
-        <span style="background: #91cf60; width: 20px; height: 15px; 
-              display: inline-block; border: 1px solid black;"></span>
-        Complete (95-105%)
-    </p>
-    <p style="margin: 5px 0;">
-        <span style="background: #fc8d59; width: 20px; height: 15px; 
-              display: inline-block; border: 1px solid black;"></span>
-        Partial (50-95%)
-    </p>
-    <p style="margin: 5px 0;">
-        <span style="background: #d73027; width: 20px; height: 15px; 
-              display: inline-block; border: 1px solid black;"></span>
-        Low (&lt;50%)
-    </p>
-    <p style="margin: 5px 0;">
-        <span style="background: #4575b4; width: 20px; height: 15px; 
-              display: inline-block; border: 1px solid black;"></span>
-        Over-mapped (&gt;105%)
-    </p>
-    <p style="margin: 5px 0;">
-        <span style="background: #cccccc; width: 20px; height: 15px; 
+        <span style="background: {COLORS[category]}; width: 20px; height: 15px; 
               display: inline-block; border: 1px solid black;"></span>
-        No data
+        {escape(label)}
     </p>
-</div>
+'''
+legend_html += '''</div>
 '''
 m.get_root().html.add_child(folium.Element(legend_html))
 
@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 """Create interactive map with LAU-1 boundaries and official data"""
 
+from html import escape
+
 import geopandas as gpd
 import folium
 import pandas as pd
 
+from classification import CATEGORIES, COLORS, categorize, completeness_color, legend_ranges
+
 print("=" * 70)
 print("Creating Interactive Map with LAU-1 Municipalities & Official Data")
 print("=" * 70)
@@ -15,6 +19,10 @@ print("1/3 Loading LAU-1 GeoJSON with municipality boundaries...")
 gdf = gpd.read_file('outputs/exports/latvia_lau1.geojson')
 print(f"✓ Loaded {len(gdf)} LAU-1 municipalities")
 print(f"  Columns: {list(gdf.columns)}")
+gdf['completeness_pct'] = pd.to_numeric(gdf['completeness_pct'], errors='coerce')
+gdf['category'] = categorize(gdf['completeness_pct'])
+gdf['fill_color'] = completeness_color(gdf['completeness_pct'])
+ranges = legend_ranges()
 print()
 
 # Create base map centered on Latvia
@@ -38,20 +46,6 @@ title_html = '''
 '''
 m.get_root().html.add_child(folium.Element(title_html))
 
-# Color function based on completeness
-def get_color(completeness):
-    if pd.isna(completeness):
-        return '#cccccc'
-    completeness = float(completeness)
-    if completeness >= 100:
-        return '#4575b4'  # Over-mapped (blue)
-    elif completeness >= 80:
-        return '#91cf60'  # Complete (green)
-    elif completeness >= 50:
-        return '#fc8d59'  # Partial (orange)
-    else:
-        return '#d73027'  # Low (red)
-
 print("3/3 Adding municipality boundaries with popups...")
 
 # Add GeoJSON features with popups
@@ -67,12 +61,7 @@ for idx, row in gdf.iterrows():
         except (ValueError, TypeError):
             official_km = None
     
-    completeness = row.get('completeness_pct', None)
-    if completeness is not None:
-        try:
-            completeness = float(completeness)
-        except (ValueError, TypeError):
-            completeness = None
+    completeness = row['completeness_pct']
     
     # Create popup with all available data
     popup_html = f"""
@@ -94,7 +83,7 @@ for idx, row in gdf.iterrows():
             </tr>
             <tr style="background-color: #f5f5f5;">
                 <td style="padding: 6px; font-weight: bold;">Completeness:</td>
-                <td style="padding: 6px; text-align: right; color: {get_color(completeness)}; font-weight: bold;">
+                <td style="padding: 6px; text-align: right; color: {row['fill_color']}; font-weight: bold;">
                     {f'{completeness:.1f}%' if not pd.isna(completeness) else 'N/A'}
                 </td>
             </tr>
@@ -103,22 +92,19 @@ for idx, row in gdf.iterrows():
         <div style="margin-top: 10px; padding-top: 10px; border-top: 1px solid #ddd; font-size: 11px; color: #666;">
             <p style="margin: 0;">
                 <strong>Interpretation:</strong><br>
-                • &lt;50%: Low coverage<br>
-                • 50-80%: Partial coverage<br>
-                • 80-100%: Complete coverage<br>
-                • &gt;100%: Over-mapped (OSM > official)
+                • {escape(ranges['Low'])}: Low coverage<br>
+                • {ranges['Partial']}: Partial coverage<br>
+                • {ranges['Complete']}: Complete coverage<br>
+                • {escape(ranges['Over-mapped'])}: Over-mapped (OSM > official)
             </p>
         </div>
     </div>
     """
     
-    # Determine color based on completeness
-    color = get_color(completeness)
-    
     # Add feature to map
     folium.GeoJson(
         row['geometry'],
-        style_function=lambda x, color=color: {
+        style_function=lambda x, color=row['fill_color']: {
             'fillColor': color,
             'color': '#333',
             'weight': 1,
@@ -136,23 +122,15 @@ legend_html = '''
      background-color: white; border: 2px solid grey; z-index: 9999;
      padding: 15px; border-radius: 5px; box-shadow: 2px 2px 6px rgba(0,0,0,0.2);">
     <h4 style="margin: 0 0 12px 0; color: #1976D2;">Road Completeness</h4>
+'''
+for category in CATEGORIES[:-1]:
+    legend_html += f'''
     <p style="margin: 0 0 8px 0; font-size: 12px;">
-        <i style="background-color: #d73027; width: 20px; height: 15px; display: inline-block;"></i>
-        &nbsp; Low (&lt;50%)
-    </p>
-    <p style="margin: 0 0 8px 0; font-size: 12px;">
-        <i style="background-color: #fc8d59; width: 20px; height: 15px; display: inline-block;"></i>
-        &nbsp; Partial (50-80%)
-    </p>
-    <p style="margin: 0 0 8px 0; font-size: 12px;">
-        <i style="background-color: #91cf60; width: 20px; height: 15px; display: inline-block;"></i>
-        &nbsp; Complete (80-100%)
+        <i style="background-color: {COLORS[category]}; width: 20px; height: 15px; display: inline-block;"></i>
+        &nbsp; {category} ({escape(ranges[category])})
     </p>
-    <p style="margin: 0; font-size: 12px;">
-        <i style="background-color: #4575b4; width: 20px; height: 15px; display: inline-block;"></i>
-        &nbsp; Over-mapped (&gt;100%)
-    </p>
-</div>
+'''
+legend_html += '''</div>
 '''
 m.get_root().html.add_child(folium.Element(legend_html))
 
@@ -176,15 +154,10 @@ print()
 # Show municipalities by completeness category
 print("Completeness Categories:")
 print("-" * 70)
-low = (gdf['completeness_pct'] < 50).sum()
-partial = ((gdf['completeness_pct'] >= 50) & (gdf['completeness_pct'] < 80)).sum()
-complete = ((gdf['completeness_pct'] >= 80) & (gdf['completeness_pct'] <= 100)).sum()
-overmapped = (gdf['completeness_pct'] > 100).sum()
-
-print(f"  Low (<50%):            {low} municipalities")
-print(f"  Partial (50-80%):      {partial} municipalities")
-print(f"  Complete (80-100%):    {complete} municipalities")
-print(f"  Over-mapped (>100%):   {overmapped} municipalities")
+counts = gdf['category'].value_counts()
+for category in CATEGORIES[:-1]:
+    label = f"{category} ({ranges[category]}):"
+    print(f"  {label:22s} {counts.get(category, 0)} municipalities")
 print()
 
 # Top 5 best and worst
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Pre-render the vector-tile pyramid into one MBTiles file
+
+Renders the roads and municipalities layers of the web app's vector tiles
+(vector_tiles.py) for every tile of zooms 5-16 over Latvia, in a process
+pool over blocks of tiles, and writes them to
+outputs/exports/latvia_tiles.mbtiles (see mbtiles.py). When that file
+exists, app.py serves /tiles/... from it with one SQLite lookup per tile;
+publishing a new snapshot means copying this one file.
+"""
+
+import argparse
+import os
+import time
+
+from completeness import COMPLETENESS_MAP
+from mbtiles import BLOCK_SIZE, MBTILES_FILE, MIN_ZOOM, build
+from road_tables import ROAD_TABLE
+from vector_tiles import MAX_ZOOM, TileStore
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--road-table', default=ROAD_TABLE,
+                    help='Road table of 04_spatial_join.py (GeoParquet)')
+parser.add_argument('--boundaries', default=COMPLETENESS_MAP,
+                    help='Municipality polygons with completeness')
+parser.add_argument('--output', default=MBTILES_FILE)
+parser.add_argument('--min-zoom', type=int, default=MIN_ZOOM)
+parser.add_argument('--max-zoom', type=int, default=MAX_ZOOM)
+parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                    help='Render tile blocks in this many processes')
+parser.add_argument('--block-size', type=int, default=BLOCK_SIZE,
+                    help='Tiles per side of one work unit')
+args = parser.parse_args()
+
+if not 0 <= args.min_zoom <= args.max_zoom <= MAX_ZOOM:
+    parser.error(f"zooms must satisfy 0 <= --min-zoom <= --max-zoom <= {MAX_ZOOM}")
+
+print("=" * 60)
+print("Vector Tile Pyramid")
+print("=" * 60)
+print()
+
+print("1/2 Loading and indexing layers...")
+store = TileStore.from_files(args.road_table, args.boundaries)
+if not store.layers:
+    raise SystemExit(f"✗ Neither {args.road_table} nor {args.boundaries} exists")
+for name, layer in store.layers.items():
+    print(f"✓ {name}: {len(layer.geometries):,} features")
+
+print(f"\n2/2 Rendering zooms {args.min_zoom}-{args.max_zoom} with {args.workers} workers...")
+started = time.perf_counter()
+last_report = [started]
+
+
+def progress(done, total, tiles):
+    now = time.perf_counter()
+    if done == total or now - last_report[0] >= 10:
+        last_report[0] = now
+        print(f"   block {done:,}/{total:,}: {tiles:,} tiles")
+
+
+tiles = build(args.output, store, args.min_zoom, args.max_zoom, workers=args.workers,
+              block_size=args.block_size, progress=progress)
+size_mb = os.path.getsize(args.output) / 1e6
+print(f"✓ Saved: {args.output} ({tiles:,} tiles, {size_mb:.1f} MB, "
+      f"{time.perf_counter() - started:.0f} s)")
+print()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Export boundary layers as TopoJSON
+
+Writes each GeoJSON input as <name>.topojson next to it: borders between
+neighbouring units are stored once as shared arcs, quantized to integers
+and delta-encoded (see topology.py). For the parish-level completeness map
+this is about a fifth of the GeoJSON size. --zoom additionally simplifies
+the arcs for that web-map zoom level.
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import geopandas as gpd
+
+from topology import QUANTIZATION, Topology, pixel_tolerance
+
+LAYERS = ['outputs/exports/completeness_map.geojson', 'outputs/exports/latvia_lau1.geojson']
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('inputs', nargs='*', default=LAYERS,
+                    help='GeoJSON polygon layers (default: parishes and LAU-1 municipalities)')
+parser.add_argument('--quantization', type=int, default=QUANTIZATION,
+                    help='Grid size per axis of the integer coordinates')
+parser.add_argument('--zoom', type=int,
+                    help='Simplify the shared arcs for this web-map zoom level')
+args = parser.parse_args()
+
+print("=" * 60)
+print("TopoJSON Export")
+print("=" * 60)
+print()
+
+for path in map(Path, args.inputs):
+    layer = gpd.read_file(path).to_crs('EPSG:4326')
+    properties = json.loads(layer.drop(columns=layer.geometry.name).to_json(orient='records'))
+    topology = Topology.from_geometries(layer.geometry.to_numpy())
+    arcs = None if args.zoom is None else topology.simplify(pixel_tolerance(args.zoom))
+    data = topology.to_topojson(properties, path.stem, arcs, args.quantization)
+
+    output = path.with_suffix('.topojson')
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    ratio = output.stat().st_size / path.stat().st_size
+    print(f"✓ Saved: {output} ({len(layer)} units, {len(topology.arcs):,} arcs, "
+          f"{ratio:.0%} of the GeoJSON)")
+
+print()
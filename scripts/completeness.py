@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Completeness rows shared by 05_calculate_completeness.py and incremental updates"""
+
+import pandas as pd
+
+from classification import categorize
+from road_tables import municipality_totals
+
+COMPLETENESS_CSV = 'outputs/exports/completeness.csv'
+COMPLETENESS_MAP = 'outputs/exports/completeness_map.geojson'
+
+
+def osm_totals(assignments, municipalities):
+    """OSM km (rounded to 10 m) and segment count per municipality name."""
+    totals = municipality_totals(assignments, municipalities)
+    totals = totals[['municipality_name', 'osm_road_km', 'num_segments']].copy()
+    totals['osm_road_km'] = totals['osm_road_km'].round(2)
+    return totals
+
+
+def completeness_table(osm_aggregated, official):
+    """Completeness per municipality name.
+
+    osm_aggregated has municipality_name, osm_road_km, num_segments;
+    official has municipality_name, road_length_km.
+    """
+    completeness = pd.merge(
+        osm_aggregated,
+        official,
+        on='municipality_name',
+        how='outer'
+    )
+
+    completeness['completeness_pct'] = (
+        completeness['osm_road_km'] / completeness['road_length_km'] * 100
+    ).round(2)
+    completeness['category'] = categorize(completeness['completeness_pct'])
+    completeness['difference_km'] = (completeness['osm_road_km'] - completeness['road_length_km']).round(2)
+    return completeness
+
+
+def build_completeness_map(municipalities, completeness):
+    """Municipality polygons with completeness and road density, in WGS84 for web maps."""
+    completeness_map = municipalities.merge(
+        completeness,
+        on='municipality_name',
+        how='left'
+    )
+    completeness_map['road_density_km_per_km2'] = (
+        completeness_map['osm_road_km'] / completeness_map['area_km2']
+    ).round(3)
+    return completeness_map.to_crs('EPSG:4326')
@@ -1,25 +1,18 @@
 import geopandas as gpd
-import pandas as pd
 import requests
 import json
 
+from name_resolver import load_resolver, print_report
+from trs020 import TRS020_FILE, load, official_lengths
+
 print("=" * 70)
 print("Creating LAU-1 GeoJSON (36 Official Municipalities)")
 print("=" * 70)
 
 # Load official road data from CSV (this is our source of truth for LAU-1)
 print("\n1. Loading official road data from CSV...")
-df_csv = pd.read_csv('data/raw/TRS020_20251218-012055.csv', encoding='utf-8', skiprows=1)
-
-# Extract municipalities from CSV (with " municipality" suffix)
-mun_csv = df_csv[df_csv['Territorial unit'].str.contains('municipality', case=False, na=False)].copy()
-mun_csv = mun_csv[mun_csv['Types of surface'] == 'Total'].copy()
-mun_csv = mun_csv[mun_csv['Indicator'] == 'Total'].copy()
-mun_csv['municipality_name'] = mun_csv['Territorial unit'].str.replace(' municipality', '', regex=False).str.strip()
-official_data = mun_csv[['municipality_name', '2024']].copy()
+official_data = official_lengths(load(TRS020_FILE), levels=['municipality'], name='short_name')
 official_data.columns = ['municipality_name', 'official_road_km']
-official_data['official_road_km'] = pd.to_numeric(official_data['official_road_km'], errors='coerce')
-official_data = official_data.drop_duplicates().reset_index(drop=True)
 print(f"   ✓ Found {len(official_data)} official municipalities")
 print(f"   Official municipalities: {', '.join(sorted(official_data['municipality_name'].tolist()))}")
 
@@ -30,14 +23,19 @@ print(f"   Current: {len(gdf)} features (includes old townships/parishes)")
 
 # Filter GeoJSON to only municipalities that match the 36 official ones
 print("\n3. Filtering GeoJSON to official LAU-1 municipalities...")
-gdf_lau1 = gdf[gdf['municipality_name'].isin(official_data['municipality_name'])].copy()
 print(f"   GeoJSON municipalities before filter: {gdf['municipality_name'].unique().tolist()[:5]}...")
 print(f"   Official municipalities: {official_data['municipality_name'].unique().tolist()[:5]}...")
-print(f"   ✓ Filtered to {len(gdf_lau1)} matched municipalities")
 
-# Merge with official data
+# Merge with official data on the resolved unit, so spelling differences
+# are reported instead of dropping municipalities
 print("\n4. Merging with official road data...")
-gdf_lau1 = gdf_lau1.merge(official_data, on='municipality_name', how='left')
+merged, report = load_resolver().merge(gdf.drop(columns='official_road_km', errors='ignore'),
+                                       official_data, 'municipality_name', 'municipality_name',
+                                       how='inner', levels=['municipality'])
+print_report(report, 'GeoJSON', 'official')
+gdf_lau1 = gpd.GeoDataFrame(merged.drop(columns=['unit', 'municipality_name_right']),
+                            geometry='geometry', crs=gdf.crs)
+print(f"   ✓ Matched {len(gdf_lau1)} municipalities")
 
 # Calculate completeness based on official data
 gdf_lau1['completeness_pct'] = (gdf_lau1['osm_road_km'] / gdf_lau1['official_road_km'] * 100).round(1)
@@ -2,7 +2,8 @@
 """Create filtered LAU-1 GeoJSON with ONLY municipalities that have official road data"""
 
 import geopandas as gpd
-import pandas as pd
+
+from trs020 import TRS020_FILE, load, official_lengths
 
 print("Creating filtered LAU-1 GeoJSON (36 municipalities + 7 state cities)")
 print("=" * 70)
@@ -12,27 +13,17 @@ gdf = gpd.read_file('outputs/exports/latvia_lau1.geojson')
 print(f"Original: {len(gdf)} features")
 
 # Load official CSV data
-df_csv = pd.read_csv('data/raw/TRS020_20251218-012055.csv', encoding='utf-8', skiprows=1)
-
-# Extract official municipalities (with "municipality" in name)
-mun_csv = df_csv[df_csv['Territorial unit'].str.contains('municipality', case=False, na=False)]
-mun_csv = mun_csv[mun_csv['Types of surface'] == 'Total']
-mun_csv = mun_csv[mun_csv['Indicator'] == 'Total']
+trs020 = load(TRS020_FILE)
 
-# Clean municipality names
-mun_csv['municipality_name'] = mun_csv['Territorial unit'].str.replace(' municipality', '', regex=False).str.strip()
-official_municipalities = sorted(mun_csv['municipality_name'].unique())
+# Official municipalities (without the " municipality" suffix) and state cities
+official_municipalities = sorted(official_lengths(trs020, levels=['municipality'],
+                                                  name='short_name')['municipality_name'])
 
 print(f"Official municipalities in CSV: {len(official_municipalities)}")
 for i, name in enumerate(official_municipalities, 1):
     print(f"  {i}. {name}")
 
-# Extract state cities (Riga, Daugavpils, etc.)
-city_csv = df_csv[~df_csv['Territorial unit'].str.contains('municipality|region|statistical', case=False, na=False)]
-city_csv = city_csv[city_csv['Types of surface'] == 'Total']
-city_csv = city_csv[city_csv['Indicator'] == 'Total']
-state_cities = sorted(city_csv['Territorial unit'].unique())
-
+state_cities = sorted(official_lengths(trs020, levels=['city'])['municipality_name'])
 print(f"\nState cities in CSV: {len(state_cities)}")
 for i, name in enumerate(state_cities, 1):
     print(f"  {i}. {name}")
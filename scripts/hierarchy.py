@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Administrative hierarchy and multi-level completeness rollups
+
+The hierarchy table (data/hierarchy.csv) has one row per unit:
+
+    unit, level, parent, local_name
+
+with levels country → region → municipality → parish. Units are named as
+in the official statistics files (e.g. "Aizkraukle municipality",
+"Jelgava", "Vidzeme"), so their published figures can be looked up by
+name; local_name is the Latvian name used by boundary files. Parish rows
+(pagasti and towns, the units of data/processed/municipalities.geojson)
+are derived spatially with leaf_rows().
+
+rollup() sums OSM km over every level in one grouped pass and resolves the
+official km of each unit: its published figure when there is one,
+otherwise the sum of its children.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from classification import categorize
+from name_resolver import HIERARCHY_TABLE, NameResolver
+
+LEVELS = ['country', 'region', 'municipality', 'parish']
+ROLLUPS_FILE = 'data/processed/rollups.json'
+
+
+def load_hierarchy(path=HIERARCHY_TABLE):
+    hierarchy = pd.read_csv(path, dtype=str, keep_default_na=False)
+    unknown = set(hierarchy['level']) - set(LEVELS)
+    if unknown:
+        raise ValueError(f"Unknown hierarchy level(s): {', '.join(sorted(unknown))}")
+    return hierarchy
+
+
+def leaf_rows(leaf_units, lau1, hierarchy, lau1_name='shapeName', leaf_name='municipality_name'):
+    """Parish rows for `leaf_units`, placed in the LAU-1 polygon holding their representative point.
+
+    LAU-1 polygon names are resolved to the municipality units (and state
+    cities) of the hierarchy with NameResolver. Returns (rows, unmatched leaf names).
+    """
+    lau1 = lau1.to_crs(leaf_units.crs)
+    resolver = NameResolver(hierarchy[hierarchy['level'] == 'municipality'])
+    lau1_units = resolver.resolve(lau1[lau1_name], levels=['municipality', 'city']).to_numpy()
+
+    points = shapely.point_on_surface(leaf_units.geometry.to_numpy())
+    point_idx, poly_idx = shapely.STRtree(lau1.geometry.to_numpy()).query(points, predicate='within')
+    parents = np.full(len(leaf_units), None, dtype=object)
+    parents[point_idx] = lau1_units[poly_idx]
+
+    names = leaf_units[leaf_name].to_numpy()
+    found = pd.notna(parents)
+    rows = pd.DataFrame({'unit': names[found], 'level': 'parish', 'parent': parents[found],
+                         'local_name': names[found]})
+    return rows.drop_duplicates(['unit', 'parent']), sorted(set(names[~found]))
+
+
+def _ancestors(hierarchy):
+    """One row per unit with its own key and the name of every ancestor level."""
+    parent = {(row.level, row.unit): row.parent for row in hierarchy.itertuples()}
+    paths = []
+    for row in hierarchy.itertuples():
+        path = {'level': row.level, 'unit': row.unit, row.level: row.unit}
+        depth = LEVELS.index(row.level)
+        name = row.unit
+        for up in range(depth - 1, -1, -1):
+            name = parent.get((LEVELS[up + 1], name))
+            if not name:
+                break
+            path[LEVELS[up]] = name
+        paths.append(path)
+    return pd.DataFrame(paths, columns=['level', 'unit'] + LEVELS)
+
+
+def rollup(hierarchy, leaves, official):
+    """Completeness of every unit at every level.
+
+    leaves: municipality_name, osm_road_km, num_segments per smallest unit
+    (matched to the deepest hierarchy level with that name);
+    official: municipality_name, road_length_km (published figures).
+    Returns (table, unmatched leaf names).
+    """
+    paths = _ancestors(hierarchy)
+
+    # Leaves match the deepest level that has a unit of that name
+    depth = paths['level'].map(LEVELS.index)
+    deepest = paths.assign(depth=depth).sort_values('depth', ascending=False)
+    deepest = deepest.drop_duplicates('unit').set_index('unit')
+    leaves = leaves.rename(columns={'municipality_name': 'unit'})
+    matched = leaves[leaves['unit'].isin(deepest.index)]
+    unmatched = sorted(set(leaves['unit']) - set(deepest.index))
+
+    # One grouped pass: every leaf contributes to itself and to each ancestor
+    leaf_paths = deepest.loc[matched['unit'], LEVELS].reset_index(drop=True)
+    values = matched[['osm_road_km', 'num_segments']].reset_index(drop=True)
+    long = pd.concat([leaf_paths, values], axis=1).melt(
+        id_vars=['osm_road_km', 'num_segments'], value_vars=LEVELS,
+        var_name='level', value_name='unit').dropna(subset=['unit'])
+    osm = long.groupby(['level', 'unit'])[['osm_road_km', 'num_segments']].sum()
+
+    table = hierarchy[['unit', 'level', 'parent']].copy()
+    table = table.join(osm, on=['level', 'unit'])
+    table['osm_road_km'] = table['osm_road_km'].fillna(0.0).round(2)
+    table['num_segments'] = table['num_segments'].fillna(0).astype('int64')
+
+    # Official km bottom-up: published figure, else the sum of the children
+    published = official.drop_duplicates('municipality_name').set_index(
+        'municipality_name')['road_length_km']
+    table['official_road_km'] = table['unit'].map(published)
+    table['official_source'] = np.where(table['official_road_km'].notna(), 'published', None)
+    for level, child in zip(LEVELS[-2::-1], LEVELS[:0:-1]):
+        children = table[(table['level'] == child) & table['official_road_km'].notna()]
+        sums = children.groupby('parent')['official_road_km'].sum()
+        fill = (table['level'] == level) & table['official_road_km'].isna() & table['unit'].isin(sums.index)
+        table.loc[fill, 'official_road_km'] = table.loc[fill, 'unit'].map(sums)
+        table.loc[fill, 'official_source'] = 'sum'
+
+    table['completeness_pct'] = (table['osm_road_km'] / table['official_road_km'] * 100).round(2)
+    table['category'] = categorize(table['completeness_pct'])
+    table['level_rank'] = table['level'].map(LEVELS.index)
+    table = table.sort_values(['level_rank', 'unit']).drop(columns='level_rank')
+    return table.reset_index(drop=True), unmatched
+
+
+def rollup_payload(table):
+    """{'levels': [...], 'units': {level: {unit: record}}} with each unit's children."""
+    children = table.groupby(['level', 'parent'])['unit'].apply(list).to_dict()
+    records = json.loads(table.to_json(orient='records'))
+    units = {level: {} for level in LEVELS}
+    for record in records:
+        level = record['level']
+        child_level = LEVELS[LEVELS.index(level) + 1] if level != LEVELS[-1] else None
+        record['children'] = children.get((child_level, record['unit']), [])
+        units[level][record['unit']] = record
+    return {'levels': LEVELS, 'units': units}
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""Incremental completeness: rejoin and re-aggregate only what changed
+
+Runs 04_spatial_join.py + 05_calculate_completeness.py for the
+municipalities that need it. The assignment table is kept per municipality
+(one part per municipality in data/processed/road_assignments_by_municipality/,
+apart from the parts of 04_spatial_join.py), and a dependency record in
+data/processed/incremental/ holds what every municipality was last
+computed from:
+
+  - a hash of its boundary (and name),
+  - a hash of every road (highway, length, geometry), keyed by osm_id,
+  - the official road length per municipality name.
+
+A changed boundary, or a road added, removed or changed inside a
+municipality (old or new geometry), rejoins that municipality only. A
+changed official figure only recomputes its completeness row. The affected
+rows are then patched into the completeness CSV and GeoJSON exports;
+every other row and feature is left as it is.
+
+The first run, a change of --mode, parts in the assignments directory that
+the last run did not write (or missing ones), or --full computes and
+writes everything.
+
+Usage:
+    python scripts/incremental_completeness.py
+    python scripts/incremental_completeness.py --roads data/processed/roads_parts --mode clip
+"""
+
+import argparse
+import hashlib
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from completeness import (COMPLETENESS_CSV, COMPLETENESS_MAP, build_completeness_map,
+                          completeness_table, osm_totals)
+from join_engine import join_roads
+from municipality_index import MunicipalityIndex, load_municipalities
+from road_extraction import METRIC_CRS, clear_parts, read_roads
+from road_tables import assignment_table, read_assignments
+
+STATE_DIR = 'data/processed/incremental'
+# Not 04_spatial_join.py's road_assignments: its numbered parts would be read
+# together with these and count every road twice
+ASSIGNMENTS_DIR = 'data/processed/road_assignments_by_municipality'
+DEFAULT_ROADS = 'data/processed/roads.geojson'
+DEFAULT_MUNICIPALITIES = 'data/processed/municipalities.geojson'
+DEFAULT_OFFICIAL = 'data/raw/official_road_stats.csv'
+
+
+def _digest(*parts):
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def boundary_digests(municipalities):
+    """{municipality_id: hash of name and geometry}."""
+    wkb = shapely.to_wkb(municipalities.geometry.to_numpy())
+    return {mid: _digest(name, geom) for mid, name, geom in
+            zip(municipalities['municipality_id'], municipalities['municipality_name'], wkb)}
+
+
+def road_digests(roads):
+    """osm_id and a 64-bit hash of highway, length and geometry per road."""
+    wkb = shapely.to_wkb(roads.geometry.to_numpy())
+    highway = roads['highway'] if 'highway' in roads.columns else [''] * len(roads)
+    length = roads['length_km'] if 'length_km' in roads.columns else [''] * len(roads)
+    digests = [int.from_bytes(hashlib.blake2b(f'{h}\0{km!r}\0'.encode() + g,
+                                              digest_size=8).digest(), 'little', signed=True)
+               for h, km, g in zip(highway, length, wkb)]
+    return pd.DataFrame({'osm_id': roads['osm_id'].to_numpy(dtype=np.int64),
+                         'digest': np.asarray(digests, dtype=np.int64)})
+
+
+def official_values(official):
+    official = official.drop_duplicates('municipality_name')
+    return {name: None if pd.isna(km) else float(km)
+            for name, km in zip(official['municipality_name'], official['road_length_km'])}
+
+
+def municipality_part(assignments_dir, municipality_id):
+    safe = re.sub(r'[^A-Za-z0-9_.-]', '_', str(municipality_id))
+    return Path(assignments_dir) / f'part-{safe}.parquet'
+
+
+class IncrementalCompleteness:
+    """Dependency record of the last run and the per-municipality recomputation."""
+
+    def __init__(self, state_dir=STATE_DIR, assignments_dir=ASSIGNMENTS_DIR,
+                 csv_path=COMPLETENESS_CSV, map_path=COMPLETENESS_MAP, mode='intersects'):
+        self.state_dir = Path(state_dir)
+        self.state_path = self.state_dir / 'state.json'
+        self.digests_path = self.state_dir / 'road_digests.parquet'
+        self.assignments_dir = Path(assignments_dir)
+        self.csv_path = Path(csv_path)
+        self.map_path = Path(map_path)
+        self.mode = mode
+        self.state = None
+        if self.state_path.exists():
+            self.state = json.loads(self.state_path.read_text(encoding='utf-8'))
+
+    def parts(self):
+        """Names of the assignment parts now in the assignments directory."""
+        return sorted(part.name for part in self.assignments_dir.glob('part-*.parquet'))
+
+    def needs_full(self):
+        return (self.state is None or self.state.get('mode') != self.mode
+                or self.state.get('parts') != self.parts()
+                or not self.digests_path.exists()
+                or not self.csv_path.exists() or not self.map_path.exists())
+
+    def changes(self, municipalities, roads, official, boundaries, digests):
+        """Ids to rejoin, ids removed, names whose rows are recomputed, and changed road count."""
+        old_boundaries = self.state['boundaries']
+        old_names = self.state['names']
+        rejoin = {mid for mid, value in boundaries.items() if old_boundaries.get(mid) != value}
+        removed = set(old_boundaries) - set(boundaries)
+
+        # Roads added, removed or changed since the last run
+        old_digests = pd.read_parquet(self.digests_path).astype({'digest': 'Int64'})
+        both = old_digests.merge(digests.astype({'digest': 'Int64'}), on='osm_id', how='outer',
+                                 suffixes=('_old', '_new'))
+        differs = both['digest_old'].ne(both['digest_new']).fillna(True)
+        changed = both.loc[differs.astype(bool), 'osm_id']
+        if len(changed):
+            # Municipalities they were assigned to, and those their new geometry touches
+            old = read_assignments(self.assignments_dir)
+            rejoin |= set(old.loc[old['osm_id'].isin(changed), 'municipality_id'])
+            index = MunicipalityIndex(municipalities)
+            lines = roads.loc[roads['osm_id'].isin(changed)].geometry.to_numpy()
+            _, muni_idx = index.assign(lines)
+            rejoin |= set(index.ids[muni_idx].tolist())
+        rejoin -= removed
+
+        names = dict(zip(municipalities['municipality_id'], municipalities['municipality_name']))
+        old_official = self.state['official']
+        new_official = official_values(official)
+        refresh = {name for name in set(old_official) | set(new_official)
+                   if old_official.get(name) != new_official.get(name)}
+        refresh |= {names[mid] for mid in rejoin}
+        refresh |= {old_names[mid] for mid in rejoin | removed if mid in old_names}
+        return rejoin, removed, refresh, len(changed)
+
+    def rejoin(self, municipalities, roads, municipality_ids):
+        """Recompute and store the assignment part of each given municipality."""
+        subset = municipalities[municipalities['municipality_id'].isin(municipality_ids)]
+        subset = subset.reset_index(drop=True)
+        if len(subset):
+            table, _ = join_roads(roads, MunicipalityIndex(subset), self.mode)
+        else:
+            table = assignment_table([], [], [])
+        for mid in municipality_ids:
+            part = table[table['municipality_id'] == mid].reset_index(drop=True)
+            part.to_parquet(municipality_part(self.assignments_dir, mid), index=False)
+
+    def update(self, municipalities, roads, official, full=False):
+        """Bring assignments and exports up to date; returns a summary dict."""
+        roads = roads.to_crs(METRIC_CRS).drop_duplicates('osm_id').reset_index(drop=True)
+        boundaries = boundary_digests(municipalities)
+        digests = road_digests(roads)
+
+        full = full or self.needs_full()
+        if full:
+            clear_parts(self.assignments_dir)
+            rejoin, removed, changed_roads = set(boundaries), set(), len(roads)
+            refresh = None
+        else:
+            rejoin, removed, refresh, changed_roads = self.changes(
+                municipalities, roads, official, boundaries, digests)
+
+        for mid in removed:
+            municipality_part(self.assignments_dir, mid).unlink(missing_ok=True)
+        if rejoin:
+            self.rejoin(municipalities, roads, rejoin)
+
+        if refresh is None:
+            self._write_all(municipalities, official)
+        elif refresh:
+            self._patch(municipalities, official, refresh)
+
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        digests.to_parquet(self.digests_path, index=False)
+        self.state = {
+            'mode': self.mode,
+            'boundaries': boundaries,
+            'names': dict(zip(municipalities['municipality_id'],
+                              municipalities['municipality_name'])),
+            'official': official_values(official),
+            'parts': self.parts(),
+        }
+        self.state_path.write_text(json.dumps(self.state, indent=2, ensure_ascii=False),
+                                   encoding='utf-8')
+        return {
+            'full': full,
+            'changed_roads': changed_roads,
+            'rejoined': len(rejoin),
+            'removed': len(removed),
+            'rows': len(boundaries) if refresh is None else len(refresh),
+        }
+
+    def _rows(self, municipalities, official, names=None):
+        assignments = read_assignments(self.assignments_dir)
+        if names is not None:
+            ids = municipalities.loc[municipalities['municipality_name'].isin(names),
+                                     'municipality_id']
+            assignments = assignments[assignments['municipality_id'].isin(ids)]
+            official = official[official['municipality_name'].isin(names)]
+        osm_aggregated = osm_totals(assignments, municipalities)
+        if names is not None:
+            # Municipalities without any road still get a row, as in a full run
+            missing = set(names) & set(municipalities['municipality_name'])
+            missing -= set(osm_aggregated['municipality_name'])
+            if missing:
+                osm_aggregated = pd.concat([osm_aggregated, pd.DataFrame(
+                    {'municipality_name': sorted(missing)})], ignore_index=True)
+        return completeness_table(osm_aggregated, official)
+
+    def _write_all(self, municipalities, official):
+        completeness = self._rows(municipalities, official)
+        self.csv_path.parent.mkdir(parents=True, exist_ok=True)
+        completeness.to_csv(self.csv_path, index=False)
+        build_completeness_map(municipalities, completeness).to_file(self.map_path,
+                                                                     driver='GeoJSON')
+
+    def _patch(self, municipalities, official, names):
+        rows = self._rows(municipalities, official, names).drop_duplicates('municipality_name')
+
+        # CSV: replace rows in place, drop vanished names, append new ones
+        existing = pd.read_csv(self.csv_path)
+        existing = existing[~existing['municipality_name'].isin(set(names) - set(rows['municipality_name']))]
+        existing = existing.reset_index(drop=True)
+        new = rows.set_index('municipality_name')
+        hit = existing['municipality_name'].isin(new.index)
+        for column in new.columns:
+            existing[column] = existing[column].astype(object)
+            existing.loc[hit, column] = new.loc[existing.loc[hit, 'municipality_name'], column].to_numpy()
+        added = rows[~rows['municipality_name'].isin(existing['municipality_name'])]
+        pd.concat([existing, added], ignore_index=True).to_csv(self.csv_path, index=False)
+
+        # GeoJSON: replace the features of the affected municipalities only
+        subset = municipalities[municipalities['municipality_name'].isin(names)]
+        features = json.loads(build_completeness_map(subset, rows).to_json(drop_id=True))['features']
+        by_name = {feature['properties']['municipality_name']: feature for feature in features}
+        collection = json.loads(self.map_path.read_text(encoding='utf-8'))
+        patched = []
+        for feature in collection['features']:
+            name = feature['properties'].get('municipality_name')
+            if name not in names:
+                patched.append(feature)
+            elif name in by_name:
+                patched.append(by_name.pop(name))
+        patched.extend(by_name.values())
+        collection['features'] = patched
+        self.map_path.write_text(json.dumps(collection, ensure_ascii=False), encoding='utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--roads', default=DEFAULT_ROADS,
+                        help='Roads GeoJSON, or parts directory from 02_extract_roads.py --streaming')
+    parser.add_argument('--municipalities', default=DEFAULT_MUNICIPALITIES)
+    parser.add_argument('--official', default=DEFAULT_OFFICIAL)
+    parser.add_argument('--mode', choices=['intersects', 'clip'], default='intersects')
+    parser.add_argument('--full', action='store_true', help='Recompute every municipality')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Incremental Completeness")
+    print("=" * 60)
+    print()
+
+    municipalities = load_municipalities(args.municipalities)
+    if 'area_km2' not in municipalities.columns:
+        municipalities['area_km2'] = municipalities.geometry.area / 1_000_000
+    roads = read_roads(args.roads)
+    official = pd.read_csv(args.official)
+
+    summary = IncrementalCompleteness(mode=args.mode).update(municipalities, roads, official,
+                                                             args.full)
+    if summary['full']:
+        print(f"✓ Full run: {summary['rejoined']} municipalities joined")
+    else:
+        print(f"✓ {summary['changed_roads']:,} roads changed")
+        print(f"✓ Rejoined {summary['rejoined']} municipalities, removed {summary['removed']}")
+        print(f"✓ Patched {summary['rows']} completeness rows")
+    print(f"✓ Saved: {COMPLETENESS_CSV}, {COMPLETENESS_MAP}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Chunked, parallel road-to-municipality join
+
+The MunicipalityIndex (STRtree over prepared polygons) is built once in the
+parent and handed to the worker processes when the pool starts. Road chunks
+are streamed through the pool: the parquet parts of a streaming extraction
+(each read by its worker), or Arrow batches of a single file (GeoJSON,
+GeoPackage, ...), which the parent reads once, front to back, since GDAL
+would otherwise parse the file from its start for every chunk. At most
+two chunks per worker are in flight.
+
+Each worker writes its assignments (the thin table of road_tables.py) as
+its own parquet part and, with a road table path, its roads as a part next
+to it; merge_road_table() then stores each road once. Memory stays at a
+few chunks per worker and the output is written while the join runs.
+"""
+
+import shutil
+from collections import deque
+from multiprocessing import Pool
+from pathlib import Path
+
+import geopandas as gpd
+import pyarrow.parquet as pq
+import shapely
+from pyogrio.raw import open_arrow
+
+from road_extraction import METRIC_CRS, read_part, clear_parts, part_path
+from road_tables import assignment_table, merge_road_table
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+_index = None
+_mode = None
+
+
+def road_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Chunk descriptors for a parts directory or a single vector file.
+
+    Parts are named and read by the workers; a single file is read here as
+    Arrow batches of chunk_size features, yielded as they are read.
+    """
+    source = Path(source)
+    if source.is_dir():
+        parts = sorted(source.glob('part-*.parquet'))
+        for part in parts:
+            if b'geo' not in (pq.read_schema(part).metadata or {}):
+                raise ValueError(f"{part} has no geometry (written with 02_extract_roads.py "
+                                 f"--no-geometry); the join needs road geometries")
+        yield from (('part', str(part)) for part in parts)
+        return
+    with open_arrow(str(source), batch_size=chunk_size) as (meta, reader):
+        geometry = meta['geometry_name'] or 'wkb_geometry'
+        for batch in reader:
+            yield ('batch', batch, geometry, meta['crs'])
+
+
+def read_chunk(chunk):
+    if chunk[0] == 'part':
+        roads = read_part(chunk[1])
+    else:
+        _, batch, geometry, crs = chunk
+        frame = batch.to_pandas()
+        roads = gpd.GeoDataFrame(frame.drop(columns=geometry),
+                                 geometry=shapely.from_wkb(frame[geometry].to_numpy()), crs=crs)
+    return roads.to_crs(METRIC_CRS)
+
+
+def join_roads(roads, index, mode='intersects'):
+    """Assignment table for metric-CRS roads, plus the number of roads assigned.
+
+    With mode='clip' each row carries the length inside the municipality;
+    with 'intersects' it carries the full road length.
+    """
+    lines = roads.geometry.to_numpy()
+    if mode == 'clip':
+        road_idx, muni_idx, km = index.clip(lines)
+    else:
+        road_idx, muni_idx = index.assign(lines)
+        if 'length_km' in roads.columns:
+            km = roads['length_km'].to_numpy()[road_idx]
+        else:
+            km = shapely.length(lines[road_idx]) / 1000.0
+
+    table = assignment_table(roads['osm_id'].to_numpy()[road_idx], index.ids[muni_idx], km)
+    return table, len(set(road_idx.tolist()))
+
+
+def _init_worker(index, mode):
+    global _index, _mode
+    _index = index
+    _mode = mode
+
+
+def _join_task(task):
+    number, chunk, out_dir, road_dir = task
+    roads = read_chunk(chunk)
+    table, assigned = join_roads(roads, _index, _mode)
+    table.to_parquet(part_path(out_dir, number), index=False)
+    if road_dir is not None:
+        roads.to_parquet(part_path(road_dir, number), index=False)
+    return len(roads), assigned, len(table)
+
+
+def run_join(source, index, out_dir, mode='intersects', workers=1, chunk_size=DEFAULT_CHUNK_SIZE,
+             progress=None, road_table=None):
+    """Join every road chunk of `source` and write assignment parts to out_dir.
+
+    With road_table, the roads are also stored there once each (GeoParquet,
+    as write_road_table). Returns (roads read, roads assigned, assignment rows).
+    """
+    clear_parts(out_dir)
+    road_dir = None
+    if road_table is not None:
+        road_dir = Path(road_table).with_name(Path(road_table).name + '.parts')
+        clear_parts(road_dir)
+
+    totals = [0, 0, 0]
+    done = 0
+
+    def collect(result):
+        nonlocal done
+        done += 1
+        for i, value in enumerate(result.get()):
+            totals[i] += value
+        if progress:
+            progress(done, totals)
+
+    with Pool(workers, initializer=_init_worker, initargs=(index, mode)) as pool:
+        # A bounded window, so a single file is not read ahead into memory
+        in_flight = deque()
+        for number, chunk in enumerate(road_chunks(source, chunk_size)):
+            if len(in_flight) >= 2 * workers:
+                collect(in_flight.popleft())
+            in_flight.append(pool.apply_async(_join_task, ((number, chunk, str(out_dir),
+                                                           road_dir and str(road_dir)),)))
+        while in_flight:
+            collect(in_flight.popleft())
+
+    if road_dir is not None:
+        merge_road_table(road_dir, road_table)
+        shutil.rmtree(road_dir)
+    return tuple(totals)
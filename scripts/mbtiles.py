@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""Prebuilt vector-tile pyramid in one MBTiles (SQLite) file
+
+build() renders every tile of the TileStore layers (roads and
+municipalities, see vector_tiles.py) for zooms MIN_ZOOM..MAX_ZOOM in a
+process pool and writes them, gzip-compressed with all layers per tile,
+into the tiles table of the MBTiles 1.3 schema. Each work unit is a block
+of BLOCK_SIZE × BLOCK_SIZE tiles of one zoom; blocks that no geometry
+touches are skipped with one STRtree query, and empty tiles are not
+stored. The file is written next to the target and renamed when complete,
+so a running server never sees a half-written pyramid.
+
+MBTiles reads it back with one indexed lookup per tile and has the
+TileStore interface, so app.py serves a published snapshot (one copied
+file) without any geometry work. Whole tiles pass the stored gzip
+through; single-layer tiles are cut out of them and kept in an LRU cache
+like TileStore's, so each is split and recompressed once:
+
+    source = MBTiles('outputs/exports/latvia_tiles.mbtiles')
+    data = source.tile('roads', 12, 2320, 1232)
+"""
+
+import gzip
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import ExitStack
+from multiprocessing import Pool
+from pathlib import Path
+
+import geopandas as gpd
+import shapely
+
+from vector_tiles import (MAX_ZOOM, TILE_CACHE_SIZE, WEB_MERCATOR, split_tile, tile_bounds,
+                          tile_range)
+
+MBTILES_FILE = 'outputs/exports/latvia_tiles.mbtiles'
+MIN_ZOOM = 5
+# Tiles per side of one work unit
+BLOCK_SIZE = 32
+GZIP_LEVEL = 6
+# "MPBX", as recommended by the MBTiles 1.3 spec
+APPLICATION_ID = 0x4D504258
+
+SCHEMA = """
+CREATE TABLE metadata (name TEXT, value TEXT);
+CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB);
+"""
+# Built after the inserts, which is faster than maintaining it during them
+TILE_INDEX = 'CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)'
+TILE_QUERY = 'SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?'
+
+
+def tms_row(z, y):
+    """MBTiles stores rows bottom-up (TMS); XYZ tile rows count from the top."""
+    return (1 << z) - 1 - y
+
+
+def store_bounds(store):
+    """(minx, miny, maxx, maxy) of all layers of a TileStore, in EPSG:3857."""
+    bounds = [layer.bounds() for layer in store.layers.values() if len(layer.geometries)]
+    return (min(b[0] for b in bounds), min(b[1] for b in bounds),
+            max(b[2] for b in bounds), max(b[3] for b in bounds))
+
+
+def tile_blocks(bounds, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, block_size=BLOCK_SIZE):
+    """(z, x0, y0, x1, y1) blocks of tiles covering bounds, highest zoom first."""
+    blocks = []
+    for z in range(max_zoom, min_zoom - 1, -1):
+        x0, y0, x1, y1 = tile_range(bounds, z)
+        for bx in range(x0, x1 + 1, block_size):
+            for by in range(y0, y1 + 1, block_size):
+                blocks.append((z, bx, by, min(bx + block_size - 1, x1),
+                               min(by + block_size - 1, y1)))
+    return blocks
+
+
+def render_block(store, block):
+    """(zoom_level, tile_column, tile_row, gzipped tile) rows of one block's non-empty tiles."""
+    z, x0, y0, x1, y1 = block
+    minx, _, _, maxy = tile_bounds(z, x0, y0)
+    _, miny, maxx, _ = tile_bounds(z, x1, y1)
+    area = shapely.box(minx, miny, maxx, maxy)
+    if not any(len(layer.tree.query(area)) for layer in store.layers.values()):
+        return []
+    rows = []
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            data = store.render(None, z, x, y)
+            if data:
+                rows.append((z, x, tms_row(z, y), gzip.compress(data, GZIP_LEVEL, mtime=0)))
+    return rows
+
+
+def _init_worker(store):
+    global _store
+    _store = store
+
+
+def _render_task(block):
+    return render_block(_store, block)
+
+
+def metadata(store, bounds, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+    """MBTiles metadata rows, with the TileJSON vector_layers of the store."""
+    area = gpd.GeoSeries([shapely.box(*bounds)], crs=WEB_MERCATOR)
+    west, south, east, north = area.to_crs('EPSG:4326').total_bounds
+    layers = [{'id': name, 'fields': layer.fields, 'minzoom': min_zoom, 'maxzoom': max_zoom}
+              for name, layer in store.layers.items()]
+    return {
+        'name': 'Latvia OSM road completeness',
+        'description': 'OSM roads and municipality completeness',
+        'format': 'pbf',
+        'type': 'overlay',
+        'minzoom': str(min_zoom),
+        'maxzoom': str(max_zoom),
+        'bounds': f'{west:.6f},{south:.6f},{east:.6f},{north:.6f}',
+        'center': f'{(west + east) / 2:.6f},{(south + north) / 2:.6f},{min(max_zoom, 8)}',
+        'json': json.dumps({'vector_layers': layers}, ensure_ascii=False),
+    }
+
+
+def build(path, store, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, workers=1,
+          block_size=BLOCK_SIZE, progress=None):
+    """Render the pyramid of a TileStore into an MBTiles file; returns the tiles written."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + '.partial')
+    partial.unlink(missing_ok=True)
+
+    bounds = store_bounds(store)
+    blocks = tile_blocks(bounds, min_zoom, max_zoom, block_size)
+    connection = sqlite3.connect(partial)
+    count = 0
+    try:
+        # The partial file is discarded on failure, so it needs no journal
+        connection.execute('PRAGMA journal_mode = OFF')
+        connection.execute('PRAGMA synchronous = OFF')
+        connection.execute(f'PRAGMA application_id = {APPLICATION_ID}')
+        connection.executescript(SCHEMA)
+        connection.executemany('INSERT INTO metadata VALUES (?, ?)',
+                               metadata(store, bounds, min_zoom, max_zoom).items())
+        with ExitStack() as stack:
+            if workers > 1:
+                pool = stack.enter_context(Pool(workers, initializer=_init_worker,
+                                                initargs=(store,)))
+                results = pool.imap_unordered(_render_task, blocks)
+            else:
+                results = (render_block(store, block) for block in blocks)
+            for done, rows in enumerate(results, start=1):
+                connection.executemany('INSERT INTO tiles VALUES (?, ?, ?, ?)', rows)
+                count += len(rows)
+                if progress:
+                    progress(done, len(blocks), count)
+        connection.execute(TILE_INDEX)
+        connection.commit()
+    except BaseException:
+        connection.close()
+        partial.unlink(missing_ok=True)
+        raise
+    connection.close()
+    os.replace(partial, path)
+    return count
+
+
+class MBTiles:
+    """Read-only tiles from an MBTiles file, with the TileStore interface.
+
+    `wrap(body, encoded)` gets the tile bytes and, for whole tiles, the
+    stored gzip variant ({'gzip': bytes}) so it needs no recompression.
+    The last `cache_size` single-layer tiles are kept, guarded by a lock.
+    """
+
+    def __init__(self, path, wrap=None, cache_size=TILE_CACHE_SIZE):
+        self.path = Path(path)
+        self.wrap = wrap
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.metadata = dict(self._connection().execute('SELECT name, value FROM metadata'))
+        vector_layers = json.loads(self.metadata.get('json', '{}')).get('vector_layers', [])
+        self.layers = [layer['id'] for layer in vector_layers]
+
+    def _connection(self):
+        # sqlite3 connections stay in the thread that opened them
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path.resolve().as_uri() + '?mode=ro', uri=True)
+            self._local.connection = connection
+        return connection
+
+    def tile_data(self, z, x, y):
+        """Stored gzip-compressed tile, or None where the pyramid has no data."""
+        row = self._connection().execute(TILE_QUERY, (z, x, tms_row(z, y))).fetchone()
+        return None if row is None else row[0]
+
+    def tile(self, layer, z, x, y):
+        """Tile of one layer (all layers for None); empty outside the stored pyramid."""
+        if layer is None:
+            data = self.tile_data(z, x, y)
+            body = b'' if data is None else gzip.decompress(data)
+            encoded = None if data is None else {'gzip': data}
+            return body if self.wrap is None else self.wrap(body, encoded)
+
+        key = (layer, z, x, y)
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+                return data
+        data = self.tile_data(z, x, y)
+        data = b'' if data is None else split_tile(gzip.decompress(data)).get(layer, b'')
+        if self.wrap is not None:
+            data = self.wrap(data, None)
+        with self._lock:
+            self._cache[key] = data
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return data
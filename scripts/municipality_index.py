@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Prepared STRtree over municipality polygons, shared by extraction stages"""
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from road_extraction import METRIC_CRS
+
+
+def load_municipalities(path):
+    """Municipality polygons in the metric CRS with name and id columns."""
+    municipalities = gpd.read_file(path).to_crs(METRIC_CRS)
+    municipalities = municipalities.rename(columns={
+        'shapeName': 'municipality_name',
+        'shapeID': 'municipality_id'
+    })
+    return municipalities.reset_index(drop=True)
+
+
+class MunicipalityIndex:
+    """Polygon index built once; assigns road geometries to municipalities."""
+
+    def __init__(self, municipalities):
+        self.names = municipalities['municipality_name'].to_numpy()
+        self.ids = municipalities['municipality_id'].to_numpy()
+        self._build(municipalities.geometry.to_numpy())
+
+    def _build(self, polygons):
+        self.polygons = polygons
+        shapely.prepare(self.polygons)
+        self.tree = shapely.STRtree(self.polygons)
+
+    def __getstate__(self):
+        # Prepared geometries do not survive pickling (spawn-based pools)
+        return {'names': self.names, 'ids': self.ids, 'polygons': self.polygons}
+
+    def __setstate__(self, state):
+        self.names = state['names']
+        self.ids = state['ids']
+        self._build(state['polygons'])
+
+    def __len__(self):
+        return len(self.polygons)
+
+    def assign(self, lines):
+        """(road_idx, muni_idx) pairs for every road/municipality that intersect."""
+        return self.tree.query(lines, predicate='intersects')
+
+    def clip(self, lines, with_geometry=False):
+        """Split roads at municipality borders.
+
+        Returns (road_idx, muni_idx, clipped_km[, pieces]) with one entry per
+        road/municipality pair that shares a non-zero length. Roads lying
+        strictly inside a polygon take the prepared-containment fast path
+        and keep their full length; only border-crossing roads are
+        intersected.
+        """
+        road_idx, muni_idx = self.tree.query(lines, predicate='intersects')
+        roads = lines[road_idx]
+        polygons = self.polygons[muni_idx]
+
+        inside = shapely.contains_properly(polygons, roads)
+        pieces = roads.copy()
+        crossing = np.flatnonzero(~inside)
+        pieces[crossing] = shapely.intersection(roads[crossing], polygons[crossing])
+        clipped_km = shapely.length(pieces) / 1000.0
+
+        # Roads that only touch a border share no length with that side
+        keep = clipped_km > 0
+        result = (road_idx[keep], muni_idx[keep], clipped_km[keep])
+        if with_geometry:
+            result += (pieces[keep],)
+        return result
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""Resolve municipality names in any spelling to the canonical LAU units
+
+Boundary files, the TRS020 exports and the older CSVs name the same unit in
+different ways:
+
+    Aizkraukle municipality    English, as in TRS020 and data/hierarchy.csv
+    Aizkraukle                 short form of the completeness CSVs
+    Aizkraukles novads         Latvian genitive, as in geoBoundaries
+    AIZKRAUKLES NOVADS         ... in any case, with or without diacritics
+    Kokneses novads            historic unit, merged in the 2021 reform
+
+NameResolver indexes the canonical units of the hierarchy table (unit,
+level, local_name) once under a normalized key: casefolded, diacritics
+stripped, notes in parentheses dropped and the type suffix (municipality,
+novads, city, statistical region, ...) split off. Each unit is indexed under
+its English and Latvian names, the genitive forms of its name and any
+historic names. Names that still do not match are looked up in a character
+trigram index, so small spelling differences resolve as well.
+
+resolve() works on whole columns: every distinct name is resolved once and
+the result is mapped back with the factorized codes, so a column of
+thousands of repeated names costs a dictionary lookup per distinct value.
+Names without a match come back as None and are listed by unmatched();
+merge() reports them instead of silently dropping rows.
+"""
+
+import re
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+HIERARCHY_TABLE = 'data/hierarchy.csv'
+LEVELS = ['country', 'region', 'city', 'municipality', 'parish']
+# Which unit a bare name ("Jelgava", "Riga") means when several share it
+BARE_NAME_PRIORITY = ['country', 'city', 'region', 'municipality', 'parish']
+FUZZY_THRESHOLD = 0.75
+
+# Type suffixes (on normalized keys) and the unit kind they imply
+SUFFIXES = [
+    ('statistical region', 'region'), ('statistiskais regions', 'region'),
+    ('regions', 'region'), ('region', 'region'),
+    ('municipality', 'municipality'), ('novads', 'municipality'),
+    ('state city', 'city'), ('valstspilseta', 'city'), ('city', 'city'), ('pilseta', 'city'),
+    ('parish', 'parish'), ('pagasts', 'parish'), ('pag', 'parish'),
+]
+KIND_LEVELS = {'region': 'region', 'municipality': 'municipality', 'city': 'city',
+               'parish': 'parish'}
+
+# Pre-2021 novads merged into the current municipalities
+HISTORIC_NAMES = {
+    'Daugavpils novads': 'Augšdaugava municipality',
+    'Ilūkstes novads': 'Augšdaugava municipality',
+    'Carnikavas novads': 'Ādaži municipality',
+    'Babītes novads': 'Mārupe municipality',
+    'Baldones novads': 'Ķekava municipality',
+    'Garkalnes novads': 'Ropaži municipality',
+    'Kokneses novads': 'Aizkraukle municipality',
+    'Jaunjelgavas novads': 'Aizkraukle municipality',
+    'Neretas novads': 'Aizkraukle municipality',
+    'Pļaviņu novads': 'Aizkraukle municipality',
+    'Skrīveru novads': 'Aizkraukle municipality',
+    'Aizputes novads': 'Dienvidkurzeme municipality',
+    'Durbes novads': 'Dienvidkurzeme municipality',
+    'Grobiņas novads': 'Dienvidkurzeme municipality',
+    'Nīcas novads': 'Dienvidkurzeme municipality',
+    'Pāvilostas novads': 'Dienvidkurzeme municipality',
+    'Priekules novads': 'Dienvidkurzeme municipality',
+    'Rucavas novads': 'Dienvidkurzeme municipality',
+    'Vaiņodes novads': 'Dienvidkurzeme municipality',
+    'Aknīstes novads': 'Jēkabpils municipality',
+    'Krustpils novads': 'Jēkabpils municipality',
+    'Salas novads': 'Jēkabpils municipality',
+    'Viesītes novads': 'Jēkabpils municipality',
+    'Amatas novads': 'Cēsis municipality',
+    'Jaunpiebalgas novads': 'Cēsis municipality',
+    'Līgatnes novads': 'Cēsis municipality',
+    'Pārgaujas novads': 'Cēsis municipality',
+    'Priekuļu novads': 'Cēsis municipality',
+    'Raunas novads': 'Cēsis municipality',
+    'Vecpiebalgas novads': 'Cēsis municipality',
+    'Beverīnas novads': 'Valmiera municipality',
+    'Burtnieku novads': 'Valmiera municipality',
+    'Kocēnu novads': 'Valmiera municipality',
+    'Mazsalacas novads': 'Valmiera municipality',
+    'Naukšēnu novads': 'Valmiera municipality',
+    'Rūjienas novads': 'Valmiera municipality',
+    'Strenču novads': 'Valmiera municipality',
+}
+
+_NOTES = re.compile(r'\([^)]*\)')
+_PUNCTUATION = re.compile(r'[^\w\s-]')
+_SPACES = re.compile(r'\s+')
+
+
+def name_key(name):
+    """Case- and diacritic-insensitive comparison key."""
+    decomposed = unicodedata.normalize('NFKD', str(name).strip().casefold())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def split_name(name):
+    """(base key, kind) of a name: "Aizkraukles novads" → ('aizkraukles', 'municipality').
+
+    kind is None when the name carries no type suffix.
+    """
+    text = name_key(_NOTES.sub(' ', str(name)))
+    text = _SPACES.sub(' ', _PUNCTUATION.sub(' ', text)).strip()
+    for suffix, kind in SUFFIXES:
+        if text.endswith(' ' + suffix):
+            return text[:-len(suffix) - 1].strip(), kind
+    return text, None
+
+
+def genitive_forms(base):
+    """Latvian genitive forms of a nominative base key ("cesis" → "cesu")."""
+    if base.endswith(('pils', 'us')):
+        return {base}
+    if base.endswith('is'):
+        return {base, base[:-2] + 'u'}
+    if base.endswith('s'):
+        return {base, base[:-1] + 'a'}
+    if base.endswith(('a', 'e')):
+        return {base, base + 's'}
+    if base.endswith('i'):
+        return {base, base[:-1] + 'u'}
+    return {base}
+
+
+def trigrams(key):
+    padded = f'  {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def short_name(unit):
+    """Unit name without the " municipality" suffix."""
+    return re.sub(r' municipality$', '', unit)
+
+
+class NameResolver:
+    """Normalized-key and trigram index over canonical unit names."""
+
+    def __init__(self, units, historic=None):
+        """units: DataFrame with unit, level and (optional) local_name columns.
+
+        Hierarchy units of level 'municipality' without the " municipality"
+        suffix are state cities and get level 'city'.
+        """
+        self.levels = {}
+        self._entries = {}
+        for row in units.itertuples():
+            level = row.level
+            if level == 'municipality' and not row.unit.endswith(' municipality'):
+                level = 'city'
+            self.levels[row.unit] = level
+            base, kind = split_name(row.unit)
+            self._add(base, kind, row.unit, 'exact')
+            local_name = getattr(row, 'local_name', '')
+            if isinstance(local_name, str) and local_name:
+                local_base, local_kind = split_name(local_name)
+                self._add(local_base, local_kind or kind, row.unit, 'local')
+            for form in genitive_forms(base) - {base}:
+                self._add(form, KIND_LEVELS.get(level, kind), row.unit, 'genitive')
+        for name, unit in (historic or {}).items():
+            if unit in self.levels:
+                base, kind = split_name(name)
+                self._add(base, kind, unit, 'historic')
+
+        # Trigram postings: trigram → array of base-key ids
+        self._bases = sorted(self._entries)
+        self._base_sizes = np.array([len(trigrams(b)) for b in self._bases])
+        postings = {}
+        for i, base in enumerate(self._bases):
+            for gram in trigrams(base):
+                postings.setdefault(gram, []).append(i)
+        self._postings = {gram: np.array(ids) for gram, ids in postings.items()}
+        self._memo = {}
+
+    @classmethod
+    def from_hierarchy(cls, path=HIERARCHY_TABLE, historic=HISTORIC_NAMES):
+        units = pd.read_csv(path, dtype=str, keep_default_na=False)
+        return cls(units, historic)
+
+    def _add(self, base, kind, unit, method):
+        entries = self._entries.setdefault(base, [])
+        if not any(e[0] == unit and e[1] == kind for e in entries):
+            entries.append((unit, kind, method))
+
+    def _pick(self, entries, kind, levels):
+        if levels is not None:
+            entries = [e for e in entries if self.levels[e[0]] in levels]
+        if kind is not None:
+            entries = [e for e in entries if e[1] == kind or KIND_LEVELS.get(kind) ==
+                       self.levels[e[0]]]
+        else:
+            # Historic names need their suffix ("Daugavpils" is the city, not
+            # the former Daugavpils novads); a bare name means a unit that is
+            # itself named without suffix when there is one
+            entries = [e for e in entries if e[2] != 'historic']
+            if any(e[1] is None for e in entries):
+                entries = [e for e in entries if e[1] is None]
+        if not entries:
+            return None
+        # `levels` only filters; ties between levels ("Riga" the city and
+        # the region) always go by BARE_NAME_PRIORITY
+        return min(entries, key=lambda e: BARE_NAME_PRIORITY.index(self.levels[e[0]]))
+
+    def _fuzzy(self, base, kind, levels):
+        grams = [self._postings[g] for g in trigrams(base) if g in self._postings]
+        if not grams:
+            return None, 0.0
+        shared = np.bincount(np.concatenate(grams), minlength=len(self._bases))
+        scores = 2.0 * shared / (self._base_sizes + len(trigrams(base)))
+        for i in np.argsort(-scores, kind='stable')[:5]:
+            if scores[i] < FUZZY_THRESHOLD:
+                break
+            entry = self._pick(self._entries[self._bases[i]], kind, levels)
+            if entry is not None:
+                return entry, float(scores[i])
+        return None, 0.0
+
+    def lookup(self, name, levels=None):
+        """(unit, level, method, score) for one name; unit is None without a match."""
+        memo_key = (name, None if levels is None else tuple(levels))
+        if memo_key in self._memo:
+            return self._memo[memo_key]
+        base, kind = split_name(name)
+        entry, score = None, 1.0
+        if base in self._entries:
+            entry = self._pick(self._entries[base], kind, levels)
+        if entry is None:
+            entry, score = self._fuzzy(base, kind, levels)
+            entry = entry and (entry[0], entry[1], 'fuzzy')
+        result = ((entry[0], self.levels[entry[0]], entry[2], score) if entry
+                  else (None, None, None, 0.0))
+        self._memo[memo_key] = result
+        return result
+
+    def match(self, names, levels=None):
+        """Per-name match table: name, unit, level, method, score."""
+        names = pd.Series(names, dtype=object).reset_index(drop=True)
+        codes, uniques = pd.factorize(names)
+        found = [self.lookup(name, levels) for name in uniques]
+        table = pd.DataFrame(found, columns=['unit', 'level', 'method', 'score'])
+        table = table.reindex(codes).reset_index(drop=True)
+        table.insert(0, 'name', names)
+        return table
+
+    def resolve(self, names, levels=None):
+        """Canonical unit per name (None where unmatched), aligned with `names`."""
+        index = names.index if isinstance(names, pd.Series) else None
+        codes, uniques = pd.factorize(pd.Series(names, dtype=object))
+        units = np.array([self.lookup(name, levels)[0] for name in uniques] + [None],
+                         dtype=object)
+        return pd.Series(units[codes], index=index, dtype=object)
+
+    def unmatched(self, names, levels=None):
+        """Sorted distinct names that resolve to no unit."""
+        names = pd.Series(names, dtype=object).dropna().unique()
+        return sorted(name for name in names if self.lookup(name, levels)[0] is None)
+
+    def merge(self, left, right, left_on, right_on, how='outer', levels=None):
+        """Merge two frames on the resolved unit of their name columns.
+
+        Returns (merged, report) where report lists, for each side, the names
+        that did not resolve and the units missing from the other side.
+        Columns of `right` that clash with `left` get a "_right" suffix.
+        """
+        left = left.assign(unit=self.resolve(left[left_on], levels))
+        right = right.assign(unit=self.resolve(right[right_on], levels))
+        report = {
+            'left_unmatched': self.unmatched(left[left_on], levels),
+            'right_unmatched': self.unmatched(right[right_on], levels),
+            'left_only': sorted(set(left['unit'].dropna()) - set(right['unit'].dropna())),
+            'right_only': sorted(set(right['unit'].dropna()) - set(left['unit'].dropna())),
+        }
+        merged = left.merge(right[right['unit'].notna()], on='unit', how=how,
+                            suffixes=('', '_right'))
+        return merged, report
+
+
+def print_report(report, left='left', right='right'):
+    """Print the unmatched names of a merge() report."""
+    for key, label in (('left_unmatched', f'{left} names without a unit'),
+                       ('right_unmatched', f'{right} names without a unit'),
+                       ('left_only', f'only in {left}'), ('right_only', f'only in {right}')):
+        if report[key]:
+            print(f"  ⚠ {len(report[key])} {label}: {', '.join(report[key][:10])}")
+
+
+def load_resolver(path=HIERARCHY_TABLE):
+    """Resolver over the hierarchy table, or None if the table is missing."""
+    return NameResolver.from_hierarchy(path) if Path(path).exists() else None
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""Multi-process road extraction over PBF block ranges
+
+A PBF file is a sequence of independently compressed blocks. The file is
+split into contiguous block ranges and each range is decoded in a worker
+process, in three passes:
+
+  1. refs:  the distinct node ids referenced by highway ways
+  2. nodes: node coordinates, filtered to the ids of pass 1, which the
+            parent keeps as one sorted table
+  3. ways:  highway ways with their node references, range by range
+
+Each range's ways are resolved against the node table with a sorted-array
+lookup and emitted as soon as they arrive, in file order and in batches of
+the same size as a serial run, so the output is identical to it. Memory
+holds the node table (24 bytes per highway node) and the ways of about
+one range per worker, not the ways of the whole file; pass 3 decodes the
+ways a second time for that.
+"""
+
+import struct
+from array import array
+from collections import deque
+from multiprocessing import Pool
+
+import numpy as np
+import osmium
+
+from road_extraction import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_NODE_INDEX,
+    SKIP_HIGHWAY_TYPES,
+    RoadBatch,
+    StreamingRoadHandler,
+    apply_with_locations,
+)
+
+COORDINATE_PRECISION = 10_000_000  # osmium stores lon/lat as fixed-point ints
+CHUNKS_PER_WORKER = 4
+
+
+def _read_varint(buf, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _parse_blob_header(buf):
+    """Return (type, datasize) from a serialized BlobHeader message."""
+    pos = 0
+    blob_type = None
+    datasize = None
+    while pos < len(buf):
+        key, pos = _read_varint(buf, pos)
+        field, wire_type = key >> 3, key & 0x07
+        if wire_type == 0:
+            value, pos = _read_varint(buf, pos)
+            if field == 3:
+                datasize = value
+        elif wire_type == 2:
+            length, pos = _read_varint(buf, pos)
+            if field == 1:
+                blob_type = buf[pos:pos + length].decode('ascii')
+            pos += length
+        else:
+            raise ValueError(f"Unexpected wire type {wire_type} in BlobHeader")
+    return blob_type, datasize
+
+
+def scan_pbf_blocks(path):
+    """Return the (offset, size) of the header block and of every data block."""
+    header = None
+    blocks = []
+    with open(path, 'rb') as f:
+        offset = 0
+        while True:
+            prefix = f.read(4)
+            if not prefix:
+                break
+            (header_size,) = struct.unpack('>I', prefix)
+            blob_type, datasize = _parse_blob_header(f.read(header_size))
+            f.seek(datasize, 1)
+            size = 4 + header_size + datasize
+            if blob_type == 'OSMHeader':
+                header = (offset, size)
+            elif blob_type == 'OSMData':
+                blocks.append((offset, size))
+            offset += size
+    if header is None:
+        raise ValueError(f"{path} has no OSMHeader block")
+    return header, blocks
+
+
+def split_block_ranges(blocks, n_chunks):
+    """Split the data blocks into at most n_chunks contiguous byte ranges."""
+    if not blocks:
+        return []
+    n_chunks = max(1, min(n_chunks, len(blocks)))
+    bounds = np.linspace(0, len(blocks), n_chunks + 1).astype(int)
+    ranges = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        first_offset = blocks[start][0]
+        last_offset, last_size = blocks[end - 1]
+        ranges.append((first_offset, last_offset + last_size - first_offset))
+    return ranges
+
+
+def _read_range(path, header, block_range):
+    """Header block + block range as an in-memory PBF osmium can parse."""
+    with open(path, 'rb') as f:
+        f.seek(header[0])
+        data = f.read(header[1])
+        f.seek(block_range[0])
+        data += f.read(block_range[1])
+    return data
+
+
+class WayRefCollector(osmium.SimpleHandler):
+    """Highway ways with their node id lists."""
+
+    def __init__(self):
+        super().__init__()
+        self.ids = array('q')
+        self.highway = []
+        self.name = []
+        self.surface = []
+        self.ref = []
+        self.sizes = array('q')
+        self.refs = array('q')
+
+    def way(self, w):
+        if 'highway' not in w.tags:
+            return
+        highway_type = w.tags['highway']
+        if highway_type in SKIP_HIGHWAY_TYPES:
+            return
+        refs = [n.ref for n in w.nodes]
+        if len(refs) < 2:
+            return
+        self.ids.append(w.id)
+        self.highway.append(highway_type)
+        self.name.append(w.tags.get('name', None))
+        self.surface.append(w.tags.get('surface', None))
+        self.ref.append(w.tags.get('ref', None))
+        self.sizes.append(len(refs))
+        self.refs.extend(refs)
+
+
+class NodeCollector(osmium.SimpleHandler):
+    """Fixed-point coordinates of every valid node in a block range."""
+
+    def __init__(self):
+        super().__init__()
+        self.ids = array('q')
+        self.x = array('q')
+        self.y = array('q')
+
+    def node(self, n):
+        location = n.location
+        if location.valid():
+            self.ids.append(n.id)
+            self.x.append(location.x)
+            self.y.append(location.y)
+
+
+def _collect_ways(task):
+    path, header, block_range = task
+    handler = WayRefCollector()
+    handler.apply_buffer(_read_range(path, header, block_range), 'pbf')
+    return {
+        'ids': np.frombuffer(handler.ids, dtype=np.int64),
+        'highway': handler.highway,
+        'name': handler.name,
+        'surface': handler.surface,
+        'ref': handler.ref,
+        'sizes': np.frombuffer(handler.sizes, dtype=np.int64),
+        'refs': np.frombuffer(handler.refs, dtype=np.int64),
+    }
+
+
+def _collect_refs(task):
+    path, header, block_range = task
+    handler = WayRefCollector()
+    handler.apply_buffer(_read_range(path, header, block_range), 'pbf')
+    return np.unique(np.frombuffer(handler.refs, dtype=np.int64))
+
+
+def _collect_nodes(task):
+    path, header, block_range = task
+    handler = NodeCollector()
+    handler.apply_buffer(_read_range(path, header, block_range), 'pbf')
+    return (np.frombuffer(handler.ids, dtype=np.int64),
+            np.frombuffer(handler.x, dtype=np.int64),
+            np.frombuffer(handler.y, dtype=np.int64))
+
+
+def _concat(arrays, dtype=np.int64):
+    return np.concatenate(arrays) if arrays else np.empty(0, dtype=dtype)
+
+
+def _isin_sorted(values, sorted_unique):
+    """np.isin for a sorted unique lookup array, via binary search."""
+    if len(sorted_unique) == 0:
+        return np.zeros(len(values), dtype=bool)
+    pos = np.searchsorted(sorted_unique, values)
+    pos = np.minimum(pos, len(sorted_unique) - 1)
+    return sorted_unique[pos] == values
+
+
+def _resolve(part, node_ids, node_x, node_y):
+    """RoadBatch of one range's ways, located in the sorted node table.
+
+    Ways with a missing node are dropped, like the InvalidLocationError case
+    of the serial handler.
+    """
+    ids, sizes, refs = part['ids'], part['sizes'], part['refs']
+    if len(ids) == 0 or len(node_ids) == 0:
+        return RoadBatch.concat([])
+    pos = np.minimum(np.searchsorted(node_ids, refs), len(node_ids) - 1)
+    found = node_ids[pos] == refs
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    way_ok = np.logical_and.reduceat(found, starts)
+    point_ok = np.repeat(way_ok, sizes)
+    keep = np.flatnonzero(way_ok)
+    return RoadBatch(
+        ids[keep],
+        [part['highway'][i] for i in keep],
+        [part['name'][i] for i in keep],
+        np.concatenate(([0], np.cumsum(sizes[keep]))),
+        node_x[pos[point_ok]] / COORDINATE_PRECISION,
+        node_y[pos[point_ok]] / COORDINATE_PRECISION,
+        refs[point_ok],
+        [part['surface'][i] for i in keep],
+        [part['ref'][i] for i in keep],
+    )
+
+
+def extract_parallel(input_path, on_batch, batch_size, workers):
+    """Extract highway ways with a process pool, calling on_batch in file order.
+
+    Batches are RoadBatch objects of batch_size ways (the last one smaller),
+    as produced by StreamingRoadHandler. Returns the number of roads extracted.
+    """
+    header, blocks = scan_pbf_blocks(input_path)
+    ranges = split_block_ranges(blocks, workers * CHUNKS_PER_WORKER)
+    tasks = [(str(input_path), header, block_range) for block_range in ranges]
+
+    count = 0
+    with Pool(workers) as pool:
+        needed = np.unique(_concat(pool.map(_collect_refs, tasks)))
+
+        node_ids, node_x, node_y = [], [], []
+        for part_ids, part_x, part_y in pool.imap(_collect_nodes, tasks):
+            keep = _isin_sorted(part_ids, needed)
+            node_ids.append(part_ids[keep])
+            node_x.append(part_x[keep])
+            node_y.append(part_y[keep])
+        del needed
+        node_ids = _concat(node_ids)
+        order = np.argsort(node_ids, kind='stable')
+        node_ids = node_ids[order]
+        node_x = _concat(node_x)[order]
+        node_y = _concat(node_y)[order]
+        del order
+
+        # Ways of each range in file order, with at most one range per worker
+        # decoded ahead (imap would queue every finished range in memory)
+        pending = RoadBatch.concat([])
+        in_flight = deque()
+        for i in range(len(tasks)):
+            while len(in_flight) <= workers and i + len(in_flight) < len(tasks):
+                in_flight.append(pool.apply_async(_collect_ways, (tasks[i + len(in_flight)],)))
+            part = in_flight.popleft().get()
+            pending = RoadBatch.concat([pending, _resolve(part, node_ids, node_x, node_y)])
+            del part
+            full = len(pending) - len(pending) % batch_size
+            for start in range(0, full, batch_size):
+                on_batch(pending.slice(start, start + batch_size))
+            count += full
+            pending = pending.slice(full, len(pending))
+    if len(pending):
+        on_batch(pending)
+        count += len(pending)
+    return count
+
+
+def read_road_batches(input_path, on_batch, batch_size, workers, keep_refs=False,
+                      node_index=DEFAULT_NODE_INDEX, node_index_file=None):
+    """Feed RoadBatch objects to on_batch, serially or with a process pool.
+
+    Parallel batches always carry node ids; serial ones only with keep_refs.
+    The node index options apply to serial reads (the parallel reader
+    resolves locations itself).
+    """
+    if workers > 1:
+        print(f"   Using {workers} worker processes...")
+        extract_parallel(input_path, on_batch, batch_size or DEFAULT_BATCH_SIZE, workers)
+    else:
+        handler = StreamingRoadHandler(on_batch, batch_size=batch_size, keep_refs=keep_refs)
+        if apply_with_locations(handler, input_path, node_index, node_index_file):
+            print(f"   Reused node locations from {node_index_file}")
+        handler.flush()
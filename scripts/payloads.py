@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Pre-serialized JSON responses for the web app
+
+A Payload serializes a dataset once and answers requests without touching
+the data again: the client gets the smallest encoding it accepts (br when
+the brotli package is installed, gzip), and a matching If-None-Match gets
+an empty 304. Only the negotiated encoding is compressed, on the first
+request that asks for it, and kept for later ones; payloads built for a
+single response (cache=False) compress that once and keep nothing. The
+ETag is a hash of the uncompressed JSON, so it only changes when the
+content does.
+
+FragmentIndex keeps one serialized JSON fragment per record, indexed by
+name and id, so single and batch lookups join stored bytes in O(1) per
+record instead of filtering and serializing the dataset per request.
+"""
+
+import gzip
+import hashlib
+import json
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+# Smaller bodies are sent as they are; the headers would eat the savings
+MIN_COMPRESS_SIZE = 1024
+GZIP_LEVEL = 6
+# Payloads are compressed while a request waits, where quality 11 is far too
+# slow for bodies of a few MB; 5 is about as fast as gzip and still smaller
+BROTLI_QUALITY = 5
+# Preferred order when the client accepts several encodings equally
+ENCODINGS = ['br', 'gzip']
+
+
+def dumps(data):
+    """Compact UTF-8 JSON bytes, as served by the API."""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class Payload:
+    """One response body serialized once, compressed per encoding on demand.
+
+    `encoded` holds variants compressed ahead of time (gzip tiles from
+    MBTiles), which are the only ones offered then. With cache=False the
+    payload answers one request and keeps no compressed variant.
+    """
+
+    def __init__(self, body, mimetype='application/json', encoded=None, cache=True):
+        self.body = body if isinstance(body, bytes) else dumps(body)
+        self.mimetype = mimetype
+        self.cache = cache
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+        self.encoded = dict(encoded or {})
+        if self.encoded:
+            self.encodings = set(self.encoded)
+        elif len(self.body) >= MIN_COMPRESS_SIZE:
+            self.encodings = {'gzip'} if brotli is None else {'gzip', 'br'}
+        else:
+            self.encodings = set()
+
+    def encoding_for(self, accept_encodings):
+        """Best encoding the client accepts, or None for the raw body."""
+        best, best_quality = None, 0
+        for encoding in ENCODINGS:
+            quality = accept_encodings[encoding]
+            if encoding in self.encodings and quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def compressed(self, encoding):
+        """Body in an encoding, compressed on first use (and kept if cached)."""
+        data = self.encoded.get(encoding)
+        if data is None:
+            if encoding == 'br':
+                data = brotli.compress(self.body, quality=BROTLI_QUALITY)
+            else:
+                data = gzip.compress(self.body, GZIP_LEVEL, mtime=0)
+            if self.cache:
+                self.encoded[encoding] = data
+        return data
+
+    def response(self, request):
+        """Response for a Flask request: 304, or the body in the best encoding."""
+        headers = {'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+        # Compressed variants share the ETag, which makes it weak
+        weak = bool(self.encodings)
+        if request.if_none_match.contains_weak(self.etag):
+            response = Response(status=304, headers=headers)
+            response.set_etag(self.etag, weak=weak)
+            return response
+        encoding = self.encoding_for(request.accept_encodings)
+        body = self.body if encoding is None else self.compressed(encoding)
+        if encoding is not None:
+            headers['Content-Encoding'] = encoding
+        response = Response(body, mimetype=self.mimetype, headers=headers)
+        response.set_etag(self.etag, weak=weak)
+        return response
+
+
+class FragmentIndex:
+    """Records serialized once each, found by name or id in constant time.
+
+    `name` and `id` extract the lookup values of a record (id is optional);
+    `aliases` optionally gives further names a record is found by. Names
+    are compared by `key`, e.g. a case-insensitive normalization.
+    """
+
+    def __init__(self, records, name, id=None, key=str, aliases=None):
+        self.key = key
+        self.fragments = [dumps(record) for record in records]
+        self.names = {}
+        self.ids = {}
+        for position, record in enumerate(records):
+            value = name(record)
+            if value is not None:
+                self.names.setdefault(key(value), []).append(position)
+                for alias in (aliases(value) if aliases is not None else ()):
+                    positions = self.names.setdefault(key(alias), [])
+                    if position not in positions:
+                        positions.append(position)
+            value = None if id is None else id(record)
+            if value is not None:
+                self.ids.setdefault(str(value), []).append(position)
+
+    def positions(self, names=(), ids=()):
+        """Positions of the records with any of the names or ids, in request order."""
+        positions = []
+        for value in names:
+            positions.extend(self.names.get(self.key(value), ()))
+        for value in ids:
+            positions.extend(self.ids.get(str(value), ()))
+        return list(dict.fromkeys(positions))
+
+    def find(self, names=(), ids=()):
+        """Fragments of the records with any of the names or ids, in request order."""
+        return [self.fragments[position] for position in self.positions(names, ids)]
+
+    @staticmethod
+    def array(fragments):
+        """JSON array bytes of fragments."""
+        return b'[' + b','.join(fragments) + b']'
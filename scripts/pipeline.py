@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""Cached pipeline runner for the analysis stages
+
+Every stage declares the files it reads and writes. The runner derives the
+stage graph from those paths, hashes each stage's command, code and
+inputs, and skips a stage when that hash matches the last successful run
+and its outputs still exist. Stages whose upstream stages are done run
+concurrently (e.g. road extraction and municipality processing), so a
+change to the map script only reruns the map.
+
+    python scripts/pipeline.py                      # everything that is stale
+    python scripts/pipeline.py interactive_map      # one stage and its upstream
+    python scripts/pipeline.py --dry-run
+    python scripts/pipeline.py --force spatial_join
+
+File hashes are cached by size and mtime in the state file, so unchanged
+large inputs (the PBF) are not re-read on every run.
+"""
+
+import argparse
+import hashlib
+import json
+import subprocess
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+STATE_FILE = 'data/processed/.pipeline_state.json'
+TRS020_FILE = 'data/raw/TRS020_20251218-012055.csv'
+
+
+class Stage:
+    """One pipeline step: a command plus the paths it reads and writes.
+
+    `code` lists source files the command depends on besides the paths in
+    `command` (imported helper modules); they are hashed like inputs.
+    """
+
+    def __init__(self, name, command, inputs=(), outputs=(), code=()):
+        self.name = name
+        self.command = list(command)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.code = list(code)
+
+
+def _script(name, *args):
+    return [sys.executable, f'scripts/{name}', *args]
+
+
+def _modules(*names):
+    return [f'scripts/{name}.py' for name in names]
+
+
+STAGES = [
+    Stage('download', ['bash', 'scripts/01_download_data.sh'],
+          code=['scripts/01_download_data.sh'],
+          outputs=['data/raw/latvia-latest.osm.pbf', 'data/raw/municipalities.geojson',
+                   'data/raw/lau1.geojson', 'data/raw/official_road_stats.csv']),
+    Stage('extract_roads', _script('02_extract_roads.py'),
+          code=['scripts/02_extract_roads.py']
+          + _modules('road_extraction', 'parallel_extraction', 'road_aggregation',
+                     'municipality_index'),
+          inputs=['data/raw/latvia-latest.osm.pbf'],
+          outputs=['data/processed/roads.geojson']),
+    Stage('municipalities', _script('03_process_municipalities.py'),
+          code=['scripts/03_process_municipalities.py'],
+          inputs=['data/raw/municipalities.geojson'],
+          outputs=['data/processed/municipalities.geojson']),
+    Stage('spatial_join', _script('04_spatial_join.py'),
+          code=['scripts/04_spatial_join.py']
+          + _modules('join_engine', 'municipality_index', 'road_extraction', 'road_tables'),
+          inputs=['data/processed/roads.geojson', 'data/processed/municipalities.geojson'],
+          outputs=['data/processed/road_table.parquet', 'data/processed/road_assignments']),
+    Stage('completeness', _script('05_calculate_completeness.py'),
+          code=['scripts/05_calculate_completeness.py']
+          + _modules('completeness', 'classification', 'road_tables'),
+          inputs=['data/processed/road_assignments', 'data/processed/municipalities.geojson',
+                  'data/raw/official_road_stats.csv'],
+          outputs=['outputs/exports/completeness.csv',
+                   'outputs/exports/completeness_map.geojson']),
+    Stage('category_cube', _script('05_calculate_category_cube.py'),
+          code=['scripts/05_calculate_category_cube.py']
+          + _modules('road_categories', 'completeness', 'classification', 'road_tables', 'trs020',
+                     'name_resolver'),
+          inputs=['data/processed/road_assignments', 'data/processed/road_table.parquet',
+                  'data/processed/municipalities.geojson', 'data/hierarchy.csv', TRS020_FILE],
+          outputs=['data/processed/completeness_cube.csv']),
+    Stage('rollups', _script('06_rollup_hierarchy.py'),
+          code=['scripts/06_rollup_hierarchy.py'] + _modules('hierarchy', 'completeness', 'classification',
+                                                      'trs020', 'name_resolver'),
+          inputs=['outputs/exports/completeness.csv', 'data/hierarchy.csv',
+                  TRS020_FILE, 'data/processed/municipalities.geojson',
+                  'data/raw/lau1.geojson'],
+          outputs=['data/processed/rollups.json']),
+    Stage('lau1', _script('create_lau1_municipalities.py'),
+          code=['scripts/create_lau1_municipalities.py'] + _modules('trs020', 'name_resolver'),
+          inputs=['outputs/exports/completeness_map.geojson', TRS020_FILE, 'data/hierarchy.csv'],
+          outputs=['outputs/exports/latvia_lau1.geojson']),
+    Stage('interactive_map', _script('07_create_interactive_map.py'),
+          code=['scripts/07_create_interactive_map.py'] + _modules('classification'),
+          inputs=['outputs/exports/latvia_lau1.geojson'],
+          outputs=['outputs/maps/interactive_map.html']),
+    Stage('tile_pyramid', _script('09_build_tile_pyramid.py'),
+          code=['scripts/09_build_tile_pyramid.py']
+          + _modules('mbtiles', 'vector_tiles', 'completeness', 'road_tables'),
+          inputs=['data/processed/road_table.parquet', 'outputs/exports/completeness_map.geojson'],
+          outputs=['outputs/exports/latvia_tiles.mbtiles']),
+    Stage('topojson', _script('10_export_topojson.py'),
+          code=['scripts/10_export_topojson.py'] + _modules('topology'),
+          inputs=['outputs/exports/completeness_map.geojson', 'outputs/exports/latvia_lau1.geojson'],
+          outputs=['outputs/exports/completeness_map.topojson',
+                   'outputs/exports/latvia_lau1.topojson']),
+]
+
+
+def _sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Pipeline:
+    """Runs stages in dependency order, skipping those whose hash is unchanged."""
+
+    def __init__(self, stages, root=ROOT, state_file=STATE_FILE):
+        self.root = Path(root)
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_path = self.root / state_file
+        self.state = {'stages': {}, 'files': {}}
+        if self.state_path.exists():
+            self.state = json.loads(self.state_path.read_text(encoding='utf-8'))
+        self._lock = threading.Lock()
+
+        producers = {}
+        for stage in stages:
+            for output in stage.outputs:
+                if output in producers:
+                    raise ValueError(f"{output} is written by both {producers[output]} "
+                                     f"and {stage.name}")
+                producers[output] = stage.name
+        self.upstream = {stage.name: sorted({producers[path] for path in stage.inputs
+                                             if path in producers} - {stage.name})
+                         for stage in stages}
+        self.order = self._topological_order()
+
+    def _topological_order(self):
+        order, visiting, done = [], set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage cycle through {name}")
+            visiting.add(name)
+            for dependency in self.upstream[name]:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def selected(self, targets=None):
+        """`targets` and everything upstream of them, in run order."""
+        if not targets:
+            return list(self.order)
+        unknown = set(targets) - set(self.stages)
+        if unknown:
+            raise ValueError(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+        needed, pending = set(), list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in needed:
+                needed.add(name)
+                pending.extend(self.upstream[name])
+        return [name for name in self.order if name in needed]
+
+    def file_digest(self, path):
+        """Content hash of a file or directory; None if it does not exist."""
+        full = self.root / path
+        if full.is_dir():
+            digest = hashlib.sha256()
+            for child in sorted(p for p in full.rglob('*') if p.is_file()):
+                digest.update(str(child.relative_to(full)).encode())
+                digest.update(self.file_digest(child.relative_to(self.root)).encode())
+            return digest.hexdigest()
+        if not full.exists():
+            return None
+
+        stat = full.stat()
+        key = str(path)
+        with self._lock:
+            cached = self.state['files'].get(key)
+        if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return cached[2]
+        value = _sha256_file(full)
+        with self._lock:
+            self.state['files'][key] = [stat.st_size, stat.st_mtime_ns, value]
+        return value
+
+    def stage_key(self, stage):
+        digest = hashlib.sha256(json.dumps(stage.command[1:]).encode())
+        for path in stage.code + stage.inputs:
+            digest.update(f'{path}={self.file_digest(path)}\n'.encode())
+        return digest.hexdigest()
+
+    def is_current(self, stage):
+        outputs_exist = all((self.root / path).exists() for path in stage.outputs)
+        return outputs_exist and self.state['stages'].get(stage.name) == self.stage_key(stage)
+
+    def save_state(self):
+        with self._lock:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            self.state_path.write_text(json.dumps(self.state, indent=2), encoding='utf-8')
+
+    def _execute(self, stage):
+        process = subprocess.Popen(stage.command, cwd=self.root, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, text=True)
+        for line in process.stdout:
+            print(f"[{stage.name}] {line}", end='', flush=True)
+        return process.wait()
+
+    def _run_stage(self, stage, force):
+        if not force and self.is_current(stage):
+            return 'skipped'
+        key = self.stage_key(stage)
+        if self._execute(stage) != 0:
+            return 'failed'
+        with self._lock:
+            self.state['stages'][stage.name] = key
+        self.save_state()
+        return 'ran'
+
+    def plan(self, targets=None, force=()):
+        """Which selected stages would run: stale ones and everything downstream of them."""
+        plan = {}
+        for name in self.selected(targets):
+            stale = (name in force or not self.is_current(self.stages[name])
+                     or any(plan.get(up) == 'run' for up in self.upstream[name]))
+            plan[name] = 'run' if stale else 'skip'
+        return plan
+
+    def run(self, targets=None, jobs=4, force=()):
+        """Run the selected stages; returns {stage: 'ran'|'skipped'|'failed'|'blocked'}."""
+        remaining = self.selected(targets)
+        selected = set(remaining)
+        status = {}
+        running = {}
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            while remaining or running:
+                for name in list(remaining):
+                    upstream = [up for up in self.upstream[name] if up in selected]
+                    if any(status.get(up) in ('failed', 'blocked') for up in upstream):
+                        status[name] = 'blocked'
+                        remaining.remove(name)
+                    elif all(up in status for up in upstream):
+                        print(f"→ {name}", flush=True)
+                        running[pool.submit(self._run_stage, self.stages[name],
+                                            name in force)] = name
+                        remaining.remove(name)
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    status[name] = future.result()
+                    print(f"✓ {name}: {status[name]}" if status[name] != 'failed'
+                          else f"✗ {name}: failed", flush=True)
+        self.save_state()
+        return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('stages', nargs='*', help='Stages to bring up to date (default: all)')
+    parser.add_argument('--jobs', type=int, default=4, help='Stages run at the same time')
+    parser.add_argument('--force', action='append', default=[], metavar='STAGE',
+                        help='Rerun this stage even if its inputs are unchanged')
+    parser.add_argument('--dry-run', action='store_true', help='Only show what would run')
+    parser.add_argument('--list', action='store_true', help='List stages and their inputs')
+    args = parser.parse_args()
+
+    pipeline = Pipeline(STAGES)
+    if args.list:
+        for name in pipeline.order:
+            stage = pipeline.stages[name]
+            after = ', '.join(pipeline.upstream[name]) or '-'
+            print(f"{name:16s} after: {after}")
+            for path in stage.outputs:
+                print(f"{'':16s} → {path}")
+        return 0
+
+    if args.dry_run:
+        for name, action in pipeline.plan(args.stages, set(args.force)).items():
+            print(f"{action:4s}  {name}")
+        return 0
+
+    print("=" * 60)
+    print("Running Pipeline")
+    print("=" * 60)
+    print()
+    status = pipeline.run(args.stages, jobs=args.jobs, force=set(args.force))
+
+    print("\n" + "=" * 60)
+    for name in pipeline.selected(args.stages):
+        print(f"  {name:16s} {status.get(name, '-')}")
+    print("=" * 60)
+    failed = [name for name, result in status.items() if result in ('failed', 'blocked')]
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Aggregate-only road extraction: km and segment counts per municipality
+
+Each RoadBatch is assigned to the municipality polygons while the PBF is
+streamed, and only the running (municipality, highway) totals are kept.
+No per-road table or GeoJSON is ever written.
+
+Assignment follows scripts/04_spatial_join.py: with join='intersects' a
+road counts in full towards every municipality it touches; with
+join='clip' each municipality gets only the length inside it.
+"""
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from municipality_index import MunicipalityIndex
+
+AGGREGATE_COLUMNS = ['municipality_name', 'municipality_id', 'highway',
+                     'osm_road_km', 'num_segments']
+
+
+class MunicipalityAggregator:
+    """Running km / segment totals per municipality and highway class."""
+
+    def __init__(self, municipalities, length_method='projected', join='intersects'):
+        self.index = MunicipalityIndex(municipalities)
+        self.length_method = length_method
+        self.join = join
+        self.totals = None
+        self.roads = 0
+        self.unassigned = 0
+
+    def add(self, batch):
+        lines, lengths = batch.metric_lines(self.length_method)
+        if self.join == 'clip':
+            road_idx, muni_idx, clipped_km = self.index.clip(lines)
+            if self.length_method == 'projected':
+                km = clipped_km
+            else:
+                # Same share of the road, applied to its geodesic length
+                km = lengths[road_idx] * clipped_km / (shapely.length(lines[road_idx]) / 1000.0)
+        else:
+            road_idx, muni_idx = self.index.assign(lines)
+            km = lengths[road_idx]
+
+        self.roads += len(batch)
+        self.unassigned += len(batch) - len(np.unique(road_idx))
+
+        pairs = pd.DataFrame({
+            'muni': muni_idx,
+            'highway': np.asarray(batch.highway, dtype=object)[road_idx],
+            'osm_road_km': km,
+            'num_segments': 1,
+        })
+        grouped = pairs.groupby(['muni', 'highway']).sum()
+        if self.totals is None:
+            self.totals = grouped
+        else:
+            self.totals = self.totals.add(grouped, fill_value=0)
+
+    def result(self):
+        """One row per (municipality, highway) with km and segment count."""
+        if self.totals is None:
+            return pd.DataFrame(columns=AGGREGATE_COLUMNS)
+        table = self.totals.reset_index()
+        table['municipality_name'] = self.index.names[table['muni']]
+        table['municipality_id'] = self.index.ids[table['muni']]
+        table['num_segments'] = table['num_segments'].astype('int64')
+        table = table[AGGREGATE_COLUMNS]
+        return table.sort_values(['municipality_name', 'highway']).reset_index(drop=True)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""OSM roads in the official road categories, and the municipality × category cube
+
+The official statistics (TRS020) publish road length per municipality for
+six overlapping categories (read from the TRS020 cache of trs020.py):
+
+    total              every road
+    asphalt            "Asphalt and other bituminous surfaces"
+    gravel             "Crushed stone and gravel surfaces"
+    state_roads        national roads (A, P and V numbers)
+    municipal_roads    rural roads of the municipality
+    municipal_streets  streets in towns and villages
+
+OSM has no such categories, so they are derived from the `surface`,
+`ref` and `highway` tags kept by the extraction:
+
+- surface: paved values count as asphalt, loose ones as gravel; roads
+  without a surface tag count in neither (but still in total).
+- state roads: a ref like A8, P35 or V1024, or a motorway/trunk road.
+- municipal streets: residential and living streets that are not state roads.
+- municipal roads: the other public road classes that are not state roads.
+
+category_cube() turns the road attributes into one flag column per
+category and sums km × flags per municipality in a single group-by, so all
+six categories come from one pass over the assignment table.
+"""
+
+import numpy as np
+import pandas as pd
+
+from classification import categorize
+from trs020 import CATEGORY_SELECTIONS, TRS020_FILE, load, official_lengths
+
+CATEGORIES = ['total', 'asphalt', 'gravel', 'state_roads', 'municipal_roads', 'municipal_streets']
+CATEGORY_CUBE = 'data/processed/completeness_cube.csv'
+CATEGORY_OUTPUT = 'data/processed/{}_completeness'
+ROAD_ATTRIBUTES = ['osm_id', 'highway', 'surface', 'ref']
+
+ASPHALT_SURFACES = ['asphalt', 'paved', 'chipseal', 'concrete', 'concrete:plates',
+                    'concrete:lanes', 'paving_stones', 'sett']
+GRAVEL_SURFACES = ['gravel', 'fine_gravel', 'compacted', 'pebblestone', 'unpaved', 'dirt',
+                   'ground', 'earth', 'sand']
+STATE_ROAD_REF = r'^\s*[APV]\s?\d+'
+STATE_ROAD_CLASSES = ['motorway', 'motorway_link', 'trunk', 'trunk_link']
+STREET_CLASSES = ['residential', 'living_street']
+RURAL_ROAD_CLASSES = ['primary', 'primary_link', 'secondary', 'secondary_link', 'tertiary',
+                      'tertiary_link', 'unclassified']
+
+
+def category_flags(highway, surface, ref):
+    """Boolean matrix (roads × CATEGORIES) of the categories each road counts in."""
+    highway = pd.Series(highway, dtype=object).str.strip().str.lower().to_numpy()
+    surface = pd.Series(surface, dtype=object).str.strip().str.lower().to_numpy()
+    ref = pd.Series(ref, dtype=object)
+
+    state = (ref.str.contains(STATE_ROAD_REF, regex=True, na=False).to_numpy()
+             | np.isin(highway, STATE_ROAD_CLASSES))
+    return np.column_stack([
+        np.ones(len(highway), dtype=bool),
+        np.isin(surface, ASPHALT_SURFACES),
+        np.isin(surface, GRAVEL_SURFACES),
+        state,
+        ~state & np.isin(highway, RURAL_ROAD_CLASSES),
+        ~state & np.isin(highway, STREET_CLASSES),
+    ])
+
+
+def category_cube(assignments, road_attributes, municipalities):
+    """OSM km and segment count per municipality and category, as a long table.
+
+    assignments: osm_id, municipality_id, clipped_length_km;
+    road_attributes: osm_id, highway, surface, ref (one row per road).
+    Returns municipality_id, municipality_name, road_category, osm_road_km,
+    num_segments with a row for every municipality and category.
+    """
+    # Road tables written before the surface/ref tags were kept lack those columns
+    attributes = road_attributes.drop_duplicates('osm_id').set_index('osm_id').reindex(
+        index=assignments['osm_id'].to_numpy(), columns=ROAD_ATTRIBUTES[1:])
+    flags = category_flags(attributes['highway'], attributes['surface'], attributes['ref'])
+
+    km = flags * assignments['clipped_length_km'].to_numpy()[:, None]
+    sums = pd.DataFrame(np.hstack([km, flags])).groupby(
+        assignments['municipality_id'].to_numpy()).sum()
+
+    # Municipality-major long layout: one row per (municipality, category)
+    n = len(CATEGORIES)
+    values = sums.to_numpy()
+    cube = pd.DataFrame({
+        'municipality_id': np.repeat(sums.index.to_numpy(), n),
+        'road_category': np.tile(CATEGORIES, len(sums)),
+        'osm_road_km': values[:, :n].ravel().round(2),
+        'num_segments': values[:, n:].ravel().astype(np.int64),
+    })
+    names = municipalities.drop_duplicates('municipality_id').set_index('municipality_id')
+    cube['municipality_name'] = cube['municipality_id'].map(names['municipality_name'])
+    return cube[['municipality_id', 'municipality_name', 'road_category', 'osm_road_km',
+                 'num_segments']]
+
+
+def load_official(path=TRS020_FILE, categories=CATEGORIES):
+    """Published km of every category: municipality_name, road_category, road_length_km."""
+    table = load(path)
+    frames = [official_lengths(table, *CATEGORY_SELECTIONS[category]).assign(
+        road_category=category) for category in categories]
+    return pd.concat(frames, ignore_index=True)[['municipality_name', 'road_category',
+                                                 'road_length_km']]
+
+
+def completeness_cube(cube, official):
+    """Completeness per municipality name and category.
+
+    Columns per (municipality_name, road_category) match completeness_table():
+    osm_road_km, num_segments, road_length_km, completeness_pct, category,
+    difference_km.
+    """
+    osm = cube.groupby(['municipality_name', 'road_category'])[
+        ['osm_road_km', 'num_segments']].sum().round(2).reset_index()
+    table = osm.merge(official, on=['municipality_name', 'road_category'], how='outer')
+    table['completeness_pct'] = (table['osm_road_km'] / table['road_length_km'] * 100).round(2)
+    table['category'] = categorize(table['completeness_pct'])
+    table['difference_km'] = (table['osm_road_km'] - table['road_length_km']).round(2)
+    table['road_category'] = pd.Categorical(table['road_category'], CATEGORIES)
+    return table.sort_values(['road_category', 'municipality_name']).reset_index(drop=True)
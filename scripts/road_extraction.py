@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""Road extraction helpers shared by scripts/02_extract_roads.py
+
+Ways are kept as flat NumPy arrays (RoadBatch): one lon/lat array for all
+nodes plus an offsets array marking where each way starts. Lengths come
+from one vectorized kernel over those arrays, and Shapely geometries are
+only built when a geometry output is requested.
+
+The streaming handler keeps at most one batch of ways in memory and hands
+each full batch to a callback, which writes it to a chunked parquet
+directory (one part file per batch).
+"""
+
+import hashlib
+import json
+from array import array
+from collections import Counter
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import osmium
+import pandas as pd
+import pyarrow.parquet as pq
+import shapely
+from pyproj import Transformer
+
+SKIP_HIGHWAY_TYPES = {'proposed', 'construction', 'abandoned'}
+DEFAULT_BATCH_SIZE = 100_000
+METRIC_CRS = 'EPSG:3035'
+EARTH_RADIUS_KM = 6371.0088  # IUGG mean radius
+LENGTH_METHODS = ('projected', 'geodesic')
+
+DEFAULT_NODE_INDEX = 'flex_mem'
+# Index types that persist to a file and can be reused between runs
+FILE_NODE_INDEX_TYPES = ('sparse_file_array', 'dense_file_array')
+
+_to_metric = Transformer.from_crs('EPSG:4326', METRIC_CRS, always_xy=True)
+
+
+def segment_lengths_km(x, y, offsets, method='projected'):
+    """Length of every way in km from flat coordinate arrays.
+
+    Way i spans x/y[offsets[i]:offsets[i + 1]]. With method='projected',
+    x/y must already be metric (EPSG:3035) coordinates; with 'geodesic',
+    they are lon/lat degrees and great-circle distances are used.
+    """
+    if len(offsets) < 2:
+        return np.zeros(0)
+    if method == 'projected':
+        seg = np.hypot(np.diff(x), np.diff(y)) / 1000.0
+    elif method == 'geodesic':
+        lon = np.radians(x)
+        lat = np.radians(y)
+        dlat = np.diff(lat)
+        dlon = np.diff(lon)
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlon / 2) ** 2
+        seg = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    else:
+        raise ValueError(f"Unknown length method: {method}")
+
+    # Segment k joins point k and k+1; the last point of a way does not
+    # start a segment, so those entries are zeroed before summing per way.
+    seg = np.append(seg, 0.0)
+    seg[offsets[1:] - 1] = 0.0
+    return np.add.reduceat(seg, offsets[:-1])
+
+
+class RoadBatch:
+    """A batch of ways as flat arrays; way i spans lon/lat[offsets[i]:offsets[i + 1]].
+
+    `refs`, when present, holds the node id of every lon/lat entry.
+    `surface` and `ref` are the ways' tags of that name (None when untagged);
+    they place each road in the official surface and road-class categories.
+    """
+
+    def __init__(self, osm_id, highway, name, offsets, lon, lat, refs=None, surface=None, ref=None):
+        self.osm_id = np.asarray(osm_id, dtype=np.int64)
+        self.highway = list(highway)
+        self.name = list(name)
+        self.surface = [None] * len(self.osm_id) if surface is None else list(surface)
+        self.ref = [None] * len(self.osm_id) if ref is None else list(ref)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.refs = None if refs is None else np.asarray(refs, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.osm_id)
+
+    def slice(self, start, end):
+        """Ways start..end-1 as a new batch."""
+        lo, hi = self.offsets[start], self.offsets[end]
+        refs = None if self.refs is None else self.refs[lo:hi]
+        return RoadBatch(self.osm_id[start:end], self.highway[start:end], self.name[start:end],
+                         self.offsets[start:end + 1] - lo, self.lon[lo:hi], self.lat[lo:hi], refs,
+                         self.surface[start:end], self.ref[start:end])
+
+    @classmethod
+    def concat(cls, batches):
+        """One batch of all ways of `batches`, in order."""
+        batches = [batch for batch in batches if len(batch)]
+        if len(batches) == 1:
+            return batches[0]
+        if not batches:
+            return cls([], [], [], [0], [], [])
+        offsets = [batches[0].offsets]
+        for batch in batches[1:]:
+            offsets.append(batch.offsets[1:] + offsets[-1][-1])
+        refs = (None if any(batch.refs is None for batch in batches)
+                else np.concatenate([batch.refs for batch in batches]))
+        return cls(np.concatenate([batch.osm_id for batch in batches]),
+                   [h for batch in batches for h in batch.highway],
+                   [n for batch in batches for n in batch.name],
+                   np.concatenate(offsets),
+                   np.concatenate([batch.lon for batch in batches]),
+                   np.concatenate([batch.lat for batch in batches]), refs,
+                   [s for batch in batches for s in batch.surface],
+                   [r for batch in batches for r in batch.ref])
+
+    def metric_coords(self):
+        return _to_metric.transform(self.lon, self.lat)
+
+    def lengths_km(self, method='projected'):
+        if method == 'projected':
+            x, y = self.metric_coords()
+            return segment_lengths_km(x, y, self.offsets, 'projected')
+        return segment_lengths_km(self.lon, self.lat, self.offsets, method)
+
+    def metric_lines(self, method='projected'):
+        """(EPSG:3035 LineStrings, lengths in km), projecting only once."""
+        x, y = self.metric_coords()
+        if method == 'projected':
+            lengths = segment_lengths_km(x, y, self.offsets, 'projected')
+        else:
+            lengths = self.lengths_km(method)
+        way_index = np.repeat(np.arange(len(self)), np.diff(self.offsets))
+        lines = shapely.linestrings(np.column_stack([x, y]), indices=way_index)
+        return lines, lengths
+
+    def to_frame(self, method='projected', geometry=True):
+        """Attribute table with `length_km`, plus EPSG:3035 geometry if asked."""
+        frame = pd.DataFrame({
+            'osm_id': self.osm_id,
+            'highway': self.highway,
+            'name': self.name,
+            'surface': self.surface,
+            'ref': self.ref,
+        })
+        if not geometry:
+            frame['length_km'] = self.lengths_km(method)
+            return frame
+
+        # The metric coordinates serve both the lengths and the LineStrings,
+        # so no to_crs() pass is needed.
+        lines, lengths = self.metric_lines(method)
+        frame['length_km'] = lengths
+        return gpd.GeoDataFrame(frame, geometry=lines, crs=METRIC_CRS)
+
+
+class StreamingRoadHandler(osmium.SimpleHandler):
+    """Collects highway ways into flat arrays and flushes every `batch_size` ways.
+
+    With batch_size=None everything is kept until flush() is called.
+    With keep_refs=True the batches also carry the node ids.
+    """
+
+    def __init__(self, on_batch, batch_size=DEFAULT_BATCH_SIZE, keep_refs=False):
+        super().__init__()
+        self.on_batch = on_batch
+        self.batch_size = batch_size
+        self.keep_refs = keep_refs
+        self.count = 0
+        self._reset()
+
+    def _reset(self):
+        self.osm_id = array('q')
+        self.highway = []
+        self.name = []
+        self.surface = []
+        self.ref = []
+        self.offsets = array('q', [0])
+        self.lon = array('d')
+        self.lat = array('d')
+        self.refs = array('q')
+
+    def way(self, w):
+        if 'highway' not in w.tags:
+            return
+        highway_type = w.tags['highway']
+        if highway_type in SKIP_HIGHWAY_TYPES:
+            return
+
+        try:
+            coords = [(n.lon, n.lat) for n in w.nodes]
+        except osmium.InvalidLocationError:
+            return
+        if len(coords) < 2:
+            return
+
+        self.osm_id.append(w.id)
+        self.highway.append(highway_type)
+        self.name.append(w.tags.get('name', None))
+        self.surface.append(w.tags.get('surface', None))
+        self.ref.append(w.tags.get('ref', None))
+        for lon, lat in coords:
+            self.lon.append(lon)
+            self.lat.append(lat)
+        if self.keep_refs:
+            self.refs.extend(n.ref for n in w.nodes)
+        self.offsets.append(len(self.lon))
+        self.count += 1
+        if self.batch_size and len(self.osm_id) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Pass the buffered ways to the callback as a RoadBatch and drop them."""
+        if self.osm_id:
+            refs = self.refs if self.keep_refs else None
+            self.on_batch(RoadBatch(self.osm_id, self.highway, self.name,
+                                    self.offsets, self.lon, self.lat, refs,
+                                    self.surface, self.ref))
+            self._reset()
+
+
+def pbf_fingerprint(path):
+    """Cheap identity of an input file: size, mtime and hash of the first MiB."""
+    path = Path(path)
+    stat = path.stat()
+    with open(path, 'rb') as f:
+        head = hashlib.sha256(f.read(1 << 20)).hexdigest()
+    return {'path': str(path.resolve()), 'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns, 'head_sha256': head}
+
+
+def apply_with_locations(handler, input_path, node_index=DEFAULT_NODE_INDEX,
+                         node_index_file=None):
+    """Run `handler` over the file with node locations from the chosen index.
+
+    Without node_index_file this is handler.apply_file(locations=True) with
+    the given in-memory index type. File-backed types (sparse_file_array,
+    dense_file_array) write the locations to node_index_file; a sidecar
+    JSON records which PBF they came from. When the sidecar matches the
+    input, the node pass is skipped and only ways are read.
+    Returns True if an existing index file was reused.
+    """
+    if node_index_file is None:
+        handler.apply_file(str(input_path), locations=True, idx=node_index)
+        return False
+    if node_index not in FILE_NODE_INDEX_TYPES:
+        raise ValueError(f"{node_index} cannot be stored in a file; "
+                         f"use one of {', '.join(FILE_NODE_INDEX_TYPES)}")
+
+    index_file = Path(node_index_file)
+    sidecar = index_file.with_name(index_file.name + '.json')
+    expected = dict(pbf_fingerprint(input_path), node_index=node_index)
+    reuse = (index_file.exists() and sidecar.exists()
+             and json.loads(sidecar.read_text(encoding='utf-8')) == expected)
+    if not reuse:
+        index_file.unlink(missing_ok=True)
+        sidecar.unlink(missing_ok=True)
+        index_file.parent.mkdir(parents=True, exist_ok=True)
+
+    index = osmium.index.create_map(f'{node_index},{index_file}')
+    locations = osmium.NodeLocationsForWays(index)
+    locations.ignore_errors()
+    if reuse:
+        reader = osmium.io.Reader(str(input_path), osmium.osm.WAY)
+        try:
+            osmium.apply(reader, locations, handler)
+        finally:
+            reader.close()
+    else:
+        osmium.apply(str(input_path), locations, handler)
+    del locations, index  # unmaps and flushes the index file
+
+    if not reuse:
+        sidecar.write_text(json.dumps(expected, indent=2), encoding='utf-8')
+    return reuse
+
+
+class RoadStats:
+    """Running totals so the summary never needs the full road table."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_km = 0.0
+        self.highway_counts = Counter()
+
+    def update(self, frame):
+        self.count += len(frame)
+        self.total_km += float(frame['length_km'].sum())
+        self.highway_counts.update(frame['highway'].value_counts().to_dict())
+
+    def print_summary(self):
+        print("\n" + "=" * 60)
+        print("Statistics:")
+        print(f"  Total roads: {self.count:,}")
+        print(f"  Total length: {self.total_km:.2f} km")
+        average = self.total_km / self.count if self.count else 0.0
+        print(f"  Average length: {average:.3f} km")
+        print("\nTop 5 road types:")
+        top = pd.Series(dict(self.highway_counts.most_common(5)), name='highway', dtype='int64')
+        print(top)
+        print("=" * 60)
+        print()
+
+
+def part_path(out_dir, number):
+    return Path(out_dir) / f'part-{number:05d}.parquet'
+
+
+def clear_parts(out_dir):
+    """Create out_dir and remove parts of an earlier run, which would otherwise be read back in."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for old_part in out_dir.glob('part-*.parquet'):
+        old_part.unlink()
+
+
+class PartWriter:
+    """Writes batch tables as numbered parquet parts in a directory."""
+
+    def __init__(self, out_dir):
+        self.out_dir = Path(out_dir)
+        clear_parts(self.out_dir)
+        self.parts = 0
+
+    def write(self, frame):
+        frame.to_parquet(part_path(self.out_dir, self.parts), index=False)
+        self.parts += 1
+
+
+def read_parts(out_dir):
+    """Concatenate every part of a parts directory, in part order."""
+    parts = sorted(Path(out_dir).glob('part-*.parquet'))
+    if not parts:
+        return gpd.GeoDataFrame(geometry=[], crs=METRIC_CRS)
+    return pd.concat([read_part(p) for p in parts], ignore_index=True)
+
+
+def read_roads(path):
+    """Read roads from a GeoJSON file or a directory of parquet parts."""
+    path = Path(path)
+    if path.is_dir():
+        return read_parts(path)
+    return gpd.read_file(path)
+
+
+def read_part(path):
+    # Parts written with --no-geometry are plain parquet tables
+    metadata = pq.read_schema(path).metadata or {}
+    if b'geo' in metadata:
+        return gpd.read_parquet(path)
+    return pd.read_parquet(path)
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""Persistent road store, updated in place from OsmChange (.osc) files
+
+The store is one SQLite file holding every highway way with its node list,
+length and municipality assignment, plus the coordinates of the nodes those
+ways use. `apply-diff` reads daily/minutely diffs, recomputes only the ways
+they touch (directly or through a moved node) and marks the municipalities
+of the old and new geometries dirty. `aggregate` then re-sums only the
+dirty municipalities and writes the same table as
+`02_extract_roads.py --aggregate-by`.
+
+Usage:
+    python scripts/road_store.py build --input data/raw/latvia-latest.osm.pbf
+    python scripts/road_store.py apply-diff data/raw/diffs/*.osc.gz
+    python scripts/road_store.py aggregate
+"""
+
+import argparse
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import osmium
+import pandas as pd
+
+from municipality_index import MunicipalityIndex, load_municipalities
+from parallel_extraction import read_road_batches
+from road_aggregation import AGGREGATE_COLUMNS
+from road_extraction import DEFAULT_BATCH_SIZE, SKIP_HIGHWAY_TYPES, RoadBatch
+
+DEFAULT_STORE = 'data/processed/road_store.sqlite'
+DEFAULT_MUNICIPALITIES = 'data/processed/municipalities.geojson'
+DEFAULT_AGGREGATES = 'data/processed/road_aggregates.csv'
+SQL_CHUNK = 900  # stay below SQLite's bound-parameter limit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS municipalities (id TEXT PRIMARY KEY, name TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS nodes (id INTEGER PRIMARY KEY, lon REAL NOT NULL, lat REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS ways (
+    id INTEGER PRIMARY KEY, highway TEXT NOT NULL, name TEXT, length_km REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS way_nodes (
+    way_id INTEGER NOT NULL, seq INTEGER NOT NULL, node_id INTEGER NOT NULL,
+    PRIMARY KEY (way_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS way_nodes_node ON way_nodes (node_id);
+CREATE TABLE IF NOT EXISTS way_municipalities (
+    way_id INTEGER NOT NULL, municipality_id TEXT NOT NULL,
+    PRIMARY KEY (way_id, municipality_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS way_municipalities_muni ON way_municipalities (municipality_id);
+CREATE TABLE IF NOT EXISTS aggregates (
+    municipality_id TEXT NOT NULL, highway TEXT NOT NULL,
+    osm_road_km REAL NOT NULL, num_segments INTEGER NOT NULL,
+    PRIMARY KEY (municipality_id, highway)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS dirty_municipalities (municipality_id TEXT PRIMARY KEY);
+"""
+
+
+def _chunks(values, size=SQL_CHUNK):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _select_in(conn, sql, ids):
+    """Run `sql` (with one `{ids}` placeholder list) over ids in chunks."""
+    rows = []
+    for chunk in _chunks(ids):
+        marks = ','.join('?' * len(chunk))
+        rows.extend(conn.execute(sql.format(ids=marks), chunk).fetchall())
+    return rows
+
+
+class RoadStore:
+    """SQLite-backed road table with per-municipality dirty tracking."""
+
+    def __init__(self, path, municipalities_path=None):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript(SCHEMA)
+        if municipalities_path is None:
+            municipalities_path = self.get_meta('municipalities', DEFAULT_MUNICIPALITIES)
+        self.municipalities_path = str(municipalities_path)
+        self._index = None
+
+    def close(self):
+        self.conn.close()
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = MunicipalityIndex(load_municipalities(self.municipalities_path))
+        return self._index
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
+
+    # --- writing ways -------------------------------------------------
+
+    def add_batch(self, batch):
+        """Insert a RoadBatch (with refs); returns the municipality ids it touches."""
+        lines, lengths = batch.metric_lines()
+        road_idx, muni_idx = self.index.assign(lines)
+        way_ids = batch.osm_id.tolist()
+        sizes = np.diff(batch.offsets)
+
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO ways (id, highway, name, length_km) VALUES (?, ?, ?, ?)',
+            zip(way_ids, batch.highway, batch.name, lengths.tolist()))
+        seq = np.arange(len(batch.refs)) - np.repeat(batch.offsets[:-1], sizes)
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO way_nodes (way_id, seq, node_id) VALUES (?, ?, ?)',
+            zip(np.repeat(batch.osm_id, sizes).tolist(), seq.tolist(), batch.refs.tolist()))
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO nodes (id, lon, lat) VALUES (?, ?, ?)',
+            zip(batch.refs.tolist(), batch.lon.tolist(), batch.lat.tolist()))
+        muni_ids = self.index.ids[muni_idx].tolist()
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO way_municipalities (way_id, municipality_id) VALUES (?, ?)',
+            zip(batch.osm_id[road_idx].tolist(), muni_ids))
+        return set(muni_ids)
+
+    def delete_ways(self, way_ids):
+        for chunk in _chunks(way_ids):
+            marks = ','.join('?' * len(chunk))
+            for table, column in (('ways', 'id'), ('way_nodes', 'way_id'),
+                                  ('way_municipalities', 'way_id')):
+                self.conn.execute(f'DELETE FROM {table} WHERE {column} IN ({marks})', chunk)
+
+    def mark_dirty(self, municipality_ids):
+        self.conn.executemany('INSERT OR IGNORE INTO dirty_municipalities (municipality_id) VALUES (?)',
+                              ((m,) for m in municipality_ids))
+
+    # --- build --------------------------------------------------------
+
+    def build(self, input_path, batch_size=DEFAULT_BATCH_SIZE, workers=1):
+        self.conn.executemany('INSERT OR REPLACE INTO municipalities (id, name) VALUES (?, ?)',
+                              zip(self.index.ids.tolist(), self.index.names.tolist()))
+        self.set_meta('municipalities', self.municipalities_path)
+        self.set_meta('source', input_path)
+
+        def add(batch):
+            self.add_batch(batch)
+            self.conn.commit()
+
+        read_road_batches(input_path, add, batch_size, workers, keep_refs=True)
+        self.mark_dirty(self.index.ids.tolist())
+        self.conn.commit()
+
+    # --- diffs --------------------------------------------------------
+
+    def apply_diff(self, osc_path):
+        """Apply one OsmChange file; returns a summary dict."""
+        changes = ChangeCollector()
+        changes.apply_file(str(osc_path))
+
+        # Ways whose definition stays as stored but whose nodes moved
+        stored_nodes = {row[0] for row in _select_in(
+            self.conn, 'SELECT id FROM nodes WHERE id IN ({ids})', changes.nodes)}
+        moved_way_ids = {row[0] for row in _select_in(
+            self.conn, 'SELECT DISTINCT way_id FROM way_nodes WHERE node_id IN ({ids})', stored_nodes)}
+        touched = set(changes.ways) | moved_way_ids
+
+        # Stored definitions of the touched ways, for the ways the diff did
+        # not redefine and as a fallback for redefinitions that cannot be resolved
+        stored = self._definitions(touched)
+        definitions = {way_id: way for way_id, way in changes.ways.items() if way is not None}
+        for way_id in moved_way_ids - set(changes.ways):
+            definitions[way_id] = stored[way_id]
+        removed = [way_id for way_id, way in changes.ways.items() if way is None and way_id in stored]
+
+        dirty = {row[0] for row in _select_in(
+            self.conn, 'SELECT municipality_id FROM way_municipalities WHERE way_id IN ({ids})',
+            touched)}
+        self.delete_ways(touched)
+
+        # Node coordinates: updates for stored nodes and for nodes the new ways use
+        referenced = {ref for _, _, refs in definitions.values() for ref in refs}
+        for node_id, location in changes.nodes.items():
+            if node_id not in stored_nodes and node_id not in referenced:
+                continue
+            if location is None:
+                self.conn.execute('DELETE FROM nodes WHERE id = ?', (node_id,))
+            else:
+                self.conn.execute('INSERT OR REPLACE INTO nodes (id, lon, lat) VALUES (?, ?, ?)',
+                                  (node_id, location[0], location[1]))
+
+        # A redefined way can use nodes the store never saw (not on any road
+        # before, and unchanged so not in the diff). Such a way keeps its
+        # stored definition until the next full build; a new one is skipped.
+        batch, unresolved = self._batch_from_definitions(definitions)
+        carried = {way_id: stored[way_id] for way_id in unresolved if way_id in stored}
+        if carried:
+            batch, _ = self._batch_from_definitions({**definitions, **carried})
+        if batch is not None:
+            dirty |= self.add_batch(batch)
+        self.mark_dirty(dirty)
+        self.set_meta('last_diff', Path(osc_path).name)
+        self.conn.commit()
+        return {
+            'touched': len(touched),
+            'updated': (0 if batch is None else len(batch)) - len(carried),
+            'removed': len(removed),
+            'carried': len(carried),
+            'skipped': len(unresolved) - len(carried),
+            'dirty': len(dirty),
+        }
+
+    def _definitions(self, way_ids):
+        """{way_id: (highway, name, refs)} of the stored ways among way_ids."""
+        definitions = {}
+        for way_id, highway, name in _select_in(
+                self.conn, 'SELECT id, highway, name FROM ways WHERE id IN ({ids})', way_ids):
+            definitions[way_id] = (highway, name, [])
+        for way_id, node_id in _select_in(
+                self.conn, 'SELECT way_id, node_id FROM way_nodes WHERE way_id IN ({ids}) '
+                           'ORDER BY way_id, seq', definitions):
+            definitions[way_id][2].append(node_id)
+        return definitions
+
+    def _batch_from_definitions(self, definitions):
+        """RoadBatch for {way_id: (highway, name, refs)} and the ids of ways using unknown nodes."""
+        referenced = {ref for _, _, refs in definitions.values() for ref in refs}
+        coords = {node_id: (lon, lat) for node_id, lon, lat in _select_in(
+            self.conn, 'SELECT id, lon, lat FROM nodes WHERE id IN ({ids})', referenced)}
+
+        ids, highways, names, offsets, lon, lat, refs = [], [], [], [0], [], [], []
+        unresolved = []
+        for way_id in sorted(definitions):
+            highway, name, way_refs = definitions[way_id]
+            if any(ref not in coords for ref in way_refs):
+                unresolved.append(way_id)
+                continue
+            ids.append(way_id)
+            highways.append(highway)
+            names.append(name)
+            refs.extend(way_refs)
+            lon.extend(coords[ref][0] for ref in way_refs)
+            lat.extend(coords[ref][1] for ref in way_refs)
+            offsets.append(len(refs))
+        if not ids:
+            return None, unresolved
+        return RoadBatch(ids, highways, names, offsets, lon, lat, refs), unresolved
+
+    # --- aggregation --------------------------------------------------
+
+    def aggregate(self):
+        """Re-sum dirty municipalities only; returns how many were recomputed."""
+        dirty = [row[0] for row in self.conn.execute('SELECT municipality_id FROM dirty_municipalities')]
+        for chunk in _chunks(dirty):
+            marks = ','.join('?' * len(chunk))
+            self.conn.execute(f'DELETE FROM aggregates WHERE municipality_id IN ({marks})', chunk)
+            self.conn.execute(f"""
+                INSERT INTO aggregates (municipality_id, highway, osm_road_km, num_segments)
+                SELECT wm.municipality_id, w.highway, SUM(w.length_km), COUNT(*)
+                FROM way_municipalities wm JOIN ways w ON w.id = wm.way_id
+                WHERE wm.municipality_id IN ({marks})
+                GROUP BY wm.municipality_id, w.highway""", chunk)
+        self.conn.execute('DELETE FROM dirty_municipalities')
+        self.conn.commit()
+        return len(dirty)
+
+    def aggregates_table(self):
+        """The aggregate table in the 02_extract_roads.py --aggregate-by layout."""
+        table = pd.read_sql_query("""
+            SELECT m.name AS municipality_name, a.municipality_id, a.highway,
+                   a.osm_road_km, a.num_segments
+            FROM aggregates a JOIN municipalities m ON m.id = a.municipality_id
+            ORDER BY m.name, a.highway""", self.conn)
+        return table[AGGREGATE_COLUMNS]
+
+
+class ChangeCollector(osmium.SimpleHandler):
+    """Node and highway changes of an OsmChange file; later versions win.
+
+    `ways` maps id -> (highway, name, refs), or None when the way was
+    deleted or is no longer a road we keep.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.nodes = {}
+        self.ways = {}
+
+    def node(self, n):
+        if n.deleted:
+            self.nodes[n.id] = None
+        elif n.location.valid():
+            self.nodes[n.id] = (n.location.lon, n.location.lat)
+
+    def way(self, w):
+        highway = w.tags.get('highway')
+        if w.deleted or highway is None or highway in SKIP_HIGHWAY_TYPES or len(w.nodes) < 2:
+            self.ways[w.id] = None
+            return
+        self.ways[w.id] = (highway, w.tags.get('name', None), [n.ref for n in w.nodes])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--store', default=DEFAULT_STORE, help='SQLite road store')
+    parser.add_argument('--municipalities', default=None,
+                        help=f'Municipality polygons (default: as built, or {DEFAULT_MUNICIPALITIES})')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='Create the store from a full PBF extract')
+    build.add_argument('--input', default='data/raw/latvia-latest.osm.pbf')
+    build.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    build.add_argument('--workers', type=int, default=1)
+
+    diff = commands.add_parser('apply-diff', help='Apply OsmChange files in the given order')
+    diff.add_argument('changes', nargs='+', help='.osc / .osc.gz files')
+
+    aggregate = commands.add_parser('aggregate', help='Re-aggregate dirty municipalities')
+    aggregate.add_argument('--output', default=DEFAULT_AGGREGATES)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Road Store")
+    print("=" * 60)
+    print()
+
+    if args.command == 'build':
+        Path(args.store).unlink(missing_ok=True)
+    store = RoadStore(args.store, args.municipalities)
+
+    if args.command == 'build':
+        print(f"Building {args.store} from {args.input}...")
+        store.build(args.input, args.batch_size, args.workers)
+        count = store.conn.execute('SELECT COUNT(*) FROM ways').fetchone()[0]
+        print(f"✓ Stored {count:,} roads; all municipalities marked dirty")
+    elif args.command == 'apply-diff':
+        for path in args.changes:
+            summary = store.apply_diff(path)
+            print(f"✓ {path}: {summary['touched']:,} ways touched, "
+                  f"{summary['updated']:,} updated, {summary['removed']:,} removed, "
+                  f"{summary['dirty']} municipalities dirty")
+            if summary['carried'] or summary['skipped']:
+                print(f"  ⚠ {summary['carried'] + summary['skipped']:,} ways use nodes unknown "
+                      f"to the store: {summary['carried']:,} kept as before, "
+                      f"{summary['skipped']:,} new ones skipped (rebuild to include them)")
+    else:
+        recomputed = store.aggregate()
+        table = store.aggregates_table()
+        table.to_csv(args.output, index=False)
+        print(f"✓ Re-aggregated {recomputed} municipalities")
+        print(f"✓ Saved: {args.output} ({len(table):,} rows)")
+
+    store.close()
+    print()
+
+
+if __name__ == '__main__':
+    main()
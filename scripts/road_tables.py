@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Normalized spatial join output: one road table, one thin assignment table
+
+The road table holds every road once, keyed by osm_id, with its attributes
+and geometry. The assignment table has one row per (road, municipality)
+pair and only three columns:
+
+    osm_id, municipality_id, clipped_length_km
+
+clipped_length_km is the length of the road inside the municipality; with
+the intersects join it is the full road length. Aggregations per
+municipality read only the assignment table.
+"""
+
+import json
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+ROAD_TABLE = 'data/processed/road_table.parquet'
+ASSIGNMENTS_DIR = 'data/processed/road_assignments'
+ASSIGNMENT_COLUMNS = ['osm_id', 'municipality_id', 'clipped_length_km']
+
+
+def assignment_table(osm_id, municipality_id, clipped_length_km):
+    return pd.DataFrame({
+        'osm_id': np.asarray(osm_id, dtype=np.int64),
+        'municipality_id': np.asarray(municipality_id, dtype=object),
+        'clipped_length_km': np.asarray(clipped_length_km, dtype=np.float64),
+    })
+
+
+def write_road_table(roads, path=ROAD_TABLE):
+    """Store each road once (first occurrence of an osm_id) as GeoParquet."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    roads = roads.drop_duplicates(subset='osm_id').reset_index(drop=True)
+    roads.to_parquet(path, index=False)
+    return len(roads)
+
+
+def _merged_geo_metadata(schemas):
+    """GeoParquet metadata of the union of parts: geometry types and bbox combined."""
+    geo = [json.loads(schema.metadata[b'geo']) for schema in schemas]
+    merged = geo[0]
+    for name, column in merged['columns'].items():
+        parts = [g['columns'][name] for g in geo]
+        column['geometry_types'] = sorted({t for part in parts for t in part.get('geometry_types', [])})
+        boxes = [part['bbox'] for part in parts if part.get('bbox')]
+        if boxes:
+            column['bbox'] = [min(b[0] for b in boxes), min(b[1] for b in boxes),
+                              max(b[2] for b in boxes), max(b[3] for b in boxes)]
+    return json.dumps(merged).encode()
+
+
+def merge_road_table(parts_dir, path=ROAD_TABLE):
+    """Store the roads of a directory of GeoParquet parts once each (first occurrence
+    of an osm_id, in part order), as write_road_table; one part in memory at a time."""
+    parts = sorted(Path(parts_dir).glob('part-*.parquet'))
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if not parts:
+        return write_road_table(gpd.GeoDataFrame({'osm_id': []}, geometry=[]), path)
+    schemas = [pq.read_schema(part) for part in parts]
+    schema = pa.unify_schemas([s.remove_metadata() for s in schemas])
+    schema = schema.with_metadata({**schemas[0].metadata, b'geo': _merged_geo_metadata(schemas)})
+    seen = np.empty(0, dtype=np.int64)
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for part in parts:
+            table = pq.read_table(part)
+            ids = table['osm_id'].to_numpy().astype(np.int64)
+            _, first = np.unique(ids, return_index=True)
+            keep = np.zeros(len(ids), dtype=bool)
+            keep[first] = True
+            keep &= ~np.isin(ids, seen)
+            table = table.filter(pa.array(keep)).select(schema.names).cast(schema)
+            writer.write_table(table)
+            seen = np.union1d(seen, ids)
+            count += table.num_rows
+    return count
+
+
+def read_road_table(path=ROAD_TABLE, columns=None):
+    return gpd.read_parquet(path, columns=columns)
+
+
+def read_assignments(path=ASSIGNMENTS_DIR):
+    """All assignment parts of a directory (or a single parquet file)."""
+    path = Path(path)
+    if path.is_dir():
+        parts = sorted(path.glob('part-*.parquet'))
+        if not parts:
+            return assignment_table([], [], [])
+        return pd.concat([pd.read_parquet(p, columns=ASSIGNMENT_COLUMNS) for p in parts],
+                         ignore_index=True)
+    return pd.read_parquet(path, columns=ASSIGNMENT_COLUMNS)
+
+
+def municipality_totals(assignments, municipalities):
+    """km and segment count per municipality; names come from `municipalities`.
+
+    Returns municipality_id, municipality_name, osm_road_km, num_segments.
+    """
+    totals = assignments.groupby('municipality_id').agg(
+        osm_road_km=('clipped_length_km', 'sum'),
+        num_segments=('osm_id', 'count'),
+    ).reset_index()
+    names = municipalities.drop_duplicates('municipality_id').set_index('municipality_id')
+    totals['municipality_name'] = totals['municipality_id'].map(names['municipality_name'])
+    return totals[['municipality_id', 'municipality_name', 'osm_road_km', 'num_segments']]
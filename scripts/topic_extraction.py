@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Single-pass extraction of several OSM topics
+
+One TopicExtractor handler carries every registered topic. Node, way and
+area callbacks run in the same read of the PBF, and each topic collects
+its own rows and flushes them in batches to its own parquet directory.
+Adding a topic is one more Topic(...) entry, not another pass over the
+file.
+
+Areas (buildings, forests) are assembled by osmium; for that it first
+reads the relations of the file, which is cheap compared to the main pass.
+"""
+
+from pathlib import Path
+
+import geopandas as gpd
+import osmium
+import shapely
+
+from road_extraction import DEFAULT_BATCH_SIZE, METRIC_CRS, SKIP_HIGHWAY_TYPES, PartWriter
+
+RAILWAY_TYPES = {'rail', 'light_rail', 'narrow_gauge', 'tram', 'subway'}
+POI_AMENITIES = {'hospital', 'clinic', 'doctors', 'pharmacy', 'restaurant', 'cafe',
+                 'fast_food', 'school', 'kindergarten', 'police', 'fire_station'}
+
+
+class Topic:
+    """A named filter over OSM objects.
+
+    `match(tags)` returns the category of a matching object (e.g. the
+    highway or amenity value) or None. `kinds` lists which callbacks the
+    topic listens to: 'node', 'way' (open lines) and/or 'area'.
+    """
+
+    def __init__(self, name, kinds, match):
+        self.name = name
+        self.kinds = set(kinds)
+        self.match = match
+
+
+def _tag_in(key, values):
+    def match(tags):
+        value = tags.get(key)
+        return value if value in values else None
+    return match
+
+
+def _road(tags):
+    value = tags.get('highway')
+    return value if value is not None and value not in SKIP_HIGHWAY_TYPES else None
+
+
+def _building(tags):
+    return tags.get('building')
+
+
+def _forest(tags):
+    if tags.get('landuse') == 'forest':
+        return 'forest'
+    if tags.get('natural') == 'wood':
+        return 'wood'
+    return None
+
+
+DEFAULT_TOPICS = {
+    'roads': Topic('roads', ['way'], _road),
+    'railways': Topic('railways', ['way'], _tag_in('railway', RAILWAY_TYPES)),
+    'buildings': Topic('buildings', ['area'], _building),
+    'pois': Topic('pois', ['node', 'area'], _tag_in('amenity', POI_AMENITIES)),
+    'forests': Topic('forests', ['area'], _forest),
+}
+
+
+def _finish(rows, topic):
+    """GeoDataFrame in the metric CRS; line topics get length_km, area topics area_km2."""
+    gdf = gpd.GeoDataFrame(rows, geometry=shapely.from_wkb([r.pop('wkb') for r in rows]),
+                           crs='EPSG:4326').to_crs(METRIC_CRS)
+    if 'way' in topic.kinds:
+        gdf['length_km'] = gdf.geometry.length / 1000.0
+    if 'area' in topic.kinds:
+        gdf['area_km2'] = gdf.geometry.area / 1_000_000
+    return gdf
+
+
+class TopicExtractor(osmium.SimpleHandler):
+    """Runs every registered topic in one pass, writing batches per topic."""
+
+    def __init__(self, out_dir, batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__()
+        self.out_dir = Path(out_dir)
+        self.batch_size = batch_size
+        self.topics = {'node': [], 'way': [], 'area': []}
+        self.registered = {}
+        self.rows = {}
+        self.writers = {}
+        self.counts = {}
+        self.wkb = osmium.geom.WKBFactory()
+
+    def register(self, topic):
+        self.registered[topic.name] = topic
+        for kind in topic.kinds:
+            self.topics[kind].append(topic)
+        self.rows[topic.name] = []
+        self.writers[topic.name] = PartWriter(self.out_dir / topic.name)
+        self.counts[topic.name] = 0
+
+    def _add(self, topic, category, obj, osm_type, osm_id, make_wkb):
+        try:
+            wkb = make_wkb(obj)
+        except (osmium.InvalidLocationError, RuntimeError):
+            return
+        rows = self.rows[topic.name]
+        rows.append({
+            'osm_id': osm_id,
+            'osm_type': osm_type,
+            'category': category,
+            'name': obj.tags.get('name', None),
+            'wkb': wkb,
+        })
+        if len(rows) >= self.batch_size:
+            self._flush(topic.name)
+
+    def _flush(self, name):
+        rows = self.rows[name]
+        if rows:
+            self.writers[name].write(_finish(rows, self.registered[name]))
+            self.counts[name] += len(rows)
+            self.rows[name] = []
+
+    def flush(self):
+        for name in self.rows:
+            self._flush(name)
+
+    def node(self, n):
+        for topic in self.topics['node']:
+            category = topic.match(n.tags)
+            if category is not None:
+                self._add(topic, category, n, 'node', n.id, self.wkb.create_point)
+
+    def way(self, w):
+        if not self.topics['way'] or len(w.nodes) < 2:
+            return
+        for topic in self.topics['way']:
+            category = topic.match(w.tags)
+            if category is not None:
+                self._add(topic, category, w, 'way', w.id, self.wkb.create_linestring)
+
+    def area(self, a):
+        for topic in self.topics['area']:
+            category = topic.match(a.tags)
+            if category is not None:
+                osm_type = 'way' if a.from_way() else 'relation'
+                self._add(topic, category, a, osm_type, a.orig_id(),
+                          self.wkb.create_multipolygon)
+
+    def run(self, input_path, node_index='flex_mem'):
+        self.apply_file(str(input_path), locations=True, idx=node_index)
+        self.flush()
+        return dict(self.counts)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""Polygon coverages as shared arcs, simplified without gaps between neighbours
+
+Topology.from_geometries() cuts every ring of a set of (Multi)Polygons at
+its junctions (points where the neighbouring polygon changes) and stores
+each resulting arc once; a border between two municipalities becomes one
+arc that both refer to, one of them in reverse (~index, as in TopoJSON).
+Simplifying the arcs instead of the polygons therefore moves both sides of
+a border identically, so simplified neighbours still share their edges:
+
+    topology = Topology.from_geometries(geometries)
+    arcs = topology.simplify(pixel_tolerance(7))     # country-wide view
+    geometry = topology.geometry(0, arcs)            # GeoJSON geometry dict
+    topojson = topology.to_topojson(properties, 'municipalities', arcs)
+
+Junctions are found with one vectorized pass over all vertices; arcs are
+simplified with Douglas-Peucker (the endpoints, i.e. the junctions, are
+always kept). A ring that would collapse keeps a few of its vertices, so
+small towns and enclaves stay on the map at coarse levels. to_topojson()
+writes the arcs once, as quantized, delta-encoded integers.
+"""
+
+import math
+
+import numpy as np
+import shapely
+
+# Coordinates are snapped to this many decimals before the topology is built,
+# so borders written twice with float noise (reprojection) still match
+SNAP_DECIMALS = 7
+# Zoom levels with a precomputed simplification; finer zooms get the full geometry
+SIMPLIFY_ZOOMS = (5, 7, 9, 11, 13)
+# Allowed deviation at a zoom level, in screen pixels
+TOLERANCE_PIXELS = 0.5
+# TopoJSON grid size per axis (about 4 m steps across Latvia)
+QUANTIZATION = 100_000
+
+
+def pixel_tolerance(zoom, pixels=TOLERANCE_PIXELS):
+    """Tolerance in degrees of longitude for `pixels` screen pixels at a web-map zoom."""
+    return pixels * 360.0 / (256 << zoom)
+
+
+def tolerance_decimals(tolerance):
+    """Coordinate decimals worth keeping for a tolerance (a tenth of it)."""
+    return min(max(math.ceil(-math.log10(tolerance)) + 1, 0), SNAP_DECIMALS)
+
+
+def _polygons(geom):
+    if geom is None or geom.is_empty:
+        return []
+    type_id = shapely.get_type_id(geom)
+    if type_id == 3:
+        return [geom]
+    if type_id == 6:
+        return list(geom.geoms)
+    raise ValueError(f"Expected Polygon or MultiPolygon, got {geom.geom_type}")
+
+
+def _ring_coords(ring):
+    """Ring vertices without the closing point and without repeated points."""
+    coords = np.round(np.asarray(ring.coords)[:-1, :2], SNAP_DECIMALS)
+    keep = np.any(coords != np.roll(coords, 1, axis=0), axis=1)
+    return coords[keep]
+
+
+def _group(*keys):
+    """Id of each row's distinct key tuple (in sorted order) and the first row of each id."""
+    order = np.lexsort(keys[::-1])
+    new = np.zeros(len(order), dtype=bool)
+    new[:1] = True
+    for key in keys:
+        ordered = key[order]
+        new[1:] |= ordered[1:] != ordered[:-1]
+    ids = np.empty(len(order), dtype=np.int64)
+    ids[order] = np.cumsum(new) - 1
+    return ids, order[new]
+
+
+def _dedupe(coords):
+    """Drop consecutive repeated points, keeping both endpoints."""
+    keep = np.ones(len(coords), dtype=bool)
+    keep[1:] = np.any(coords[1:] != coords[:-1], axis=1)
+    keep[-1] = True
+    return coords[keep]
+
+
+def _guard(coords):
+    """A few vertices of an arc that keep its ring from collapsing."""
+    n = len(coords)
+    if n <= 3:
+        return coords
+    if np.array_equal(coords[0], coords[-1]):
+        return coords[[0, n // 3, 2 * n // 3, n - 1]]
+    chord = coords[-1] - coords[0]
+    offsets = coords - coords[0]
+    farthest = int(np.argmax(np.abs(chord[0] * offsets[:, 1] - chord[1] * offsets[:, 0])))
+    return coords[sorted({0, farthest, n - 1})]
+
+
+class Topology:
+    """Shared arcs of a polygon coverage.
+
+    points: (n, 2) distinct vertices; arcs: arrays of point indices;
+    shapes: per geometry, polygons as lists of rings as lists of arc
+    references (i for arc i, ~i for arc i reversed).
+    """
+
+    def __init__(self, points, arcs, shapes):
+        self.points = points
+        self.arcs = arcs
+        self.shapes = shapes
+
+    @classmethod
+    def from_geometries(cls, geometries):
+        shapes, rings = [], []
+        for geom in geometries:
+            polygons = []
+            for polygon in _polygons(geom):
+                polygon_rings = []
+                for ring in [polygon.exterior, *polygon.interiors]:
+                    coords = _ring_coords(ring)
+                    if len(coords) >= 3:
+                        polygon_rings.append(len(rings))
+                        rings.append(coords)
+                    elif not polygon_rings:
+                        break
+                if polygon_rings:
+                    polygons.append(polygon_rings)
+            shapes.append(polygons)
+        if not rings:
+            return cls(np.empty((0, 2)), [], shapes)
+
+        lengths = np.array([len(ring) for ring in rings])
+        starts = np.cumsum(lengths) - lengths
+        coords = np.concatenate(rings)
+        ids, first = _group(coords[:, 0], coords[:, 1])
+        points = coords[first]
+
+        # A point is a junction when its neighbours differ between the rings through it
+        ring_of = np.repeat(np.arange(len(rings)), lengths)
+        offset = np.arange(len(ids)) - starts[ring_of]
+        previous = ids[starts[ring_of] + (offset - 1) % lengths[ring_of]]
+        following = ids[starts[ring_of] + (offset + 1) % lengths[ring_of]]
+        _, first = _group(ids, np.minimum(previous, following), np.maximum(previous, following))
+        junction = np.bincount(ids[first], minlength=len(points)) > 1
+
+        arcs, index = [], {}
+        ring_arcs = []
+        for start, length in zip(starts.tolist(), lengths.tolist()):
+            ring = ids[start:start + length]
+            cuts = np.flatnonzero(junction[ring])
+            # Rings without junctions start at their smallest point id, so an
+            # island and the hole around it give the same closed arc
+            ring = np.roll(ring, -(cuts[0] if len(cuts) else int(np.argmin(ring))))
+            closed = np.append(ring, ring[0])
+            bounds = (cuts - cuts[0]).tolist() + [length] if len(cuts) else [0, length]
+            references = []
+            for a, b in zip(bounds[:-1], bounds[1:]):
+                piece = closed[a:b + 1]
+                key = piece.tobytes()
+                if key in index:
+                    references.append(index[key])
+                    continue
+                reverse = piece[::-1].tobytes()
+                if reverse in index:
+                    references.append(~index[reverse])
+                    continue
+                index[key] = len(arcs)
+                references.append(len(arcs))
+                arcs.append(piece)
+            ring_arcs.append(references)
+
+        shapes = [[[ring_arcs[ring] for ring in polygon] for polygon in polygons]
+                  for polygons in shapes]
+        return cls(points, arcs, shapes)
+
+    def arc_coords(self):
+        """Full-resolution coordinates of every arc."""
+        return [self.points[arc] for arc in self.arcs]
+
+    def simplify(self, tolerance, decimals=None):
+        """Arc coordinates simplified by Douglas-Peucker and rounded to `decimals`."""
+        original = self.arc_coords()
+        if not original:
+            return []
+        decimals = tolerance_decimals(tolerance) if decimals is None else decimals
+        lengths = np.array([len(arc) for arc in original])
+        lines = shapely.linestrings(np.concatenate(original),
+                                    indices=np.repeat(np.arange(len(original)), lengths))
+        simple = shapely.simplify(lines, tolerance, preserve_topology=False)
+        coords, which = shapely.get_coordinates(simple, return_index=True)
+        arcs = np.split(np.round(coords, decimals), np.cumsum(np.bincount(which))[:-1])
+        arcs = [_dedupe(arc) for arc in arcs]
+
+        # Give the arcs of collapsed rings back a few vertices; both sides see the change
+        collapsed = set()
+        for polygons in self.shapes:
+            for polygon in polygons:
+                for ring in polygon:
+                    if len(self._ring(ring, arcs)) < 4:
+                        collapsed.update(r if r >= 0 else ~r for r in ring)
+        for i in collapsed:
+            guard = _dedupe(np.round(_guard(original[i]), decimals))
+            if len(guard) > len(arcs[i]):
+                arcs[i] = guard
+        return arcs
+
+    @staticmethod
+    def _ring(references, arcs):
+        parts = [arcs[r] if r >= 0 else arcs[~r][::-1] for r in references]
+        return _dedupe(np.concatenate([parts[0]] + [part[1:] for part in parts[1:]]))
+
+    def _kept_rings(self, index, arcs):
+        """Polygons of one geometry as (references, coordinates) of the rings that
+        do not collapse with these arcs; polygons without an exterior are left out."""
+        polygons = []
+        for polygon in self.shapes[index]:
+            rings = [(ring, self._ring(ring, arcs)) for ring in polygon]
+            if len(rings[0][1]) >= 4:
+                polygons.append([ring for ring in rings if len(ring[1]) >= 4])
+        return polygons
+
+    def geometry(self, index, arcs=None):
+        """GeoJSON geometry dict of one input geometry, or None if nothing is left."""
+        arcs = self.arc_coords() if arcs is None else arcs
+        polygons = [[coords.tolist() for _, coords in polygon]
+                    for polygon in self._kept_rings(index, arcs)]
+        if not polygons:
+            return None
+        if len(polygons) == 1:
+            return {'type': 'Polygon', 'coordinates': polygons[0]}
+        return {'type': 'MultiPolygon', 'coordinates': polygons}
+
+    def to_topojson(self, properties=None, name='boundaries', arcs=None,
+                    quantization=QUANTIZATION):
+        """TopoJSON Topology of all geometries as one GeometryCollection.
+
+        Every arc is written once, quantized to a quantization × quantization
+        grid over the bounding box and delta-encoded; `properties` is a list
+        with one dict (or None) per geometry.
+        """
+        arcs = self.arc_coords() if arcs is None else arcs
+        geometries = []
+        for i in range(len(self.shapes)):
+            polygons = [[references for references, _ in polygon]
+                        for polygon in self._kept_rings(i, arcs)]
+            if not polygons:
+                geometry = {'type': None}
+            elif len(polygons) == 1:
+                geometry = {'type': 'Polygon', 'arcs': polygons[0]}
+            else:
+                geometry = {'type': 'MultiPolygon', 'arcs': polygons}
+            if properties is not None and properties[i] is not None:
+                geometry['properties'] = properties[i]
+            geometries.append(geometry)
+
+        topology = {'type': 'Topology',
+                    'objects': {name: {'type': 'GeometryCollection', 'geometries': geometries}},
+                    'arcs': []}
+        if not arcs:
+            return topology
+        coords = np.concatenate(arcs)
+        low, high = coords.min(axis=0), coords.max(axis=0)
+        scale = np.where(high > low, (high - low) / (quantization - 1), 1.0)
+        for arc in arcs:
+            grid = _dedupe(np.round((arc - low) / scale).astype(np.int64))
+            topology['arcs'].append(np.vstack([grid[:1], np.diff(grid, axis=0)]).tolist())
+        topology['bbox'] = [*low.tolist(), *high.tolist()]
+        topology['transform'] = {'scale': scale.tolist(), 'translate': low.tolist()}
+        return topology
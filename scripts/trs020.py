@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""Parser and columnar cache for official road length exports (CSP table TRS020)
+
+TRS020 is exported from the statistics portal in several layouts: English
+or Latvian labels, with or without the "Types of surface" and "Indicator"
+columns, one column per year, and one or two title lines above the header.
+parse() detects the layout from the header row and returns one long table:
+
+    unit            canonical name, as in data/hierarchy.csv and the
+                    official_*_stats.csv files ("Aizkraukle municipality",
+                    "Rīga", "Vidzeme", "Latvia")
+    short_name      unit without " municipality" ("Aizkraukle")
+    level           country, region, city or municipality
+    superseded      territory definition replaced on 01.01.2024
+    surface         total, asphalt or gravel
+    indicator       total, state_roads, municipal_roads or municipal_streets
+    year            int16
+    road_length_km  float64, NaN for "…" / "-" cells
+    source_label    the territorial unit as written in the file
+
+The state city Riga is named "Rīga", so it no longer collides with the Riga
+statistical region. Names are resolved to the hierarchy units with
+name_resolver.py, so Latvian labels ("Aizkraukles novads") give the same
+units as English ones.
+
+load() caches the parsed table as Parquet under data/processed/cache/trs020,
+keyed by the SHA-256 of the source file, the hierarchy table and the name
+resolver's rules (its unit/level columns come from them), so repeated loads
+only read a few kilobytes of typed columns:
+
+    python scripts/trs020.py data/raw/TRS020_*.csv    # parse, cache and summarize
+"""
+
+import argparse
+import csv
+import hashlib
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import name_resolver
+from name_resolver import HIERARCHY_TABLE, load_resolver, name_key
+
+TRS020_FILE = 'data/raw/TRS020_20251218-012055.csv'
+CACHE_DIR = 'data/processed/cache/trs020'
+# Part of the cache key; bump when parse() output changes
+PARSER_VERSION = 2
+
+LEVELS = ['country', 'region', 'city', 'municipality']
+SURFACES = ['total', 'asphalt', 'gravel']
+INDICATORS = ['total', 'state_roads', 'municipal_roads', 'municipal_streets']
+COLUMNS = ['unit', 'short_name', 'level', 'superseded', 'surface', 'indicator', 'year',
+           'road_length_km', 'source_label']
+
+# Header labels of the dimension columns, English and Latvian
+UNIT_HEADERS = {'territorial unit', 'teritoriālā vienība'}
+SURFACE_HEADERS = {'types of surface', 'seguma veidi', 'seguma veids'}
+INDICATOR_HEADERS = {'indicator', 'indicators', 'rādītāji', 'rādītājs'}
+
+# Label fragments → category, checked in order on the lower-cased label
+SURFACE_LABELS = [('asphalt', 'asphalt'), ('asfalt', 'asphalt'), ('bitum', 'asphalt'),
+                  ('gravel', 'gravel'), ('grant', 'gravel'), ('šķemb', 'gravel'),
+                  ('total', 'total'), ('pavisam', 'total'), ('kopā', 'total')]
+INDICATOR_LABELS = [('state', 'state_roads'), ('valsts', 'state_roads'),
+                    ('street', 'municipal_streets'), ('iela', 'municipal_streets'),
+                    ('municipal', 'municipal_roads'), ('pašvaldību', 'municipal_roads'),
+                    ('total', 'total'), ('pavisam', 'total'), ('kopā', 'total')]
+
+# Official categories of road_categories.py as (surface, indicator)
+CATEGORY_SELECTIONS = {
+    'total': ('total', 'total'),
+    'asphalt': ('asphalt', 'total'),
+    'gravel': ('gravel', 'total'),
+    'state_roads': ('total', 'state_roads'),
+    'municipal_roads': ('total', 'municipal_roads'),
+    'municipal_streets': ('total', 'municipal_streets'),
+}
+
+CITY_NAMES = {'riga': 'Rīga', 'rīga': 'Rīga'}
+_NOTE = re.compile(r'\s*\((?:before|from|līdz|no)\b[^)]*\)', re.IGNORECASE)
+_EXTRA_NOTE = re.compile(r'\s*\([^)]*\)')
+_REGION = re.compile(r'\s*(statistical region|statistiskais reģions|reģions)\s*$', re.IGNORECASE)
+_MUNICIPALITY = re.compile(r'\s*(municipality|novads)\s*$', re.IGNORECASE)
+
+
+def _label(value, labels, column):
+    text = value.strip().lower()
+    for fragment, category in labels:
+        if fragment in text:
+            return category
+    raise ValueError(f"Unknown {column} label in TRS020 file: {value!r}")
+
+
+def normalize_unit(label, resolver=None):
+    """(unit, level, superseded) of a territorial unit label."""
+    superseded = bool(re.search(r'\((before|līdz)\b', label, re.IGNORECASE))
+    name = re.sub(r'\s+', ' ', _NOTE.sub('', label)).strip()
+    if resolver is not None:
+        unit, level, _, _ = resolver.lookup(name, levels=LEVELS)
+        if unit is not None:
+            return unit, level, superseded
+
+    # "Riga statistical region (Riga)" → "Riga"
+    name = _EXTRA_NOTE.sub('', name).strip()
+    if _REGION.search(name):
+        return _REGION.sub('', name), 'region', superseded
+    if name_key(name) in ('latvia', 'latvija'):
+        return 'Latvia', 'country', superseded
+    if _MUNICIPALITY.search(name):
+        return _MUNICIPALITY.sub('', name) + ' municipality', 'municipality', superseded
+    return CITY_NAMES.get(name.casefold(), name), 'city', superseded
+
+
+def detect_layout(rows):
+    """Index of the header row and the roles of its columns.
+
+    Returns (header_index, {'unit': i, 'surface': i|None, 'indicator': i|None,
+    'years': [(i, year), ...]}).
+    """
+    for index, row in enumerate(rows):
+        cells = [cell.strip().lstrip('\ufeff').lower() for cell in row]
+        if not cells or cells[0] not in UNIT_HEADERS:
+            continue
+        layout = {'unit': 0, 'surface': None, 'indicator': None, 'years': []}
+        for i, cell in enumerate(cells[1:], start=1):
+            if cell in SURFACE_HEADERS:
+                layout['surface'] = i
+            elif cell in INDICATOR_HEADERS:
+                layout['indicator'] = i
+            elif re.fullmatch(r'\d{4}', cell):
+                layout['years'].append((i, int(cell)))
+            else:
+                raise ValueError(f"Unknown TRS020 column: {row[i]!r}")
+        if not layout['years']:
+            raise ValueError("TRS020 header has no year columns")
+        return index, layout
+    raise ValueError("No TRS020 header row (Territorial unit / Teritoriālā vienība) found")
+
+
+def _number(cell):
+    cell = cell.strip().replace(' ', '').replace(' ', '').replace(',', '.')
+    try:
+        return float(cell)
+    except ValueError:
+        return np.nan
+
+
+def parse(path, hierarchy_path=HIERARCHY_TABLE):
+    """Parse a TRS020 export into the long table described above, one row at a time."""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        rows = csv.reader(f)
+        header_rows = []
+        for row in rows:
+            header_rows.append(row)
+            if row and row[0].strip().lstrip('\ufeff').lower() in UNIT_HEADERS:
+                break
+        _, layout = detect_layout(header_rows)
+        records = _records(rows, layout, load_resolver(hierarchy_path))
+
+    table = pd.DataFrame.from_records(records, columns=[
+        'unit', 'level', 'superseded', 'surface', 'indicator', 'year', 'road_length_km',
+        'source_label'])
+    table.insert(1, 'short_name', table['unit'].str.replace(r' municipality$', '', regex=True))
+    return _typed(table)
+
+
+def _records(rows, layout, resolver):
+    units = {}
+    records = []
+    for row in rows:
+        if not row or not row[0].strip():
+            continue
+        label = row[0]
+        if label not in units:
+            units[label] = normalize_unit(label, resolver)
+        unit, level, superseded = units[label]
+        surface = ('total' if layout['surface'] is None
+                   else _label(row[layout['surface']], SURFACE_LABELS, 'surface'))
+        indicator = ('total' if layout['indicator'] is None
+                     else _label(row[layout['indicator']], INDICATOR_LABELS, 'indicator'))
+        for i, year in layout['years']:
+            records.append((unit, level, superseded, surface, indicator, year,
+                            _number(row[i]) if i < len(row) else np.nan, label.strip()))
+    return records
+
+
+def _typed(table):
+    table = table.astype({'unit': 'string', 'short_name': 'string', 'superseded': bool,
+                          'year': np.int16, 'road_length_km': np.float64,
+                          'source_label': 'string'})
+    table['level'] = pd.Categorical(table['level'], LEVELS)
+    table['surface'] = pd.Categorical(table['surface'], SURFACES)
+    table['indicator'] = pd.Categorical(table['indicator'], INDICATORS)
+    return table[COLUMNS]
+
+
+def _update_file(digest, path):
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+
+
+def source_digest(path, hierarchy_path=HIERARCHY_TABLE):
+    """SHA-256 of everything the parsed table depends on: parser version, source
+    file, hierarchy table (if present) and the name resolver's alias rules."""
+    digest = hashlib.sha256(f'trs020-v{PARSER_VERSION}\n'.encode())
+    _update_file(digest, path)
+    for dependency in (hierarchy_path, name_resolver.__file__):
+        digest.update(b'\0')
+        if Path(dependency).exists():
+            _update_file(digest, dependency)
+    return digest.hexdigest()
+
+
+def cache_path(path, cache_dir=CACHE_DIR, hierarchy_path=HIERARCHY_TABLE):
+    digest = source_digest(path, hierarchy_path)
+    return Path(cache_dir) / f'{Path(path).stem}-{digest[:16]}.parquet'
+
+
+def load(path=TRS020_FILE, cache_dir=CACHE_DIR, hierarchy_path=HIERARCHY_TABLE):
+    """Parsed TRS020 table, read from the columnar cache when its inputs are unchanged."""
+    cached = cache_path(path, cache_dir, hierarchy_path)
+    if cached.exists():
+        return _typed(pd.read_parquet(cached))
+    table = parse(Path(path), hierarchy_path)
+    cached.parent.mkdir(parents=True, exist_ok=True)
+    for stale in cached.parent.glob(f'{Path(path).stem}-*.parquet'):
+        stale.unlink()
+    table.to_parquet(cached, index=False)
+    return table
+
+
+def official_lengths(table, surface='total', indicator='total', year=None, levels=None,
+                     name='unit'):
+    """municipality_name, road_length_km for one surface/indicator and year.
+
+    year=None takes the latest year in the table; superseded territories
+    and missing values are dropped. `name` is 'unit' or 'short_name'.
+    """
+    year = table['year'].max() if year is None else year
+    rows = table[(table['surface'] == surface) & (table['indicator'] == indicator)
+                 & (table['year'] == year) & ~table['superseded']
+                 & table['road_length_km'].notna()]
+    if levels is not None:
+        rows = rows[rows['level'].isin(levels)]
+    return pd.DataFrame({'municipality_name': rows[name].astype(object).to_numpy(),
+                         'road_length_km': rows['road_length_km'].to_numpy()})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', default=[TRS020_FILE])
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    args = parser.parse_args()
+
+    for path in args.files:
+        table = load(path, args.cache_dir)
+        print(f"{path}: {len(table):,} values → {cache_path(path, args.cache_dir)}")
+        print(f"  years: {', '.join(map(str, sorted(table['year'].unique())))}")
+        current = table[~table['superseded']]
+        for level in LEVELS:
+            print(f"  {level:13s} {current.loc[current['level'] == level, 'unit'].nunique():3d} units")
+        print(f"  surfaces: {', '.join(table['surface'].unique().astype(str))}; "
+              f"indicators: {', '.join(table['indicator'].unique().astype(str))}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""Mapbox Vector Tiles (MVT 2.1) cut from the road table and the boundaries
+
+Each layer keeps its geometries in Web Mercator (EPSG:3857) with an
+STRtree over them. A tile request queries the tree with the tile bounds
+(plus a small buffer), drops roads whose highway class is not drawn at
+that zoom (HIGHWAY_MIN_ZOOM), clips, simplifies to the tile resolution and
+snaps the geometries to the 4096 × 4096 tile grid, then encodes the
+protobuf by hand (no protobuf dependency):
+
+    store = TileStore.from_files()
+    data = store.tile('roads', 12, 2320, 1232)     # bytes of a .pbf tile
+    data = store.tile(None, 12, 2320, 1232)        # all layers in one tile
+
+TileStore.tile() keeps the last TILE_CACHE_SIZE tiles in an LRU cache,
+optionally wrapped (app.py caches ready-to-send, gzipped payloads).
+"""
+
+import math
+import struct
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import shapely
+
+from completeness import COMPLETENESS_MAP
+from road_tables import ROAD_TABLE
+
+EXTENT = 4096
+# Tile-grid units around each tile, so lines and outlines continue across edges
+BUFFER = 64
+MAX_ZOOM = 16
+TILE_CACHE_SIZE = 4096
+WEB_MERCATOR = 'EPSG:3857'
+# Half the circumference of the earth in EPSG:3857 meters
+ORIGIN = 20037508.342789244
+
+# Lowest zoom at which each highway class is drawn; other classes from 14
+HIGHWAY_MIN_ZOOM = {
+    'motorway': 5, 'trunk': 5, 'motorway_link': 8, 'trunk_link': 8,
+    'primary': 6, 'primary_link': 10, 'secondary': 8, 'secondary_link': 11,
+    'tertiary': 10, 'tertiary_link': 12, 'unclassified': 11, 'residential': 12,
+    'living_street': 13, 'road': 12, 'service': 14, 'track': 13,
+}
+DEFAULT_MIN_ZOOM = 14
+
+ROAD_PROPERTIES = ['highway', 'name', 'ref', 'surface']
+BOUNDARY_PROPERTIES = ['municipality_name', 'osm_road_km', 'road_length_km',
+                       'completeness_pct', 'category']
+
+
+def tile_bounds(z, x, y):
+    """(minx, miny, maxx, maxy) of a tile in EPSG:3857 meters."""
+    size = 2 * ORIGIN / (1 << z)
+    minx = -ORIGIN + x * size
+    maxy = ORIGIN - y * size
+    return minx, maxy - size, minx + size, maxy
+
+
+def valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < (1 << z) and 0 <= y < (1 << z)
+
+
+def tile_range(bounds, z):
+    """(x0, y0, x1, y1) inclusive range of the tiles covering EPSG:3857 bounds."""
+    size = 2 * ORIGIN / (1 << z)
+    last = (1 << z) - 1
+    x0 = min(max(int((bounds[0] + ORIGIN) // size), 0), last)
+    x1 = min(max(int((bounds[2] + ORIGIN) // size), 0), last)
+    y0 = min(max(int((ORIGIN - bounds[3]) // size), 0), last)
+    y1 = min(max(int((ORIGIN - bounds[1]) // size), 0), last)
+    return x0, y0, x1, y1
+
+
+def _varint(value):
+    if value < 0x80:
+        return _SMALL_VARINTS[value]
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+_SMALL_VARINTS = [bytes((i,)) for i in range(0x80)]
+
+
+def _field(number, wire_type):
+    return _varint((number << 3) | wire_type)
+
+
+def _bytes(number, payload):
+    return _field(number, 2) + _varint(len(payload)) + payload
+
+
+def _packed(number, values):
+    return _bytes(number, b''.join([_varint(v) for v in values]))
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _value(value):
+    """Encoded Value message of a property."""
+    if isinstance(value, (bool, np.bool_)):
+        return _field(7, 0) + _varint(int(value))
+    if isinstance(value, (int, np.integer)):
+        return _field(6, 0) + _varint(_zigzag(int(value)))
+    if isinstance(value, (float, np.floating)):
+        return _field(3, 1) + struct.pack('<d', float(value))
+    return _bytes(1, str(value).encode('utf-8'))
+
+
+def _command(command, count):
+    return (command & 0x7) | (count << 3)
+
+
+def _ring_commands(coords, cursor, close):
+    """MoveTo/LineTo(/ClosePath) for one ring or line of integer tile coordinates."""
+    x, y = cursor
+    params = []
+    for px, py in (coords[:-1] if close else coords):
+        dx, dy = int(px) - x, int(py) - y
+        # Repeated points after snapping to the grid would be zero moves
+        if params and not dx and not dy:
+            continue
+        params += ((dx << 1) ^ (dx >> 63), (dy << 1) ^ (dy >> 63))
+        x, y = x + dx, y + dy
+    count = len(params) // 2
+    if count < (3 if close else 2):
+        return [], cursor
+    commands = [_command(1, 1), params[0], params[1], _command(2, count - 1), *params[2:]]
+    if close:
+        commands.append(_command(7, 1))
+    return commands, (x, y)
+
+
+# shapely type ids: Point 0, LineString 1, Polygon 3, MultiPoint 4, MultiLineString 5,
+# MultiPolygon 6
+_MVT_TYPES = {0: 1, 4: 1, 1: 2, 5: 2, 3: 3, 6: 3}
+
+
+def geometry_commands(geom, type_id=None):
+    """MVT geometry command integers of a geometry already in tile coordinates."""
+    type_id = shapely.get_type_id(geom) if type_id is None else type_id
+    cursor = (0, 0)
+    commands = []
+    if type_id in (3, 6):
+        for polygon in (geom.geoms if type_id == 6 else [geom]):
+            # Exterior rings positive (clockwise on screen), holes negative
+            polygon = shapely.geometry.polygon.orient(polygon, 1.0)
+            for i, ring in enumerate([polygon.exterior, *polygon.interiors]):
+                ring_commands, cursor = _ring_commands(ring.coords, cursor, close=True)
+                if not ring_commands and i == 0:
+                    break
+                commands.extend(ring_commands)
+    elif type_id in (1, 5):
+        for line in (geom.geoms if type_id == 5 else [geom]):
+            line_commands, cursor = _ring_commands(line.coords, cursor, close=False)
+            commands.extend(line_commands)
+    elif type_id in (0, 4):
+        commands = [0]
+        for point in (geom.geoms if type_id == 4 else [geom]):
+            px, py = (int(v) for v in point.coords[0])
+            dx, dy = px - cursor[0], py - cursor[1]
+            commands += ((dx << 1) ^ (dx >> 63), (dy << 1) ^ (dy >> 63))
+            cursor = (px, py)
+        commands[0] = _command(1, (len(commands) - 1) // 2)
+    return commands
+
+
+def encode_layer(name, features, extent=EXTENT):
+    """Layer message of (id, geometry, properties) features in tile coordinates."""
+    keys, values = {}, {}
+    encoded = []
+    type_ids = shapely.get_type_id([geom for _, geom, _ in features])
+    for (feature_id, geom, properties), type_id in zip(features, type_ids.tolist()):
+        if type_id not in _MVT_TYPES:
+            continue
+        commands = geometry_commands(geom, type_id)
+        if not commands:
+            continue
+        tags = []
+        for key, value in properties.items():
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            value_message = _value(value)
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault(value_message, len(values)))
+        message = b''
+        if feature_id is not None:
+            message += _field(1, 0) + _varint(int(feature_id))
+        message += _packed(2, tags) + _field(3, 0) + _varint(_MVT_TYPES[type_id])
+        message += _packed(4, commands)
+        encoded.append(_bytes(2, message))
+    if not encoded:
+        return b''
+    layer = _field(15, 0) + _varint(2) + _bytes(1, name.encode('utf-8')) + b''.join(encoded)
+    layer += b''.join(_bytes(3, key.encode('utf-8')) for key in keys)
+    layer += b''.join(_bytes(4, value) for value in values)
+    layer += _field(5, 0) + _varint(extent)
+    return layer
+
+
+def _read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _skip(data, pos, wire_type):
+    """Position after the value of a field whose key ends at pos."""
+    if wire_type == 0:
+        return _read_varint(data, pos)[1]
+    if wire_type == 2:
+        length, pos = _read_varint(data, pos)
+        return pos + length
+    if wire_type in (1, 5):
+        return pos + (8 if wire_type == 1 else 4)
+    raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+
+
+def _layer_name(data, pos, end):
+    while pos < end:
+        key, pos = _read_varint(data, pos)
+        if key == (1 << 3) | 2:
+            length, pos = _read_varint(data, pos)
+            return data[pos:pos + length].decode('utf-8')
+        pos = _skip(data, pos, key & 0x7)
+    raise ValueError("Vector tile layer without a name")
+
+
+def split_tile(data):
+    """{layer name: one-layer tile} of an encoded tile, without decoding features."""
+    layers = {}
+    pos = 0
+    while pos < len(data):
+        start = pos
+        key, pos = _read_varint(data, pos)
+        end = _skip(data, pos, key & 0x7)
+        if key == (3 << 3) | 2:
+            body = _read_varint(data, pos)[1]
+            layers[_layer_name(data, body, end)] = data[start:end]
+        pos = end
+    return layers
+
+
+def encode_tile(layers):
+    """Tile message of {layer name: features}; empty layers are left out."""
+    tile = b''
+    for name, features in layers.items():
+        layer = encode_layer(name, features)
+        if layer:
+            tile += _bytes(3, layer)
+    return tile
+
+
+class TileLayer:
+    """One layer's geometries in EPSG:3857 with an STRtree and per-feature min zoom."""
+
+    def __init__(self, frame, properties, id_column=None, min_zoom=None):
+        valid = (frame.geometry.notna() & ~frame.geometry.is_empty).to_numpy()
+        frame = frame[valid]
+        frame = frame.to_crs(WEB_MERCATOR) if frame.crs is not None else frame
+        self.geometries = frame.geometry.to_numpy()
+        self.tree = shapely.STRtree(self.geometries)
+        columns = [c for c in properties if c in frame.columns]
+        table = pd.DataFrame(frame[columns]).astype(object)
+        self.properties = table.where(table.notna(), None).to_dict('records')
+        # MBTiles/TileJSON field types of the properties
+        self.fields = {column: ('Boolean' if pd.api.types.is_bool_dtype(frame[column])
+                                else 'Number' if pd.api.types.is_numeric_dtype(frame[column])
+                                else 'String') for column in columns}
+        self.ids = (frame[id_column].to_numpy() if id_column in frame.columns
+                    else np.full(len(frame), None, dtype=object))
+        self.min_zoom = (np.zeros(len(frame), dtype=np.int8) if min_zoom is None
+                         else np.asarray(min_zoom, dtype=np.int8)[valid])
+
+    @classmethod
+    def roads(cls, roads):
+        min_zoom = roads['highway'].map(HIGHWAY_MIN_ZOOM).fillna(DEFAULT_MIN_ZOOM).to_numpy()
+        return cls(roads, ROAD_PROPERTIES, 'osm_id', min_zoom)
+
+    @classmethod
+    def boundaries(cls, boundaries):
+        return cls(boundaries, BOUNDARY_PROPERTIES)
+
+    def bounds(self):
+        return tuple(shapely.total_bounds(self.geometries))
+
+    def features(self, z, x, y):
+        """(id, geometry, properties) of the features of a tile, in tile coordinates."""
+        minx, miny, maxx, maxy = tile_bounds(z, x, y)
+        scale = EXTENT / (maxx - minx)
+        margin = BUFFER / scale
+        box = (minx - margin, miny - margin, maxx + margin, maxy + margin)
+        hits = self.tree.query(shapely.box(*box))
+        hits = np.sort(hits[self.min_zoom[hits] <= z])
+        if not len(hits):
+            return []
+
+        geoms = shapely.clip_by_rect(self.geometries[hits], *box)
+        # Half a tile-grid unit: finer detail disappears when snapping anyway
+        geoms = shapely.simplify(geoms, 0.5 / scale, preserve_topology=True)
+        geoms = shapely.transform(
+            geoms, lambda c: np.column_stack([(c[:, 0] - minx) * scale, (maxy - c[:, 1]) * scale]))
+        geoms = shapely.set_precision(geoms, 1.0)
+        keep = ~shapely.is_empty(geoms)
+        return [(self.ids[i], geom, self.properties[i])
+                for i, geom in zip(hits[keep], geoms[keep])]
+
+
+class TileStore:
+    """Named TileLayers plus an LRU cache of encoded tiles.
+
+    The cache is shared by the server's request threads and guarded by a
+    lock; tiles are rendered outside it.
+    """
+
+    def __init__(self, layers, cache_size=TILE_CACHE_SIZE, wrap=None):
+        self.layers = layers
+        self.cache_size = cache_size
+        self.wrap = wrap
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Sent to the tile pyramid's worker processes without lock or cache
+        state = self.__dict__.copy()
+        state['_cache'] = OrderedDict()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_files(cls, road_table=ROAD_TABLE, boundaries=COMPLETENESS_MAP,
+                   cache_size=TILE_CACHE_SIZE, wrap=None):
+        """Store over the files that exist: 'roads' and 'municipalities'."""
+        layers = {}
+        if Path(road_table).exists():
+            stored = set(pq.read_schema(road_table).names)
+            columns = [c for c in ['osm_id', 'geometry'] + ROAD_PROPERTIES if c in stored]
+            layers['roads'] = TileLayer.roads(gpd.read_parquet(road_table, columns=columns))
+        if Path(boundaries).exists():
+            layers['municipalities'] = TileLayer.boundaries(gpd.read_file(boundaries))
+        return cls(layers, cache_size, wrap)
+
+    def render(self, layer, z, x, y):
+        """Encoded tile of one layer (all layers for None), without the cache."""
+        names = list(self.layers) if layer is None else [layer]
+        return encode_tile({name: self.layers[name].features(z, x, y) for name in names})
+
+    def tile(self, layer, z, x, y):
+        """Encoded (and wrapped) tile of one layer or all; the last `cache_size` are kept."""
+        key = (layer, z, x, y)
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+                return data
+        data = self.render(layer, z, x, y)
+        if self.wrap is not None:
+            data = self.wrap(data)
+        with self._lock:
+            self._cache[key] = data
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return data
@@ -2,14 +2,93 @@
 """Unit tests for Latvia OSM Road Completeness Project"""
 
 import unittest
+import numpy as np
 import pandas as pd
 import geopandas as gpd
 import json
 from pathlib import Path
 import sys
+import tempfile
 
 # Add project root to path
 PROJECT_ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(PROJECT_ROOT / 'scripts'))
+
+# Small OSM extract around Jelgava: four roads, one skipped way, one building
+SAMPLE_OSM = """<?xml version='1.0' encoding='UTF-8'?>
+<osm version="0.6" generator="test">
+  <node id="1" version="1" lat="56.650" lon="23.700"/>
+  <node id="2" version="1" lat="56.655" lon="23.710"/>
+  <node id="3" version="1" lat="56.660" lon="23.720"/>
+  <node id="4" version="1" lat="56.640" lon="23.690"/>
+  <node id="5" version="1" lat="56.645" lon="23.705"/>
+  <node id="6" version="1" lat="56.652" lon="23.730"/>
+  <node id="7" version="1" lat="56.653" lon="23.731"/>
+  <node id="8" version="1" lat="56.654" lon="23.730"/>
+  <way id="10" version="1">
+    <nd ref="1"/><nd ref="2"/><nd ref="3"/>
+    <tag k="highway" v="primary"/><tag k="name" v="Rigas iela"/>
+    <tag k="ref" v="A8"/><tag k="surface" v="asphalt"/>
+  </way>
+  <way id="11" version="1">
+    <nd ref="4"/><nd ref="5"/>
+    <tag k="highway" v="residential"/><tag k="surface" v="paved"/>
+  </way>
+  <way id="12" version="1">
+    <nd ref="5"/><nd ref="2"/>
+    <tag k="highway" v="track"/><tag k="surface" v="gravel"/>
+  </way>
+  <way id="13" version="1">
+    <nd ref="3"/><nd ref="6"/>
+    <tag k="highway" v="unclassified"/>
+  </way>
+  <way id="14" version="1">
+    <nd ref="4"/><nd ref="6"/>
+    <tag k="highway" v="proposed"/>
+  </way>
+  <way id="15" version="1">
+    <nd ref="6"/><nd ref="7"/><nd ref="8"/><nd ref="6"/>
+    <tag k="building" v="yes"/>
+  </way>
+</osm>
+"""
+
+
+def write_sample_osm(directory):
+    """Write SAMPLE_OSM into `directory` and return its path."""
+    path = Path(directory) / 'sample.osm'
+    path.write_text(SAMPLE_OSM, encoding='utf-8')
+    return path
+
+
+def sample_municipalities():
+    """Two municipalities split at 23.705 E covering SAMPLE_OSM, in EPSG:3035."""
+    from shapely.geometry import box
+
+    return gpd.GeoDataFrame({
+        'municipality_name': ['Rietumi', 'Austrumi'],
+        'municipality_id': ['LV-W', 'LV-E'],
+    }, geometry=[box(23.6, 56.6, 23.705, 56.7), box(23.705, 56.6, 23.8, 56.7)],
+        crs='EPSG:4326').to_crs('EPSG:3035')
+
+
+def write_grid_pbf(directory, n_ways=4000):
+    """Write a PBF with many blocks: a chain of nodes and short highway ways."""
+    import osmium
+    from osmium.osm.mutable import Node, Way
+
+    path = Path(directory) / 'grid.osm.pbf'
+    writer = osmium.SimpleWriter(str(path))
+    n_nodes = n_ways * 3
+    for i in range(1, n_nodes + 1):
+        writer.add_node(Node(id=i, location=(21.0 + i * 1e-4, 56.0 + (i % 97) * 1e-4)))
+    highways = ['residential', 'track', 'primary', 'construction']
+    for i in range(n_ways):
+        refs = [i * 3 + 1, i * 3 + 2, i * 3 + 3]
+        writer.add_way(Way(id=100000 + i, nodes=refs,
+                           tags={'highway': highways[i % len(highways)]}))
+    writer.close()
+    return path
 
 
 class TestDataFiles(unittest.TestCase):
@@ -270,6 +349,1098 @@ class TestDataQuality(unittest.TestCase):
                        f"Average completeness too high: {avg_completeness}%")
 
 
+class TestRoadExtraction(unittest.TestCase):
+    """Test the road extraction helpers on a tiny OSM file"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.osm_file = write_sample_osm(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _read_batches(self, path, batch_size):
+        from road_extraction import StreamingRoadHandler
+
+        batches = []
+        handler = StreamingRoadHandler(batches.append, batch_size=batch_size)
+        handler.apply_file(str(path), locations=True)
+        handler.flush()
+        return batches
+
+    def test_streaming_matches_in_memory(self):
+        """Streaming batches should yield the same roads as one big batch"""
+        from road_extraction import PartWriter, RoadStats, read_roads
+
+        expected = self._read_batches(self.osm_file, None)[0].to_frame()
+
+        parts_dir = Path(self.tmp.name) / 'parts'
+        writer = PartWriter(parts_dir)
+        stats = RoadStats()
+        for batch in self._read_batches(self.osm_file, 3):
+            frame = batch.to_frame()
+            writer.write(frame)
+            stats.update(frame)
+
+        self.assertEqual(writer.parts, 2)
+        self.assertEqual(stats.count, 4)
+        streamed = read_roads(parts_dir)
+        self.assertEqual(streamed['osm_id'].tolist(), [10, 11, 12, 13])
+        self.assertAlmostEqual(streamed['length_km'].sum(), expected['length_km'].sum(), places=9)
+        self.assertAlmostEqual(stats.total_km, expected['length_km'].sum(), places=9)
+
+    def test_vectorized_lengths_match_shapely(self):
+        """Flat-array lengths should match reprojected LineString lengths"""
+        from shapely.geometry import LineString
+
+        batch = self._read_batches(self.osm_file, None)[0]
+        lines = [LineString(zip(batch.lon[a:b], batch.lat[a:b]))
+                 for a, b in zip(batch.offsets[:-1], batch.offsets[1:])]
+        reference = gpd.GeoSeries(lines, crs='EPSG:4326').to_crs('EPSG:3035').length / 1000.0
+
+        projected = batch.lengths_km('projected')
+        geodesic = batch.lengths_km('geodesic')
+        for ref, proj, geo in zip(reference, projected, geodesic):
+            self.assertAlmostEqual(proj, ref, places=9)
+            self.assertAlmostEqual(geo, ref, delta=ref * 0.01)
+
+        frame = batch.to_frame(geometry=False)
+        self.assertNotIn('geometry', frame.columns)
+        self.assertTrue((batch.to_frame().geometry.length / 1000.0 - reference).abs().max() < 1e-9)
+
+    def test_node_index_file_reused(self):
+        """A file-backed node index should be reused only for the same PBF"""
+        import os
+        from road_extraction import StreamingRoadHandler, apply_with_locations
+
+        pbf = write_grid_pbf(self.tmp.name, n_ways=500)
+        index_file = Path(self.tmp.name) / 'nodes.idx'
+        runs = []
+        for _ in range(2):
+            batches = []
+            handler = StreamingRoadHandler(batches.append, batch_size=None)
+            reused = apply_with_locations(handler, pbf, 'sparse_file_array', index_file)
+            handler.flush()
+            runs.append((reused, batches[0]))
+
+        self.assertEqual([reused for reused, _ in runs], [False, True])
+        np.testing.assert_array_equal(runs[0][1].lon, runs[1][1].lon)
+        np.testing.assert_array_equal(runs[0][1].lat, runs[1][1].lat)
+
+        stat = pbf.stat()
+        os.utime(pbf, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        handler = StreamingRoadHandler(lambda batch: None, batch_size=None)
+        self.assertFalse(apply_with_locations(handler, pbf, 'sparse_file_array', index_file))
+
+    def test_parallel_matches_serial(self):
+        """Parallel block-range extraction should equal a serial run"""
+        from parallel_extraction import extract_parallel, scan_pbf_blocks
+
+        pbf = write_grid_pbf(self.tmp.name)
+        _, blocks = scan_pbf_blocks(pbf)
+        self.assertGreater(len(blocks), 2)
+
+        serial = self._read_batches(pbf, None)[0]
+        parallel = []
+        count = extract_parallel(pbf, parallel.append, batch_size=1000, workers=2)
+
+        self.assertEqual(count, len(serial))
+        self.assertEqual(len(parallel), 3)
+        self.assertEqual(np.concatenate([b.osm_id for b in parallel]).tolist(), serial.osm_id.tolist())
+        self.assertEqual([h for b in parallel for h in b.highway], serial.highway)
+        np.testing.assert_array_equal(np.concatenate([b.lon for b in parallel]), serial.lon)
+        np.testing.assert_array_equal(np.concatenate([b.lat for b in parallel]), serial.lat)
+
+
+class TestTopicExtraction(unittest.TestCase):
+    """Test single-pass multi-topic extraction"""
+
+    def test_topics_in_one_pass(self):
+        """Roads and buildings should come out of the same read"""
+        from road_extraction import read_roads
+        from topic_extraction import DEFAULT_TOPICS, TopicExtractor
+
+        with tempfile.TemporaryDirectory() as tmp:
+            out_dir = Path(tmp) / 'topics'
+            extractor = TopicExtractor(out_dir, batch_size=3)
+            for topic in DEFAULT_TOPICS.values():
+                extractor.register(topic)
+            counts = extractor.run(write_sample_osm(tmp))
+
+            self.assertEqual(counts, {'roads': 4, 'railways': 0, 'buildings': 1,
+                                      'pois': 0, 'forests': 0})
+            roads = read_roads(out_dir / 'roads')
+            buildings = read_roads(out_dir / 'buildings')
+        self.assertEqual(sorted(roads['osm_id']), [10, 11, 12, 13])
+        self.assertEqual(buildings['osm_id'].tolist(), [15])
+        self.assertEqual(buildings['osm_type'].tolist(), ['way'])
+        self.assertGreater(buildings['area_km2'].iloc[0], 0)
+
+
+class TestRoadAggregation(unittest.TestCase):
+    """Test aggregate-only extraction against the GeoDataFrame join"""
+
+    def test_aggregates_match_sjoin(self):
+        """Streamed totals should equal sjoin + groupby on the full road table"""
+        from road_aggregation import MunicipalityAggregator
+        from road_extraction import StreamingRoadHandler
+
+        municipalities = sample_municipalities()
+        aggregator = MunicipalityAggregator(municipalities)
+        batches = []
+        with tempfile.TemporaryDirectory() as tmp:
+            handler = StreamingRoadHandler(batches.append, batch_size=2)
+            handler.apply_file(str(write_sample_osm(tmp)), locations=True)
+            handler.flush()
+        for batch in batches:
+            aggregator.add(batch)
+        result = aggregator.result()
+
+        roads = pd.concat([b.to_frame() for b in batches], ignore_index=True)
+        joined = gpd.sjoin(roads, municipalities, predicate='intersects')
+        expected = joined.groupby('municipality_name').agg(
+            osm_road_km=('length_km', 'sum'), num_segments=('osm_id', 'count'))
+        actual = result.groupby('municipality_name')[['osm_road_km', 'num_segments']].sum()
+
+        self.assertEqual(aggregator.roads, 4)
+        self.assertEqual(actual['num_segments'].to_dict(), expected['num_segments'].to_dict())
+        for name, km in expected['osm_road_km'].items():
+            self.assertAlmostEqual(actual.loc[name, 'osm_road_km'], km, places=9)
+
+
+SAMPLE_OSC = """<?xml version='1.0' encoding='UTF-8'?>
+<osmChange version="0.6" generator="test">
+  <modify>
+    <node id="6" version="2" lat="56.658" lon="23.690"/>
+    <way id="11" version="2">
+      <nd ref="4"/><nd ref="5"/>
+      <tag k="highway" v="proposed"/>
+    </way>
+  </modify>
+  <delete>
+    <way id="12" version="2"/>
+  </delete>
+  <create>
+    <node id="20" version="1" lat="56.641" lon="23.760"/>
+    <node id="21" version="1" lat="56.646" lon="23.770"/>
+    <way id="16" version="1">
+      <nd ref="20"/><nd ref="21"/><nd ref="3"/>
+      <tag k="highway" v="service"/>
+    </way>
+  </create>
+</osmChange>
+"""
+
+
+class TestRoadStore(unittest.TestCase):
+    """Test incremental road store updates from an OsmChange file"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.municipalities = Path(self.tmp.name) / 'municipalities.geojson'
+        sample_municipalities().to_file(self.municipalities, driver='GeoJSON')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _build(self, name, osm_text):
+        from road_store import RoadStore
+
+        osm_file = Path(self.tmp.name) / f'{name}.osm'
+        osm_file.write_text(osm_text, encoding='utf-8')
+        store = RoadStore(Path(self.tmp.name) / f'{name}.sqlite', self.municipalities)
+        store.build(str(osm_file))
+        return store
+
+    def test_apply_diff_matches_rebuild(self):
+        """Diff + dirty re-aggregation should equal a full rebuild"""
+        store = self._build('before', SAMPLE_OSM)
+        self.assertEqual(store.aggregate(), 2)
+
+        osc_file = Path(self.tmp.name) / 'change.osc'
+        osc_file.write_text(SAMPLE_OSC, encoding='utf-8')
+        summary = store.apply_diff(osc_file)
+        self.assertEqual(summary['touched'], 4)  # 11, 12, 16 and 13 via node 6
+        self.assertEqual(summary['updated'], 2)  # 13 and 16
+        self.assertEqual(store.aggregate(), summary['dirty'])
+
+        after = SAMPLE_OSM.replace('lat="56.652" lon="23.730"', 'lat="56.658" lon="23.690"')
+        after = after.replace('<tag k="highway" v="residential"/>', '<tag k="highway" v="proposed"/>')
+        after = after.replace('<tag k="highway" v="track"/>', '')
+        after = after.replace('</osm>', """  <node id="20" version="1" lat="56.641" lon="23.760"/>
+  <node id="21" version="1" lat="56.646" lon="23.770"/>
+  <way id="16" version="1">
+    <nd ref="20"/><nd ref="21"/><nd ref="3"/><tag k="highway" v="service"/>
+  </way>
+</osm>""")
+        rebuilt = self._build('after', after)
+        rebuilt.aggregate()
+
+        pd.testing.assert_frame_equal(store.aggregates_table(), rebuilt.aggregates_table())
+        store.close()
+        rebuilt.close()
+
+    def test_ways_with_unknown_nodes_are_kept(self):
+        """A way redefined over nodes the store lacks should keep its stored geometry"""
+        store = self._build('before', SAMPLE_OSM)
+        store.aggregate()
+        before = store.aggregates_table()
+
+        # Nodes 7 and 8 are only on the building, so the store has no location for them
+        osc_file = Path(self.tmp.name) / 'change.osc'
+        osc_file.write_text("""<?xml version='1.0' encoding='UTF-8'?>
+<osmChange version="0.6" generator="test">
+  <modify>
+    <way id="10" version="2">
+      <nd ref="1"/><nd ref="2"/><nd ref="7"/>
+      <tag k="highway" v="primary"/>
+    </way>
+  </modify>
+  <create>
+    <way id="17" version="1">
+      <nd ref="7"/><nd ref="8"/>
+      <tag k="highway" v="service"/>
+    </way>
+  </create>
+</osmChange>
+""", encoding='utf-8')
+        summary = store.apply_diff(osc_file)
+        self.assertEqual((summary['updated'], summary['removed'], summary['carried'],
+                          summary['skipped']), (0, 0, 1, 1))
+        self.assertGreater(summary['dirty'], 0)
+        self.assertEqual(store.aggregate(), summary['dirty'])
+        pd.testing.assert_frame_equal(store.aggregates_table(), before)
+        store.close()
+
+
+class TestClippedJoin(unittest.TestCase):
+    """Test splitting roads at municipality borders"""
+
+    @classmethod
+    def setUpClass(cls):
+        from road_extraction import StreamingRoadHandler
+
+        batches = []
+        with tempfile.TemporaryDirectory() as tmp:
+            handler = StreamingRoadHandler(batches.append, batch_size=None)
+            handler.apply_file(str(write_sample_osm(tmp)), locations=True)
+            handler.flush()
+        cls.batch = batches[0]
+        cls.lines, cls.lengths = cls.batch.metric_lines()
+
+    def test_clipped_lengths_add_up(self):
+        """Pieces of every road should add up to the road length, no double counting"""
+        from municipality_index import MunicipalityIndex
+
+        index = MunicipalityIndex(sample_municipalities())
+        road_idx, muni_idx, clipped_km = index.clip(self.lines)
+        per_road = np.bincount(road_idx, weights=clipped_km, minlength=len(self.lines))
+        np.testing.assert_allclose(per_road, self.lengths, rtol=1e-9)
+
+        # Way 10 crosses the border at 23.705 E and is split in two
+        crossing = self.batch.osm_id.tolist().index(10)
+        self.assertEqual((road_idx == crossing).sum(), 2)
+        self.assertTrue((clipped_km[road_idx == crossing] < self.lengths[crossing]).all())
+
+    def test_aggregator_clip_mode(self):
+        """Clip-mode aggregates should sum to the total road length"""
+        from road_aggregation import MunicipalityAggregator
+
+        for method in ('projected', 'geodesic'):
+            aggregator = MunicipalityAggregator(sample_municipalities(), method, join='clip')
+            aggregator.add(self.batch)
+            result = aggregator.result()
+            self.assertAlmostEqual(result['osm_road_km'].sum(),
+                                   self.batch.lengths_km(method).sum(), places=9)
+
+    def test_parallel_join_matches_in_memory(self):
+        """Chunked pool join should give the same assignments as one in-memory clip"""
+        from join_engine import run_join
+        from municipality_index import MunicipalityIndex
+        from road_tables import read_assignments, read_road_table
+
+        index = MunicipalityIndex(sample_municipalities())
+        road_idx, muni_idx, clipped_km = index.clip(self.lines)
+        expected = sorted(zip(self.batch.osm_id[road_idx].tolist(),
+                              index.ids[muni_idx].tolist(), clipped_km.round(9).tolist()))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            roads = Path(tmp) / 'roads.geojson'
+            self.batch.to_frame().to_crs('EPSG:4326').to_file(roads, driver='GeoJSON')
+            counts = run_join(roads, index, Path(tmp) / 'assignments', mode='clip',
+                              workers=2, chunk_size=2, road_table=Path(tmp) / 'road_table.parquet')
+            table = read_assignments(Path(tmp) / 'assignments')
+            road_table = read_road_table(Path(tmp) / 'road_table.parquet')
+            self.assertFalse((Path(tmp) / 'road_table.parquet.parts').exists())
+
+        self.assertEqual(counts, (len(self.batch), len(set(road_idx.tolist())), len(road_idx)))
+        actual = sorted(zip(table['osm_id'].tolist(), table['municipality_id'].tolist(),
+                            table['clipped_length_km'].round(9).tolist()))
+        self.assertEqual(actual, expected)
+        # The pool writes the same road table as a serial run
+        self.assertEqual(road_table['osm_id'].tolist(), self.batch.osm_id.tolist())
+        self.assertEqual(road_table.crs, 'EPSG:3035')
+        np.testing.assert_allclose(road_table.length / 1000, self.lengths, rtol=1e-6)
+
+    def test_geometryless_parts_rejected(self):
+        """Attribute-only parts (--no-geometry) should be rejected with a clear error"""
+        from join_engine import run_join
+        from municipality_index import MunicipalityIndex
+
+        roads = self.batch.to_frame()
+        with tempfile.TemporaryDirectory() as tmp:
+            plain = Path(tmp) / 'plain'
+            plain.mkdir()
+            pd.DataFrame(roads.drop(columns='geometry')).to_parquet(plain / 'part-00000.parquet')
+            with self.assertRaisesRegex(ValueError, 'no-geometry'):
+                run_join(plain, MunicipalityIndex(sample_municipalities()), Path(tmp) / 'out',
+                         workers=2)
+
+    def test_road_table_parts_merge_once(self):
+        """Road parts should merge into one table with each osm_id once"""
+        from road_tables import merge_road_table, read_road_table
+
+        roads = self.batch.to_frame()
+        with tempfile.TemporaryDirectory() as tmp:
+            parts = Path(tmp) / 'parts'
+            parts.mkdir()
+            roads.iloc[:3].to_parquet(parts / 'part-00000.parquet', index=False)
+            roads.iloc[2:].assign(name=None).to_parquet(parts / 'part-00001.parquet', index=False)
+            self.assertEqual(merge_road_table(parts, Path(tmp) / 'table.parquet'), len(roads))
+            merged = read_road_table(Path(tmp) / 'table.parquet')
+            self.assertEqual(merged['osm_id'].tolist(), roads['osm_id'].tolist())
+            self.assertEqual(merged['name'].iloc[2], roads['name'].iloc[2])
+
+    def test_assignment_totals_match_aggregator(self):
+        """Totals from the thin assignment table should equal the streaming aggregates"""
+        from join_engine import join_roads
+        from municipality_index import MunicipalityIndex
+        from road_aggregation import MunicipalityAggregator
+        from road_tables import municipality_totals, read_road_table, write_road_table
+
+        municipalities = sample_municipalities()
+        roads = self.batch.to_frame()
+        for mode in ('intersects', 'clip'):
+            assignments, _ = join_roads(roads, MunicipalityIndex(municipalities), mode)
+            self.assertEqual(list(assignments.columns),
+                             ['osm_id', 'municipality_id', 'clipped_length_km'])
+            totals = municipality_totals(assignments, municipalities).set_index('municipality_id')
+
+            aggregator = MunicipalityAggregator(municipalities, join=mode)
+            aggregator.add(self.batch)
+            expected = aggregator.result().groupby('municipality_id').sum(numeric_only=True)
+            np.testing.assert_allclose(totals['osm_road_km'], expected['osm_road_km'], rtol=1e-9)
+            self.assertEqual(totals['num_segments'].tolist(), expected['num_segments'].tolist())
+
+        # Way 10 matches both municipalities but is stored once
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'road_table.parquet'
+            write_road_table(pd.concat([roads, roads.iloc[:1]]), path)
+            self.assertEqual(len(read_road_table(path)), len(roads))
+
+
+class TestIncrementalCompleteness(unittest.TestCase):
+    """Test per-municipality recomputation against a full run"""
+
+    @classmethod
+    def setUpClass(cls):
+        from road_extraction import StreamingRoadHandler
+
+        batches = []
+        with tempfile.TemporaryDirectory() as tmp:
+            handler = StreamingRoadHandler(batches.append, batch_size=None)
+            handler.apply_file(str(write_sample_osm(tmp)), locations=True)
+            handler.flush()
+        cls.roads = batches[0].to_frame()
+        cls.municipalities = sample_municipalities()
+        cls.municipalities['area_km2'] = cls.municipalities.geometry.area / 1_000_000
+        cls.official = pd.DataFrame({'municipality_name': ['Rietumi', 'Austrumi', 'Citur'],
+                                     'road_length_km': [1.0, 2.0, 3.0]})
+
+    def run_update(self, root, roads, official, full=False):
+        from incremental_completeness import IncrementalCompleteness
+
+        updater = IncrementalCompleteness(root / 'state', root / 'assignments',
+                                          root / 'completeness.csv', root / 'map.geojson')
+        summary = updater.update(self.municipalities, roads, official, full=full)
+        csv = pd.read_csv(root / 'completeness.csv').set_index('municipality_name').sort_index()
+        geo = gpd.read_file(root / 'map.geojson').set_index('municipality_name').sort_index()
+        return summary, csv, geo
+
+    def test_patch_matches_full_run(self):
+        """Only affected municipalities are rejoined, and the patched exports equal a full run"""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            summary, _, _ = self.run_update(root, self.roads, self.official)
+            self.assertTrue(summary['full'])
+
+            # Official figure changed: no rejoin, one row recomputed
+            official = self.official.assign(road_length_km=[1.0, 4.0, 3.0])
+            summary, csv, _ = self.run_update(root, self.roads, official)
+            self.assertEqual((summary['full'], summary['rejoined'], summary['rows']),
+                             (False, 0, 1))
+            self.assertEqual(csv.loc['Austrumi', 'road_length_km'], 4.0)
+
+            # Way 13 lies in Austrumi only: removing it rejoins that municipality alone
+            roads = self.roads[self.roads['osm_id'] != 13]
+            summary, csv, geo = self.run_update(root, roads, official)
+            self.assertEqual((summary['changed_roads'], summary['rejoined']), (1, 1))
+
+            _, full_csv, full_geo = self.run_update(Path(tmp) / 'full', roads, official)
+            pd.testing.assert_frame_equal(csv, full_csv, check_dtype=False)
+            pd.testing.assert_frame_equal(pd.DataFrame(geo.drop(columns='geometry')),
+                                          pd.DataFrame(full_geo.drop(columns='geometry')),
+                                          check_dtype=False, check_like=True)
+
+    def test_foreign_parts_force_full_run(self):
+        """Parts the last run did not write (e.g. a full 04 join) trigger a full recomputation"""
+        from road_tables import assignment_table
+
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            _, first, _ = self.run_update(root, self.roads, self.official)
+            assignment_table([13], ['foreign'], [1.0]).to_parquet(
+                root / 'assignments' / 'part-00000.parquet', index=False)
+            summary, csv, _ = self.run_update(root, self.roads, self.official)
+            self.assertTrue(summary['full'])
+            self.assertFalse((root / 'assignments' / 'part-00000.parquet').exists())
+            pd.testing.assert_frame_equal(csv, first)
+
+
+class TestHierarchyRollup(unittest.TestCase):
+    """Test parish → municipality → region → country rollups"""
+
+    def test_rollup_all_levels(self):
+        """Each level should sum its leaves; official km is published or summed from children"""
+        from shapely.geometry import box
+        from hierarchy import leaf_rows, rollup, rollup_payload
+
+        hierarchy = pd.DataFrame([
+            ('Latvia', 'country', '', ''),
+            ('Zemgale', 'region', 'Latvia', ''),
+            ('Rietumi municipality', 'municipality', 'Zemgale', 'Rietumu novads'),
+            ('Austrumi', 'municipality', 'Zemgale', 'Austrumi'),
+        ], columns=['unit', 'level', 'parent', 'local_name'])
+        lau1 = sample_municipalities().rename(columns={'municipality_name': 'shapeName'})
+        lau1['shapeName'] = ['Rietumu novads', 'AUSTRUMI']
+        parishes = gpd.GeoDataFrame({'municipality_name': ['A pag.', 'B pag.', 'C', 'Jūra']},
+                                    geometry=[box(23.61, 56.61, 23.65, 56.69),
+                                              box(23.65, 56.61, 23.70, 56.69),
+                                              box(23.71, 56.61, 23.79, 56.69),
+                                              box(20.0, 56.0, 20.1, 56.1)],
+                                    crs='EPSG:4326')
+
+        rows, outside = leaf_rows(parishes, lau1, hierarchy)
+        self.assertEqual(outside, ['Jūra'])
+        self.assertEqual(dict(zip(rows['unit'], rows['parent'])),
+                         {'A pag.': 'Rietumi municipality', 'B pag.': 'Rietumi municipality',
+                          'C': 'Austrumi'})
+
+        leaves = pd.DataFrame({'municipality_name': ['A pag.', 'B pag.', 'C', 'Nezināms'],
+                               'osm_road_km': [10.0, 20.0, 5.0, 99.0],
+                               'num_segments': [1, 2, 3, 4]})
+        official = pd.DataFrame({'municipality_name': ['Rietumi municipality', 'Austrumi'],
+                                 'road_length_km': [60.0, 10.0]})
+        table, unmatched = rollup(pd.concat([hierarchy, rows]), leaves, official)
+        self.assertEqual(unmatched, ['Nezināms'])
+
+        units = rollup_payload(table)['units']
+        self.assertEqual(units['municipality']['Rietumi municipality']['osm_road_km'], 30.0)
+        self.assertEqual(units['municipality']['Rietumi municipality']['completeness_pct'], 50.0)
+        self.assertEqual(units['region']['Zemgale']['official_road_km'], 70.0)
+        self.assertEqual(units['region']['Zemgale']['official_source'], 'sum')
+        self.assertEqual(units['country']['Latvia']['num_segments'], 6)
+        self.assertEqual(units['country']['Latvia']['completeness_pct'], 50.0)
+        self.assertEqual(units['region']['Zemgale']['children'],
+                         ['Austrumi', 'Rietumi municipality'])
+
+    def test_rollup_names_find_data(self):
+        """Unit names from /api/rollup should find the CSV rows and features of /api/data"""
+        from unittest import mock
+        from shapely.geometry import box, mapping
+        sys.path.insert(0, str(PROJECT_ROOT))
+        import app
+
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / 'data.csv').write_text('Municipality,OSM_Roads_km,Completeness_%\n'
+                                           'Aizkraukle,162.99,9.84\nRīga,900.0,50.0\n',
+                                           encoding='utf-8')
+            units = {'Aizkraukle municipality': {'unit': 'Aizkraukle municipality'},
+                     'Rīga': {'unit': 'Rīga'}}
+            (root / 'rollups.json').write_text(json.dumps(
+                {'levels': ['municipality'], 'units': {'municipality': units}}), encoding='utf-8')
+            features = [{'type': 'Feature', 'properties': {'municipality_name': 'Aizkraukle'},
+                         'geometry': mapping(box(25, 56.5, 25.5, 57))}]
+            (root / 'map.geojson').write_text(json.dumps(
+                {'type': 'FeatureCollection', 'features': features}), encoding='utf-8')
+            with mock.patch.multiple(app, CSV_FILE=root / 'data.csv',
+                                     ROLLUPS_FILE=root / 'rollups.json',
+                                     GEOJSON_FILE=root / 'map.geojson'):
+                app.clear_cache()
+                self.addCleanup(app.clear_cache)
+                client = app.app.test_client()
+
+                names = [unit['unit'] for unit in client.get('/api/rollup/municipality').get_json()]
+                self.assertEqual(names, ['Aizkraukle municipality', 'Rīga'])
+                for name in names:
+                    row = client.get(f'/api/data/{name}')
+                    self.assertEqual(row.status_code, 200)
+                    self.assertTrue(name.startswith(row.get_json()['municipality_name']))
+                batch = client.get('/api/data?names=' + ','.join(names)).get_json()
+                self.assertEqual([r['osm_road_km'] for r in batch], [162.99, 900.0])
+                collection = client.get('/api/municipality-data',
+                                        query_string={'municipality': names[0]}).get_json()
+                self.assertEqual(len(collection['features']), 1)
+
+                # Spellings of one unit share a cache entry; unknown ids add none
+                cached = len(app._payload_cache)
+                for query in ({'municipality': 'aizkraukle'}, {'municipality': names[0], 'id': 'x1'},
+                              {'municipality': 'Nowhere', 'id': 'x2'}):
+                    client.get('/api/municipality-data', query_string=query)
+                self.assertEqual(len(app._payload_cache), cached)
+
+
+class TestCategoryCube(unittest.TestCase):
+    """Test the municipality × road category cube"""
+
+    def test_cube_matches_per_category_totals(self):
+        """One group-by should give the same km as filtering roads category by category"""
+        from completeness import completeness_table
+        from join_engine import join_roads
+        from municipality_index import MunicipalityIndex
+        from road_categories import CATEGORIES, category_cube, completeness_cube
+        from road_extraction import StreamingRoadHandler
+
+        batches = []
+        with tempfile.TemporaryDirectory() as tmp:
+            handler = StreamingRoadHandler(batches.append, batch_size=None)
+            handler.apply_file(str(write_sample_osm(tmp)), locations=True)
+            handler.flush()
+        roads = batches[0].to_frame()
+        self.assertEqual(roads.set_index('osm_id').loc[10, ['surface', 'ref']].tolist(),
+                         ['asphalt', 'A8'])
+
+        municipalities = sample_municipalities()
+        assignments, _ = join_roads(roads, MunicipalityIndex(municipalities), 'clip')
+        cube = category_cube(assignments, roads, municipalities)
+        self.assertEqual(len(cube), assignments['municipality_id'].nunique() * len(CATEGORIES))
+
+        # primary A8 asphalt / residential paved / track gravel / unclassified
+        members = {'total': [10, 11, 12, 13], 'asphalt': [10, 11], 'gravel': [12],
+                   'state_roads': [10], 'municipal_roads': [13], 'municipal_streets': [11]}
+        cells = cube.set_index(['municipality_id', 'road_category'])
+        for category, osm_ids in members.items():
+            rows = assignments[assignments['osm_id'].isin(osm_ids)]
+            expected = rows.groupby('municipality_id')['clipped_length_km'].sum()
+            for municipality_id in cube['municipality_id'].unique():
+                self.assertAlmostEqual(cells.loc[(municipality_id, category), 'osm_road_km'],
+                                       round(expected.get(municipality_id, 0.0), 2))
+
+        official = pd.DataFrame({'municipality_name': ['Rietumi', 'Austrumi', 'Rietumi'],
+                                 'road_category': ['total', 'total', 'gravel'],
+                                 'road_length_km': [1.0, 2.0, 0.5]})
+        table = completeness_cube(cube, official)
+        total = table[table['road_category'] == 'total'].drop(columns='road_category')
+        expected = completeness_table(
+            cube[cube['road_category'] == 'total'][['municipality_name', 'osm_road_km',
+                                                    'num_segments']],
+            official[official['road_category'] == 'total'].drop(columns='road_category'))
+        pd.testing.assert_frame_equal(total.reset_index(drop=True),
+                                      expected.sort_values('municipality_name')
+                                      .reset_index(drop=True), check_dtype=False)
+
+
+class TestTRS020(unittest.TestCase):
+    """Test the TRS020 parser and its columnar cache"""
+
+    ENGLISH = ('\ufeff"Length of roads (km) by Territorial unit, Types of surface, Indicator and Time period"\n'
+               '\n'
+               '"Territorial unit","Types of surface","Indicator","2023","2024"\n'
+               '"Latvia","Total","Total",57000,57564\n'
+               '"Riga statistical region (from 01.01.2024.)","Total","Total",…,4996\n'
+               '"Riga statistical region (Riga) (before 01.01.2024.)  ","Total","Total",1200,…\n'
+               '"Riga","Asphalt and other bituminous surfaces","Municipal streets",800,812\n'
+               '"Aizkraukle municipality","Crushed stone and gravel surfaces","State roads",600,610\n')
+    LATVIAN = ('\ufeff"Autoceļu garums (km) - Teritoriālā vienība, Rādītāji un Laika periods"\n'
+               '\n'
+               '"Teritoriālā vienība","Rādītāji","2024"\n'
+               '"Aizkraukles novads","Pavisam",1657\n'
+               '"Ādažu novads","Pavisam",398\n')
+
+    def test_layouts_normalize_to_one_table(self):
+        """English and Latvian exports should give the same units and categories"""
+        from trs020 import load, official_lengths, parse
+
+        with tempfile.TemporaryDirectory() as tmp:
+            english = Path(tmp) / 'en.csv'
+            english.write_text(self.ENGLISH, encoding='utf-8')
+            latvian = Path(tmp) / 'lv.csv'
+            latvian.write_text(self.LATVIAN, encoding='utf-8')
+            hierarchy = PROJECT_ROOT / 'data' / 'hierarchy.csv'
+
+            table = parse(english, hierarchy)
+            self.assertEqual(len(table), 10)
+            self.assertEqual(str(table['year'].dtype), 'int16')
+            riga = table[table['source_label'] == 'Riga'].iloc[0]
+            self.assertEqual((riga['unit'], riga['level'], riga['surface'], riga['indicator']),
+                             ('Rīga', 'city', 'asphalt', 'municipal_streets'))
+            self.assertEqual(table.loc[table['superseded'], 'unit'].unique().tolist(), ['Riga'])
+            totals = official_lengths(table)
+            self.assertEqual(totals.values.tolist(), [['Latvia', 57564.0], ['Riga', 4996.0]])
+            self.assertEqual(official_lengths(table, year=2023).values.tolist(),
+                             [['Latvia', 57000.0]])
+            state = official_lengths(table, 'gravel', 'state_roads', name='short_name')
+            self.assertEqual(state.values.tolist(), [['Aizkraukle', 610.0]])
+
+            cache_dir = Path(tmp) / 'cache'
+            lv = load(latvian, cache_dir, hierarchy)
+            self.assertEqual(lv['unit'].tolist(), ['Aizkraukle municipality', 'Ādaži municipality'])
+            self.assertEqual(set(lv['surface']) | set(lv['indicator']), {'total'})
+
+            # A second load reads the cache; a changed source gets a new key
+            cached = list(cache_dir.glob('lv-*.parquet'))
+            self.assertEqual(len(cached), 1)
+            pd.testing.assert_frame_equal(load(latvian, cache_dir, hierarchy), lv)
+            latvian.write_text(self.LATVIAN.replace('1657', '1700'), encoding='utf-8')
+            self.assertEqual(load(latvian, cache_dir, hierarchy)['road_length_km'].iloc[0], 1700.0)
+            self.assertNotEqual(list(cache_dir.glob('lv-*.parquet')), cached)
+
+            # So does a changed hierarchy table, which the units are resolved against
+            from trs020 import cache_path
+            edited = Path(tmp) / 'hierarchy.csv'
+            edited.write_text(hierarchy.read_text(encoding='utf-8')
+                              + 'Testa pagasts,parish,Aizkraukle municipality,\n', encoding='utf-8')
+            self.assertNotEqual(cache_path(latvian, cache_dir, edited),
+                                cache_path(latvian, cache_dir, hierarchy))
+            self.assertFalse(cache_path(latvian, cache_dir, edited).exists())
+
+
+class TestNameResolver(unittest.TestCase):
+    """Test municipality name resolution against the hierarchy table"""
+
+    def test_name_forms_resolve_to_one_unit(self):
+        """Genitive, English, diacritic-free, historic and misspelled names should resolve"""
+        from name_resolver import NameResolver
+
+        resolver = NameResolver.from_hierarchy(PROJECT_ROOT / 'data' / 'hierarchy.csv')
+        names = pd.Series(['Cēsu novads', 'Cēsis municipality', 'Cesis', 'CĒSIS NOVADS',
+                           'Ķekavas novads', 'Kekava', 'Baldones novads', 'Daugavpils',
+                           'Daugavpils novads', 'Riga', 'Riga statistical region',
+                           'Madonna', 'Atlantis'])
+        self.assertEqual(resolver.resolve(names).tolist(), [
+            'Cēsis municipality', 'Cēsis municipality', 'Cēsis municipality',
+            'Cēsis municipality', 'Ķekava municipality', 'Ķekava municipality',
+            'Ķekava municipality', 'Daugavpils', 'Augšdaugava municipality', 'Rīga', 'Riga',
+            'Madona municipality', None])
+        match = resolver.match(names)
+        self.assertEqual(match.loc[match['name'] == 'Baldones novads', 'method'].item(), 'historic')
+        self.assertEqual(match.loc[match['name'] == 'Madonna', 'method'].item(), 'fuzzy')
+        self.assertEqual(resolver.unmatched(names), ['Atlantis'])
+        self.assertEqual(resolver.resolve(['Cēsis'], levels=['region']).tolist(), [None])
+
+    def test_merge_reports_instead_of_dropping(self):
+        """Names that do not match across a merge should be reported"""
+        from name_resolver import NameResolver
+
+        resolver = NameResolver.from_hierarchy(PROJECT_ROOT / 'data' / 'hierarchy.csv')
+        osm = pd.DataFrame({'name': ['Cēsu novads', 'Ogres novads', 'Nowhere'],
+                            'osm_km': [1.0, 2.0, 3.0]})
+        official = pd.DataFrame({'name': ['Cēsis', 'Ogre', 'Talsi'], 'km': [10.0, 20.0, 30.0]})
+        merged, report = resolver.merge(osm, official, 'name', 'name', how='outer')
+        self.assertEqual(sorted(merged['unit'].dropna()), [
+            'Cēsis municipality', 'Ogre municipality', 'Talsi municipality'])
+        self.assertEqual(merged.loc[merged['unit'] == 'Ogre municipality', 'km'].item(), 20.0)
+        self.assertEqual(report['left_unmatched'], ['Nowhere'])
+        self.assertEqual(report['right_only'], ['Talsi municipality'])
+        self.assertEqual(report['left_only'], [])
+
+
+class TestClassification(unittest.TestCase):
+    """Test the shared completeness classes, colors and quality flags"""
+
+    def test_bins_match_thresholds(self):
+        """Whole columns and scalars should be binned on the shared thresholds"""
+        from classification import (COLORS, THRESHOLDS, categorize, colors, completeness_color,
+                                    priority, quality_flag)
+
+        pct = pd.Series([None, 10, 50, 69.99, 70, 89.9, 90, 110, 110.01], index=list('abcdefghi'))
+        self.assertEqual(categorize(pct).tolist(), [
+            'No data', 'Low', 'Low', 'Low', 'Partial', 'Partial', 'Complete', 'Complete',
+            'Over-mapped'])
+        self.assertEqual(list(categorize(pct).index), list('abcdefghi'))
+        self.assertEqual(priority(pct).tolist(), [
+            'No data', 'Critical', 'High', 'High', 'Medium', 'Medium', 'Complete', 'Complete',
+            'Over-mapped'])
+        self.assertEqual(categorize(95.0), 'Complete')
+        self.assertEqual(categorize(95.0, dict(THRESHOLDS, partial=96)), 'Partial')
+        self.assertEqual(completeness_color(pct).tolist(),
+                         colors(categorize(pct)).tolist())
+        self.assertEqual(colors(['Low', 'unknown']).tolist(), [COLORS['Low'], COLORS['No data']])
+        self.assertEqual(quality_flag(pd.Series([1.0, None, 1.0, None]),
+                                      pd.Series([2.0, 3.0, None, 0.0])).tolist(),
+                         ['complete', 'missing_osm_data', 'missing_official_data', 'no_data'])
+
+
+class TestPayloads(unittest.TestCase):
+    """Test the pre-serialized API responses"""
+
+    def test_encodings_and_conditional_get(self):
+        """Payloads should be served compressed on request and answer If-None-Match with 304"""
+        import gzip
+        from flask import Flask, request
+        from payloads import Payload
+
+        records = [{'municipality_name': f'Unit {i}', 'osm_road_km': i * 1.5} for i in range(200)]
+        payload = Payload(records)
+        once = Payload(records, cache=False)
+        app = Flask(__name__)
+        app.add_url_rule('/data', 'data', lambda: payload.response(request))
+        app.add_url_rule('/once', 'once', lambda: once.response(request))
+        client = app.test_client()
+        self.assertEqual(payload.encoded, {})
+
+        plain = client.get('/data')
+        self.assertEqual(plain.status_code, 200)
+        self.assertIsNone(plain.headers.get('Content-Encoding'))
+        self.assertEqual(json.loads(plain.data), records)
+        self.assertEqual(plain.headers['Vary'], 'Accept-Encoding')
+
+        compressed = client.get('/data', headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.data), plain.data)
+        self.assertLess(len(compressed.data), len(plain.data))
+        self.assertEqual(compressed.headers['ETag'], plain.headers['ETag'])
+
+        not_modified = client.get('/data', headers={'If-None-Match': plain.headers['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.data, b'')
+        changed = client.get('/data', headers={'If-None-Match': 'W/"other"'})
+        self.assertEqual(changed.status_code, 200)
+
+        # Only the negotiated encoding is compressed, and kept only for cached payloads
+        self.assertEqual(set(payload.encoded), {'gzip'})
+        self.assertEqual(gzip.decompress(client.get('/once', headers={
+            'Accept-Encoding': 'gzip'}).data), plain.data)
+        self.assertEqual(once.encoded, {})
+
+        # Small bodies are not compressed and get a strong ETag
+        small = Payload({'ok': True})
+        self.assertEqual(small.encodings, set())
+        self.assertNotEqual(small.etag, payload.etag)
+
+    def test_fragment_index_lookups(self):
+        """Records should be found by normalized name or id, once each, in request order"""
+        from name_resolver import name_key
+        from payloads import FragmentIndex
+
+        records = [{'municipality_name': f'Pagasts {i}', 'municipality_id': i} for i in range(600)]
+        records.append({'municipality_name': 'Alūksne', 'municipality_id': None})
+        index = FragmentIndex(records, name=lambda r: r['municipality_name'],
+                              id=lambda r: r['municipality_id'], key=name_key)
+
+        found = index.find(['aluksne', 'Pagasts 7', 'Nowhere', 'PAGASTS 7'], ids=[599])
+        self.assertEqual([json.loads(f)['municipality_name'] for f in found],
+                         ['Alūksne', 'Pagasts 7', 'Pagasts 599'])
+        self.assertEqual(json.loads(FragmentIndex.array(found))[0], records[-1])
+        self.assertEqual(index.find(['Nowhere']), [])
+        self.assertEqual(FragmentIndex.array([]), b'[]')
+
+
+class TestVectorTiles(unittest.TestCase):
+    """Test the vector tile encoder and cutter"""
+
+    def test_geometry_encoding_matches_spec(self):
+        """Command integers should match the examples of the MVT specification"""
+        from shapely.geometry import LineString, Polygon
+        from vector_tiles import geometry_commands
+
+        self.assertEqual(geometry_commands(LineString([(2, 2), (2, 10), (10, 10)])),
+                         [9, 4, 4, 18, 0, 16, 16, 0])
+        self.assertEqual(geometry_commands(Polygon([(3, 6), (8, 12), (20, 34)])),
+                         [9, 6, 12, 18, 10, 12, 24, 44, 15])
+
+    def test_tiles_filter_by_zoom_and_cache(self):
+        """Minor roads should only appear at high zoom, and tiles should be cached"""
+        from shapely.geometry import LineString, box
+        from vector_tiles import TileLayer, TileStore, tile_range
+
+        roads = gpd.GeoDataFrame(
+            {'osm_id': [1, 2], 'highway': ['primary', 'service'], 'name': ['Rīgas iela', None]},
+            geometry=[LineString([(24.0, 56.9), (24.2, 57.0)]),
+                      LineString([(24.1, 56.95), (24.101, 56.951)])], crs='EPSG:4326')
+        municipalities = gpd.GeoDataFrame(
+            {'municipality_name': ['Ogre'], 'completeness_pct': [55.5]},
+            geometry=[box(23.5, 56.5, 24.8, 57.2)], crs='EPSG:4326')
+        store = TileStore({'roads': TileLayer.roads(roads),
+                           'municipalities': TileLayer.boundaries(municipalities)}, cache_size=2)
+        point = gpd.GeoSeries.from_xy([24.1], [56.95], crs='EPSG:4326').to_crs('EPSG:3857')
+        bounds = tuple(point.total_bounds)
+
+        def tile(z):
+            x, y, _, _ = tile_range(bounds, z)
+            return z, x, y
+
+        self.assertEqual([f[0] for f in store.layers['roads'].features(*tile(8))], [1])
+        self.assertEqual([f[0] for f in store.layers['roads'].features(*tile(15))], [1, 2])
+        ((_, geom, properties),) = store.layers['municipalities'].features(*tile(10))
+        self.assertEqual(properties, {'municipality_name': 'Ogre', 'completeness_pct': 55.5})
+        self.assertTrue(geom.is_valid)
+        self.assertEqual(store.layers['roads'].features(*tile(15))[0][2]['name'], 'Rīgas iela')
+
+        data = store.tile('roads', *tile(15))
+        self.assertIn('Rīgas iela'.encode('utf-8'), data)
+        self.assertIs(store.tile('roads', *tile(15)), data)
+        store.tile('roads', *tile(14))
+        store.tile('roads', *tile(13))
+        self.assertNotIn(('roads', *tile(15)), store._cache)
+        self.assertEqual(store.tile('roads', 15, 0, 0), b'')
+
+        # Request threads share the cache; it must stay consistent and bounded
+        import pickle
+        from concurrent.futures import ThreadPoolExecutor
+        keys = [('roads', *tile(z)) for z in range(8, 16)] * 50
+        with ThreadPoolExecutor(8) as pool:
+            tiles = list(pool.map(lambda key: store.tile(*key), keys))
+        self.assertEqual(tiles[:8], [store.render(*key) for key in keys[:8]])
+        self.assertLessEqual(len(store._cache), store.cache_size)
+        # Pickled for the pyramid's worker processes, without the cached tiles
+        self.assertEqual(len(pickle.loads(pickle.dumps(store))._cache), 0)
+
+
+class TestMBTiles(unittest.TestCase):
+    """Test the prebuilt tile pyramid"""
+
+    def test_pyramid_serves_rendered_tiles(self):
+        """Tiles read back from MBTiles should equal the ones rendered on request"""
+        import gzip
+        from shapely.geometry import LineString, box
+        from mbtiles import MBTiles, build
+        from vector_tiles import TileLayer, TileStore, split_tile, tile_range
+
+        roads = gpd.GeoDataFrame(
+            {'osm_id': [1, 2], 'highway': ['primary', 'service'], 'name': ['Rīgas iela', None]},
+            geometry=[LineString([(24.0, 56.9), (24.2, 57.0)]),
+                      LineString([(24.1, 56.95), (24.101, 56.951)])], crs='EPSG:4326')
+        municipalities = gpd.GeoDataFrame(
+            {'municipality_name': ['Ogre'], 'completeness_pct': [55.5]},
+            geometry=[box(23.9, 56.8, 24.3, 57.1)], crs='EPSG:4326')
+        store = TileStore({'roads': TileLayer.roads(roads),
+                           'municipalities': TileLayer.boundaries(municipalities)})
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'tiles.mbtiles'
+            count = build(path, store, min_zoom=6, max_zoom=9, workers=2, block_size=2)
+            self.assertGreater(count, 0)
+            self.assertFalse((Path(tmp) / 'tiles.mbtiles.partial').exists())
+
+            source = MBTiles(path)
+            self.assertEqual(source.layers, ['roads', 'municipalities'])
+            self.assertEqual(source.metadata['format'], 'pbf')
+            point = gpd.GeoSeries.from_xy([24.1], [56.95], crs='EPSG:4326').to_crs('EPSG:3857')
+            x, y, _, _ = tile_range(tuple(point.total_bounds), 9)
+            data = store.render(None, 9, x, y)
+            self.assertEqual(gzip.decompress(source.tile_data(9, x, y)), data)
+            self.assertEqual(source.tile(None, 9, x, y), data)
+            self.assertEqual(source.tile('roads', 9, x, y), store.render('roads', 9, x, y))
+            self.assertEqual(b''.join(split_tile(data).values()), data)
+            self.assertEqual(source.tile('roads', 12, x, y), b'')
+
+            # Single-layer tiles are split once and then come from the LRU cache
+            wrapped = MBTiles(path, wrap=lambda body, encoded: [body, encoded], cache_size=1)
+            roads = wrapped.tile('roads', 9, x, y)
+            self.assertEqual(roads, [store.render('roads', 9, x, y), None])
+            self.assertIs(wrapped.tile('roads', 9, x, y), roads)
+            self.assertEqual(wrapped.tile(None, 9, x, y)[1], {'gzip': source.tile_data(9, x, y)})
+            wrapped.tile('municipalities', 9, x, y)
+            self.assertEqual(list(wrapped._cache), [('municipalities', 9, x, y)])
+
+
+class TestTopology(unittest.TestCase):
+    """Test shared-arc simplification of boundaries"""
+
+    def test_simplified_neighbours_share_edges(self):
+        """Simplified neighbours should neither overlap nor leave gaps, enclaves included"""
+        import numpy as np
+        import shapely
+        from shapely.geometry import Point, Polygon, shape
+        from topology import Topology, pixel_tolerance
+
+        # Two municipalities with a wiggly common border, the left one with an enclave
+        t = np.linspace(0, 1, 201)
+        border = [(0.5 + 0.01 * np.sin(40 * v), v) for v in t]
+        left = Polygon([(0, 0)] + border + [(0, 1)])
+        right = Polygon(border[::-1] + [(1, 0), (1, 1)])
+        enclave = Point(0.25, 0.5).buffer(0.002)
+        geometries = [left.difference(enclave), right, enclave]
+
+        topology = Topology.from_geometries(geometries)
+        self.assertEqual(len(topology.arcs), 4)
+        for i, geom in enumerate(geometries):
+            self.assertLess(shapely.hausdorff_distance(shape(topology.geometry(i)), geom), 1e-6)
+
+        arcs = topology.simplify(pixel_tolerance(5))
+        simplified = [shape(topology.geometry(i, arcs)) for i in range(3)]
+        vertices = sum(len(arc) for arc in arcs)
+        self.assertLess(vertices, sum(len(arc) for arc in topology.arc_coords()) / 10)
+        self.assertTrue(all(geom.is_valid for geom in simplified))
+        union = shapely.union_all(simplified)
+        self.assertAlmostEqual(sum(geom.area for geom in simplified), union.area, places=9)
+        self.assertAlmostEqual(union.area, 1.0, places=9)
+        self.assertGreater(simplified[2].area, 0)
+        self.assertTrue(simplified[0].interiors[0].equals(simplified[2].exterior))
+
+    def test_topojson_round_trip(self):
+        """TopoJSON arcs should decode to the input within one quantization step"""
+        import numpy as np
+        import shapely
+        from shapely.geometry import Polygon, box
+        from topology import Topology
+
+        geometries = [box(21, 56, 22, 57), box(22, 56, 23, 57), None]
+        properties = [{'municipality_name': 'A'}, {'municipality_name': 'B'}, None]
+        topojson = Topology.from_geometries(geometries).to_topojson(properties, 'units',
+                                                                    quantization=1000)
+        self.assertEqual(topojson['type'], 'Topology')
+        # The common border is one arc, used forward by one unit and reversed by the other
+        self.assertEqual(len(topojson['arcs']), 3)
+        units = topojson['objects']['units']['geometries']
+        self.assertEqual([unit['type'] for unit in units], ['Polygon', 'Polygon', None])
+        self.assertEqual(units[1]['properties'], {'municipality_name': 'B'})
+        self.assertTrue(all(isinstance(v, int) for arc in topojson['arcs'] for p in arc for v in p))
+
+        scale = np.array(topojson['transform']['scale'])
+        translate = np.array(topojson['transform']['translate'])
+        arcs = [np.cumsum(arc, axis=0) * scale + translate for arc in topojson['arcs']]
+
+        def ring(references):
+            parts = [arcs[r] if r >= 0 else arcs[~r][::-1] for r in references]
+            return np.concatenate([parts[0]] + [part[1:] for part in parts[1:]])
+
+        for unit, geom in zip(units[:2], geometries):
+            decoded = Polygon(ring(unit['arcs'][0]))
+            self.assertLess(shapely.hausdorff_distance(decoded, geom), scale.max())
+
+
+class TestSpatialQueries(unittest.TestCase):
+    """Test the spatially indexed boundary endpoints of app.py"""
+
+    def setUp(self):
+        from unittest import mock
+        from shapely.geometry import box, mapping
+        sys.path.insert(0, str(PROJECT_ROOT))
+        import app
+
+        # A 10 x 10 grid of 0.1° municipalities from 21°E 56°N
+        features = [{'type': 'Feature',
+                     'properties': {'municipality_name': f'Unit {row}-{col}',
+                                    'completeness_pct': float(row * 10 + col)},
+                     'geometry': mapping(box(21 + col / 10, 56 + row / 10,
+                                             21.1 + col / 10, 56.1 + row / 10))}
+                    for row in range(10) for col in range(10)]
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        path = Path(tmpdir.name) / 'municipalities.geojson'
+        path.write_text(json.dumps({'type': 'FeatureCollection', 'features': features}))
+        patcher = mock.patch.object(app, 'GEOJSON_FILE', path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        app.clear_cache()
+        self.addCleanup(app.clear_cache)
+        self.client = app.app.test_client()
+
+    def test_bbox_query(self):
+        """Only features intersecting the box should come back, clipped and capped on request"""
+        from shapely.geometry import box, shape
+
+        data = self.client.get('/api/features?bbox=21.15,56.15,21.25,56.25').get_json()
+        names = [f['properties']['municipality_name'] for f in data['features']]
+        self.assertEqual(names, ['Unit 1-1', 'Unit 1-2', 'Unit 2-1', 'Unit 2-2'])
+        self.assertEqual((data['numberMatched'], data['numberReturned']), (4, 4))
+
+        clipped = self.client.get('/api/features?bbox=21.15,56.15,21.25,56.25&clip=true').get_json()
+        area = sum(shape(f['geometry']).area for f in clipped['features'])
+        self.assertAlmostEqual(area, box(21.15, 56.15, 21.25, 56.25).area)
+
+        capped = self.client.get('/api/features?bbox=20,55,23,58&limit=10&zoom=7').get_json()
+        self.assertEqual((capped['numberMatched'], capped['numberReturned']), (100, 10))
+
+        self.assertEqual(self.client.get('/api/features?bbox=1,2,3').status_code, 400)
+        self.assertEqual(self.client.get('/api/features?bbox=3,2,1,4').status_code, 400)
+        self.assertEqual(self.client.get('/api/features?bbox=1,2,3,4&limit=0').status_code, 400)
+        self.assertEqual(self.client.get('/api/features?bbox=1,2,3,4&layer=x').status_code, 404)
+
+    def test_locate_points(self):
+        """Points should resolve to the unit containing them, in input order, null outside"""
+        single = self.client.get('/api/locate?lat=56.25&lon=21.35')
+        self.assertEqual(single.status_code, 200)
+        self.assertEqual(single.get_json(), {'municipality_name': 'Unit 2-3',
+                                             'municipality_id': None, 'completeness_pct': 23.0})
+        self.assertEqual(self.client.get('/api/locate?lat=50&lon=21').status_code, 404)
+        self.assertEqual(self.client.get('/api/locate?lat=56.2').status_code, 400)
+
+        rng = np.random.default_rng(0)
+        lat, lon = rng.uniform(55.9, 57.1, 5000), rng.uniform(20.9, 22.1, 5000)
+        response = self.client.post('/api/locate', json={'lat': lat.tolist(), 'lon': lon.tolist()})
+        units = response.get_json()
+        self.assertEqual(len(units), 5000)
+        for y, x, unit in zip(lat, lon, units):
+            inside = 56 < y < 57 and 21 < x < 22
+            self.assertEqual(unit is not None, inside)
+            if inside:
+                row, col = int((y - 56) * 10), int((x - 21) * 10)
+                self.assertEqual(unit['completeness_pct'], float(row * 10 + col))
+
+        self.assertEqual(self.client.post('/api/locate', json={'lat': [1, 2], 'lon': [1]}).status_code, 400)
+        self.assertEqual(self.client.post('/api/locate', data='nonsense').status_code, 400)
+
+
+class TestPipeline(unittest.TestCase):
+    """Test the cached pipeline runner"""
+
+    def make_pipeline(self, root):
+        from pipeline import Pipeline, Stage
+
+        def copy(source, target):
+            code = (f"import pathlib; p = pathlib.Path('{target}'); "
+                    f"p.write_text(pathlib.Path('{source}').read_text() + '+')")
+            return [sys.executable, '-c', code]
+
+        stages = [
+            Stage('map', copy('b.txt', 'c.txt'), inputs=['b.txt'], outputs=['c.txt']),
+            Stage('left', copy('a.txt', 'b.txt'), inputs=['a.txt'], outputs=['b.txt']),
+            Stage('right', copy('a.txt', 'd.txt'), inputs=['a.txt'], outputs=['d.txt']),
+        ]
+        return Pipeline(stages, root=root, state_file='state.json')
+
+    def test_unchanged_stages_are_skipped(self):
+        """Only stages downstream of a changed input should rerun"""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / 'a.txt').write_text('a')
+
+            pipeline = self.make_pipeline(root)
+            self.assertEqual(pipeline.order, ['left', 'map', 'right'])
+            self.assertEqual(pipeline.run(jobs=2),
+                             {'left': 'ran', 'right': 'ran', 'map': 'ran'})
+            self.assertEqual((root / 'c.txt').read_text(), 'a++')
+
+            pipeline = self.make_pipeline(root)
+            self.assertEqual(set(pipeline.run().values()), {'skipped'})
+
+            # Deleting an output reruns its stage; identical output keeps 'map' cached
+            (root / 'b.txt').unlink()
+            pipeline = self.make_pipeline(root)
+            self.assertEqual(pipeline.plan(), {'left': 'run', 'map': 'run', 'right': 'skip'})
+            self.assertEqual(pipeline.run(),
+                             {'left': 'ran', 'map': 'skipped', 'right': 'skipped'})
+
+            (root / 'a.txt').write_text('x')
+            pipeline = self.make_pipeline(root)
+            self.assertEqual(pipeline.run(['map']), {'left': 'ran', 'map': 'ran'})
+            self.assertEqual((root / 'c.txt').read_text(), 'x++')
+
+
 def run_tests_verbose():
     """Run all tests with verbose output"""
     # Create test suite
@@ -284,6 +1455,23 @@ def run_tests_verbose():
     suite.addTests(loader.loadTestsFromTestCase(TestMunicipalityData))
     suite.addTests(loader.loadTestsFromTestCase(TestFlaskAPI))
     suite.addTests(loader.loadTestsFromTestCase(TestDataQuality))
+    suite.addTests(loader.loadTestsFromTestCase(TestRoadExtraction))
+    suite.addTests(loader.loadTestsFromTestCase(TestTopicExtraction))
+    suite.addTests(loader.loadTestsFromTestCase(TestRoadAggregation))
+    suite.addTests(loader.loadTestsFromTestCase(TestRoadStore))
+    suite.addTests(loader.loadTestsFromTestCase(TestClippedJoin))
+    suite.addTests(loader.loadTestsFromTestCase(TestIncrementalCompleteness))
+    suite.addTests(loader.loadTestsFromTestCase(TestHierarchyRollup))
+    suite.addTests(loader.loadTestsFromTestCase(TestCategoryCube))
+    suite.addTests(loader.loadTestsFromTestCase(TestTRS020))
+    suite.addTests(loader.loadTestsFromTestCase(TestNameResolver))
+    suite.addTests(loader.loadTestsFromTestCase(TestClassification))
+    suite.addTests(loader.loadTestsFromTestCase(TestPayloads))
+    suite.addTests(loader.loadTestsFromTestCase(TestVectorTiles))
+    suite.addTests(loader.loadTestsFromTestCase(TestMBTiles))
+    suite.addTests(loader.loadTestsFromTestCase(TestTopology))
+    suite.addTests(loader.loadTestsFromTestCase(TestSpatialQueries))
+    suite.addTests(loader.loadTestsFromTestCase(TestPipeline))
     
     # Run tests
     runner = unittest.TextTestRunner(verbosity=2)
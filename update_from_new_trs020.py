@@ -1,20 +1,20 @@
 #!/usr/bin/env python3
 """Process new TRS020 file and update completeness statistics."""
 
-import pandas as pd
-import json
+import sys
+from pathlib import Path
 
-# Load the new TRS020 file (skip first row which is a title)
-trs020 = pd.read_csv('data/raw/TRS020_20251218-165232.csv', skiprows=1)
+import pandas as pd
 
-# Rename columns
-trs020.columns = ['Territorial_unit', 'Indicator', 'Total_roads_km']
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'scripts'))
+from trs020 import load, official_lengths  # noqa: E402
 
-# Extract municipality name (remove " novads" suffix to match CSV format)
-trs020['Municipality'] = trs020['Territorial_unit'].str.replace(' novads', '').str.strip()
+# Load the new TRS020 file (Latvian labels, parsed and cached by scripts/trs020.py)
+trs020 = load('data/raw/TRS020_20251218-165232.csv')
 
-# Keep only the total rows
-trs020_totals = trs020[trs020['Indicator'] == 'Pavisam'].copy()
+# Municipality totals, named as in the CSV ("Aizkraukle" for "Aizkraukles novads")
+trs020_totals = official_lengths(trs020, levels=['municipality'], name='short_name')
+trs020_totals.columns = ['Municipality', 'Total_roads_km']
 
 print("Official Road Data from TRS020_20251218-165232.csv:")
 print(f"Total municipalities: {len(trs020_totals)}")